@@ -0,0 +1,42 @@
+"""
+只读指标接口服务，不依赖 Streamlit。供其他工具通过 HTTP 获取调整后净值、滚动收益率和统计指标。
+
+用法示例:
+    python api.py --port 8000 --workers 4
+    curl "http://127.0.0.1:8000/statistics?codes=000001,000002&start=2020-01-01&interval=1"
+    curl -H "Accept: application/vnd.apache.arrow.stream" "http://127.0.0.1:8000/nav?codes=000001&start=2020-01-01"
+
+接口说明见 pages/returns/indicator_api.py 中的 create_app。
+数据库配置默认读取 .streamlit/secrets.toml 中的 [connections.my_database]。
+"""
+import argparse
+
+import uvicorn
+
+from pages.returns.indicator_api import (API_CACHE_ENTRIES, API_CACHE_TTL_SECONDS, API_MAX_PENDING, API_WORKERS,
+                                         create_app)
+from pages.returns.nav_data import SECRETS_PATH, load_db_config
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="只读指标接口服务")
+    parser.add_argument('--host', default='127.0.0.1', help="监听地址，默认只接受本机访问")
+    parser.add_argument('--port', type=int, default=8000, help="监听端口")
+    parser.add_argument('--workers', type=int, default=API_WORKERS, help="计算线程数")
+    parser.add_argument('--max-pending', type=int, default=API_MAX_PENDING, help="排队请求上限，超过时返回 503")
+    parser.add_argument('--cache-entries', type=int, default=API_CACHE_ENTRIES, help="结果缓存条目数")
+    parser.add_argument('--cache-ttl', type=int, default=API_CACHE_TTL_SECONDS, help="结果缓存有效期（秒）")
+    parser.add_argument('--secrets', default=SECRETS_PATH, help="数据库配置文件")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    app = create_app(dict(load_db_config(args.secrets)), args.workers, args.max_pending, args.cache_entries,
+                     args.cache_ttl)
+    uvicorn.run(app, host=args.host, port=args.port)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,169 @@
+"""
+基金指标批处理入口，不依赖 Streamlit，可在 cron 等环境中运行。
+
+用法示例:
+    python batch.py --codes funds.txt --start 2018-01-01 --end 2024-12-31 --output output --format parquet
+
+基金代码文件可以是每行一个代码的文本文件，也可以是包含 SecuCode 列的 CSV / Excel 文件。
+数据库配置默认读取 .streamlit/secrets.toml 中的 [connections.my_database]。
+"""
+import argparse
+import datetime
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from pages.returns.code_upload import read_codes_file
+from pages.returns.file_writers import write_csv_gz, write_excel, write_parquet
+from pages.returns.nav_data import DATA_FREQUENCIES, SECRETS_PATH, create_engine_from_config, load_db_config
+from pages.returns.pipeline import DEFAULT_INTERVALS, DEFAULT_NET_VALUE_COLUMNS, run_pipeline
+
+
+# 输出的结果表
+OUTPUT_TABLES = ['nav', 'rolling', 'statistics']
+
+# 每个工作进程中的数据库引擎
+_engine = None
+
+
+def read_fund_codes(path):
+    """
+    读取基金代码文件：.csv / .xlsx 需要包含 SecuCode 列，其余按每行一个代码（或逗号分隔）读取。
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.xls':
+        codes = pd.read_excel(path, dtype={'SecuCode': str})['SecuCode']
+    else:
+        # .xlsx 以只读流式模式只读取 SecuCode 列
+        codes = read_codes_file(path)
+
+    # 去重并保持原顺序
+    return list(dict.fromkeys(str(code).strip() for code in codes if str(code).strip()))
+
+
+def init_worker(db_config):
+    global _engine
+    _engine = create_engine_from_config(db_config)
+
+
+def run_chunk(secucodes, start_date, end_date, intervals, net_value_columns, frequency, execution):
+    return run_pipeline(_engine, secucodes, start_date, end_date, intervals, net_value_columns, frequency, execution)
+
+
+def remove_parts(output_dir):
+    """
+    删除上一次运行留下的分片文件，避免与本次结果混在一起。
+    """
+    for table in OUTPUT_TABLES:
+        table_dir = os.path.join(output_dir, table)
+        if os.path.isdir(table_dir):
+            for name in os.listdir(table_dir):
+                if name.startswith('part-') and name.endswith('.parquet'):
+                    os.remove(os.path.join(table_dir, name))
+
+
+def write_part(result, output_dir, part):
+    """
+    Parquet 输出时每批基金的结果直接写成一个分片文件，主进程不需要保留全部结果。
+    """
+    for table in OUTPUT_TABLES:
+        if result[table].empty:
+            continue
+        table_dir = os.path.join(output_dir, table)
+        os.makedirs(table_dir, exist_ok=True)
+        write_parquet(result[table], os.path.join(table_dir, f'part-{part:05d}.parquet'))
+
+
+def write_tables(results, output_dir, output_format):
+    writers = {'xlsx': write_excel, 'csv.gz': write_csv_gz}
+    for table in OUTPUT_TABLES:
+        frames = [result[table] for result in results if not result[table].empty]
+        if not frames:
+            continue
+        writers[output_format](pd.concat(frames, ignore_index=True),
+                               os.path.join(output_dir, f'{table}.{output_format}'))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="基金净值、滚动收益率和统计指标批处理")
+    parser.add_argument('--codes', required=True, help="基金代码文件（txt / csv / xlsx）")
+    parser.add_argument('--start', required=True, type=datetime.date.fromisoformat, help="开始日期 YYYY-MM-DD")
+    parser.add_argument('--end', type=datetime.date.fromisoformat, default=datetime.date.today(),
+                        help="结束日期 YYYY-MM-DD，默认为今天")
+    parser.add_argument('--intervals', default=','.join(str(interval) for interval in DEFAULT_INTERVALS),
+                        help="滚动区间（年），逗号分隔")
+    parser.add_argument('--columns', default=','.join(DEFAULT_NET_VALUE_COLUMNS), help="净值列，逗号分隔")
+    parser.add_argument('--frequency', choices=sorted(set(DATA_FREQUENCIES.values())), default='D',
+                        help="数据频率：D 日度，W-FRI 周度，M 月末")
+    parser.add_argument('--execution', choices=['local', 'database'], default='local',
+                        help="计算位置：local 传回每日净值在本地计算；database 在数据库中计算滚动收益率，不输出每日净值")
+    parser.add_argument('--output', default='output', help="输出目录")
+    parser.add_argument('--format', choices=['parquet', 'xlsx', 'csv.gz'], default='parquet', help="输出格式")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="并行进程数")
+    parser.add_argument('--chunk-size', type=int, default=50, help="每个任务处理的基金数")
+    parser.add_argument('--secrets', default=SECRETS_PATH, help="数据库配置文件")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    secucodes = read_fund_codes(args.codes)
+    intervals = [float(interval) for interval in args.intervals.split(',') if interval.strip()]
+    net_value_columns = [column.strip() for column in args.columns.split(',') if column.strip()]
+    chunks = [secucodes[i:i + args.chunk_size] for i in range(0, len(secucodes), args.chunk_size)]
+    os.makedirs(args.output, exist_ok=True)
+    if args.format == 'parquet':
+        remove_parts(args.output)
+
+    print(f"共 {len(secucodes)} 只基金，分为 {len(chunks)} 批，{args.workers} 个进程")
+    start_time = time.perf_counter()
+    if args.execution == 'database' and args.frequency != 'D':
+        raise SystemExit("数据库计算只支持日度数据（--frequency D）")
+    task_args = (args.start, args.end, intervals, net_value_columns, args.frequency, args.execution)
+    db_config = dict(load_db_config(args.secrets))
+
+    results = []
+    failed = []
+
+    def collect(part, result):
+        if args.format == 'parquet':
+            write_part(result, args.output, part)
+        else:
+            results.append(result)
+        print(f"[{part + 1}/{len(chunks)}] 完成 {len(chunks[part])} 只基金，"
+              f"已用时 {time.perf_counter() - start_time:.1f} 秒")
+
+    if args.workers <= 1:
+        init_worker(db_config)
+        for part, chunk in enumerate(chunks):
+            try:
+                collect(part, run_chunk(chunk, *task_args))
+            except Exception as e:
+                failed.append(part)
+                print(f"[{part + 1}/{len(chunks)}] 出错: {e}")
+    else:
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker, initargs=(db_config,)) as pool:
+            futures = {pool.submit(run_chunk, chunk, *task_args): part for part, chunk in enumerate(chunks)}
+            for future in as_completed(futures):
+                part = futures[future]
+                try:
+                    collect(part, future.result())
+                except Exception as e:
+                    failed.append(part)
+                    print(f"[{part + 1}/{len(chunks)}] 出错: {e}")
+
+    if args.format != 'parquet':
+        write_tables(results, args.output, args.format)
+
+    print(f"全部完成，用时 {time.perf_counter() - start_time:.1f} 秒，结果保存在 {args.output}")
+    if failed:
+        failed_codes = [code for part in sorted(failed) for code in chunks[part]]
+        print(f"{len(failed)} 批出错，涉及基金: {','.join(failed_codes)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,260 @@
+"""
+基准测试入口：用模拟净值数据测量主要计算步骤的耗时，不需要连接数据库。
+
+用法示例:
+    python benchmark.py --scales 10x2,100x5 --repeat 3
+    python benchmark.py --scales 1000x10 --functions 调整系数,日收益率 --compare v1.2
+
+--scales 中的 NxY 表示 N 只基金、Y 年的日度净值，Y 需大于滚动区间 --interval，否则没有完整的滚动窗口。每次运行的结果追加到 --results 指定的 JSON Lines 文件，
+记录版本标签（默认为当前 git 提交）、规模、步骤、耗时和行数；--compare 与该文件中指定标签的结果对比。
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+
+# 基准测试不读取滚动指标仓库，所有滚动指标都实时计算
+os.environ['ROLLING_WAREHOUSE_DIR'] = os.path.join(tempfile.gettempdir(), 'zzb_benchmark_no_warehouse')
+
+import pandas as pd
+
+from pages.returns.perf import collect_spans, current_rss_mb, row_count
+from pages.returns.synthetic_data import generate_fund_data
+
+
+# 默认的测试规模：(基金数, 年数)，年数需大于默认的滚动区间（1 年）
+DEFAULT_SCALES = '10x2,100x5'
+
+DEFAULT_RESULTS_PATH = 'benchmark_results.jsonl'
+
+
+def parse_scales(text):
+    scales = []
+    for item in text.split(','):
+        if item.strip():
+            n_funds, years = item.lower().split('x')
+            scales.append((int(n_funds), int(years)))
+    return scales
+
+
+def current_version():
+    """
+    当前代码版本：git 提交的短哈希，工作区有修改时加上 -dirty；不在 git 仓库中时返回 unknown。
+    """
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def bench_query(data, context):
+    from pages.returns.nav_data import fetch_fund_data
+    return fetch_fund_data(context['engine'], list(data['SecuCode'].unique()), context['start_date'],
+                           context['end_date'])
+
+
+def bench_adjustment(data, context):
+    from pages.returns.nav_data import calculate_adjustment_coefficients
+    return calculate_adjustment_coefficients(data.copy())
+
+
+def bench_rolling_returns(data, context):
+    from pages.returns.indicators import calculate_rolling_returns
+    return calculate_rolling_returns(context['adjusted'], context['interval'], 'AdjustedUnitNV',
+                                     context['start_date'], context['end_date'])
+
+
+def bench_statistics(data, context):
+    from pages.returns.indicators import calculate_statistics
+    if context['rolling'].empty:
+        return []
+    return [calculate_statistics(fund_returns['annualized_return_rate'].dropna())
+            for _, fund_returns in context['rolling'].groupby('SecuCode')]
+
+
+def bench_daily_returns(data, context):
+    from pages.returns.calculate_returns import calculate_daily_returns
+    return calculate_daily_returns(context['adjusted'].copy(), 'AdjustedUnitNV')
+
+
+def bench_distributions(data, context):
+    from pages.returns.calculate_returns import plot_and_calculate_distributions
+    adjusted = context['adjusted']
+    research_funds = list(adjusted['SecuCode'].unique()[:1])
+    state = {'start_date': context['start_date'], 'end_date': context['end_date'], 'data_frequency': 'D'}
+    statistics_df, _, _, _ = plot_and_calculate_distributions(
+        adjusted[adjusted['SecuCode'].isin(research_funds)], adjusted, research_funds, [], [context['interval']],
+        'AdjustedUnitNV', state=state)
+    return statistics_df
+
+
+def bench_excel(data, context):
+    from pages.returns.adjust_coefficient import generate_excel_file
+    path = generate_excel_file(context['adjusted'])
+    os.remove(path)
+    return context['adjusted']
+
+
+# 测量的步骤：名称 → 函数。滚动收益率的结果供统计指标使用，调整后净值在测量前统一计算；
+# 数据查询使用与模拟数据相同的本地 SQLite 数据库（表结构与生产库相同），测量查询和读取的耗时
+BENCHMARKS = {
+    '数据查询': bench_query,
+    '调整系数': bench_adjustment,
+    '滚动收益率': bench_rolling_returns,
+    '统计指标': bench_statistics,
+    '日收益率': bench_daily_returns,
+    '收益率分布': bench_distributions,
+    'Excel 导出': bench_excel,
+}
+
+
+def prepare_context(data, interval, names, n_funds, years, seed):
+    from pages.returns.indicators import calculate_rolling_returns
+    from pages.returns.nav_data import calculate_adjusted_unitnv, calculate_adjustment_coefficients
+
+    adjusted = calculate_adjusted_unitnv(calculate_adjustment_coefficients(data.copy()))
+    start_date = adjusted['TradingDay'].min()
+    end_date = adjusted['TradingDay'].max()
+    engine = None
+    if '数据查询' in names:
+        from pages.returns.fixture_db import create_fixture_database
+        from pages.returns.nav_data import create_engine_from_config
+
+        path = os.path.join(tempfile.gettempdir(), f'zzb_benchmark_{n_funds}x{years}_{seed}.db')
+        create_fixture_database(path, n_funds, years, seed=seed)
+        engine = create_engine_from_config({'dialect': 'sqlite', 'database': path})
+    return {
+        'engine': engine,
+        'adjusted': adjusted,
+        'interval': interval,
+        'start_date': start_date,
+        'end_date': end_date,
+        'rolling': calculate_rolling_returns(adjusted, interval, 'AdjustedUnitNV', start_date, end_date),
+    }
+
+
+def measure(func, data, context, repeat):
+    """
+    执行 repeat 次，返回耗时（秒）列表、结果行数、最大内存变化（MB），以及各次运行中核密度估计的耗时。
+    """
+    seconds = []
+    kde_seconds = []
+    memory_delta = 0.0
+    rows = None
+    for _ in range(repeat):
+        with collect_spans() as spans:
+            start_rss = current_rss_mb()
+            start = time.perf_counter()
+            result = func(data, context)
+            seconds.append(time.perf_counter() - start)
+            memory_delta = max(memory_delta, current_rss_mb() - start_rss)
+        rows = row_count(result)
+        kde_seconds.append(sum(record['seconds'] for record in spans if record['name'] == '核密度估计'))
+        del result
+    return seconds, rows, memory_delta, kde_seconds
+
+
+def run_benchmarks(scales, names, repeat, interval, version, seed=0):
+    records = []
+    for n_funds, years in scales:
+        data = generate_fund_data(n_funds, years, seed=seed)
+        context = prepare_context(data, interval, names, n_funds, years, seed)
+        print(f"规模 {n_funds} 只基金 × {years} 年：{len(data)} 行")
+        for name in names:
+            seconds, rows, memory_delta, kde_seconds = measure(BENCHMARKS[name], data, context, repeat)
+            record = {
+                'version': version,
+                'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'pandas': pd.__version__,
+                'n_funds': n_funds,
+                'years': years,
+                'input_rows': len(data),
+                'benchmark': name,
+                'repeat': repeat,
+                'min_seconds': round(min(seconds), 6),
+                'median_seconds': round(statistics.median(seconds), 6),
+                'rows': rows,
+                'memory_delta_mb': round(memory_delta, 2),
+            }
+            if any(kde_seconds):
+                record['kde_median_seconds'] = round(statistics.median(kde_seconds), 6)
+            records.append(record)
+            print(f"  {name}: 中位数 {record['median_seconds']:.4f} 秒，最小 {record['min_seconds']:.4f} 秒")
+    return records
+
+
+def append_results(records, path):
+    with open(path, 'a', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+def compare_results(records, path, baseline):
+    """
+    与结果文件中版本为 baseline 的最近一次结果对比中位数耗时，比值小于 1 表示变快。
+    """
+    if not os.path.exists(path):
+        return pd.DataFrame()
+    history = pd.read_json(path, lines=True)
+    history = history[history['version'] == baseline]
+    if history.empty:
+        return pd.DataFrame()
+
+    keys = ['n_funds', 'years', 'benchmark']
+    baseline_df = history.drop_duplicates(keys, keep='last').set_index(keys)['median_seconds']
+    current_df = pd.DataFrame(records).set_index(keys)['median_seconds']
+    comparison = pd.DataFrame({'基准耗时秒': baseline_df, '本次耗时秒': current_df}).dropna()
+    comparison['比值'] = (comparison['本次耗时秒'] / comparison['基准耗时秒']).round(3)
+    return comparison
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="用模拟净值数据测量主要计算步骤的耗时")
+    parser.add_argument('--scales', default=DEFAULT_SCALES, help="测试规模，逗号分隔的 基金数x年数，如 10x2,100x5")
+    parser.add_argument('--functions', default=','.join(BENCHMARKS),
+                        help=f"测量的步骤，逗号分隔，可选：{'、'.join(BENCHMARKS)}")
+    parser.add_argument('--repeat', type=int, default=3, help="每个步骤重复次数，取中位数和最小值")
+    parser.add_argument('--interval', type=float, default=1, help="滚动区间（年）")
+    parser.add_argument('--seed', type=int, default=0, help="模拟数据的随机数种子")
+    parser.add_argument('--label', default=None, help="本次结果的版本标签，默认为当前 git 提交")
+    parser.add_argument('--results', default=DEFAULT_RESULTS_PATH, help="结果文件（JSON Lines），每次运行追加")
+    parser.add_argument('--compare', default=None, help="与结果文件中该版本标签的结果对比")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    names = [name.strip() for name in args.functions.split(',') if name.strip()]
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        raise SystemExit(f"未知的步骤：{'、'.join(unknown)}")
+
+    # 年数不超过滚动区间时没有完整的窗口，滚动收益率、统计指标和收益率分布都没有可测量的内容
+    scales = parse_scales(args.scales)
+    too_short = [f'{n_funds}x{years}' for n_funds, years in scales if years <= args.interval]
+    if too_short:
+        raise SystemExit(f"规模 {'、'.join(too_short)} 的年数需大于滚动区间 {args.interval:g} 年")
+
+    version = args.label or current_version()
+    records = run_benchmarks(scales, names, args.repeat, args.interval, version, args.seed)
+
+    if args.compare:
+        comparison = compare_results(records, args.results, args.compare)
+        if comparison.empty:
+            print(f"结果文件中没有版本 {args.compare} 的可比结果")
+        else:
+            print(comparison.to_string())
+
+    append_results(records, args.results)
+    print(f"结果已追加到 {args.results}（版本 {version}）")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+"""
+生成本地 SQLite 测试数据库，表结构与生产库相同（SecuMain、MF_NetValuePerformanceHis、MF_FundNetValueRe、
+MF_Dividend、MF_SharesSplit），数据为模拟基金净值，用于离线运行页面、批处理和压测。
+
+用法示例:
+    python fixture.py --output fixture.db --funds 1000 --years 10
+
+生成后把 .streamlit/secrets.toml 中 [connections.my_database] 改为:
+    dialect = "sqlite"
+    database = "fixture.db"
+"""
+import argparse
+import datetime
+import time
+
+from pages.returns.fixture_db import create_fixture_database
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="生成与生产库表结构相同的本地 SQLite 测试数据库")
+    parser.add_argument('--output', default='fixture.db', help="数据库文件，已存在时覆盖")
+    parser.add_argument('--funds', type=int, default=100, help="基金数量")
+    parser.add_argument('--years', type=int, default=5, help="年数")
+    parser.add_argument('--end', type=datetime.date.fromisoformat, default=datetime.date(2024, 12, 31),
+                        help="最后一个交易日 YYYY-MM-DD")
+    parser.add_argument('--seed', type=int, default=0, help="随机数种子")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    start_time = time.perf_counter()
+    rows = create_fixture_database(args.output, args.funds, args.years, end_date=args.end, seed=args.seed)
+    print(f"已生成 {args.output}：{args.funds} 只基金，{rows} 行净值，用时 {time.perf_counter() - start_time:.1f} 秒")
+
+
+if __name__ == '__main__':
+    main()
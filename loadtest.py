@@ -0,0 +1,101 @@
+"""
+本地压测指标接口：多个并发连接按随机的基金组合和区间请求接口，统计吞吐量、延迟分位数、缓存命中和错误。
+
+用法示例:
+    python api.py --secrets fixture.toml &
+    python loadtest.py --codes funds.txt --start 2020-01-01 --requests 500 --concurrency 16 --format arrow
+
+--distinct 控制请求参数组合的数量：取值小时大部分请求命中缓存，取值大时主要测试计算能力。
+"""
+import argparse
+import collections
+import random
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from batch import read_fund_codes
+
+
+def build_requests(base_url, endpoints, codes, start, end, intervals, batch_size, distinct, fmt, count, seed):
+    """
+    生成 count 个请求 URL，从 distinct 种参数组合中随机抽取。
+    """
+    rng = random.Random(seed)
+    variants = []
+    for _ in range(distinct):
+        endpoint = rng.choice(endpoints)
+        params = {'codes': ','.join(sorted(rng.sample(codes, min(batch_size, len(codes))))), 'start': start,
+                  'format': fmt}
+        if end:
+            params['end'] = end
+        if endpoint != 'nav':
+            params['interval'] = rng.choice(intervals)
+        variants.append(f'{base_url}/{endpoint}?{urllib.parse.urlencode(params)}')
+    return [rng.choice(variants) for _ in range(count)]
+
+
+def fetch(url, timeout):
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            body = response.read()
+            return response.status, time.perf_counter() - start, len(body), response.headers.get('X-Cache')
+    except urllib.error.HTTPError as e:
+        return e.code, time.perf_counter() - start, 0, None
+    except OSError:
+        return 'error', time.perf_counter() - start, 0, None
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="指标接口压测")
+    parser.add_argument('--url', default='http://127.0.0.1:8000', help="接口地址")
+    parser.add_argument('--codes', required=True, help="基金代码文件（txt / csv / xlsx），请求从中随机抽取")
+    parser.add_argument('--start', required=True, help="开始日期 YYYY-MM-DD")
+    parser.add_argument('--end', help="结束日期 YYYY-MM-DD，默认由接口取今天")
+    parser.add_argument('--endpoints', default='nav,rolling,statistics', help="请求的接口，逗号分隔")
+    parser.add_argument('--intervals', default='0.5,1,3', help="滚动区间（年），逗号分隔")
+    parser.add_argument('--batch-size', type=int, default=5, help="每个请求包含的基金数")
+    parser.add_argument('--distinct', type=int, default=20, help="不同参数组合的数量")
+    parser.add_argument('--format', choices=['json', 'arrow'], default='json', help="响应格式")
+    parser.add_argument('--requests', type=int, default=200, help="请求总数")
+    parser.add_argument('--concurrency', type=int, default=8, help="并发连接数")
+    parser.add_argument('--timeout', type=float, default=120, help="单个请求的超时（秒）")
+    parser.add_argument('--seed', type=int, default=0, help="随机种子")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    codes = read_fund_codes(args.codes)
+    urls = build_requests(args.url.rstrip('/'), args.endpoints.split(','), codes, args.start, args.end,
+                          args.intervals.split(','), args.batch_size, args.distinct, args.format, args.requests,
+                          args.seed)
+
+    print(f"{len(urls)} 个请求，{args.distinct} 种参数组合，{args.concurrency} 个并发连接，格式 {args.format}")
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(executor.map(lambda url: fetch(url, args.timeout), urls))
+    elapsed = time.perf_counter() - start
+
+    statuses = collections.Counter(status for status, _, _, _ in results)
+    cache = collections.Counter(cache for _, _, _, cache in results if cache)
+    latencies = np.array([seconds for status, seconds, _, _ in results if status == 200]) * 1000
+    total_bytes = sum(size for _, _, size, _ in results)
+
+    print(f"用时 {elapsed:.2f} 秒，吞吐量 {len(results) / elapsed:.1f} 请求/秒，"
+          f"传输 {total_bytes / 1024 / 1024:.2f} MB")
+    print(f"状态: {dict(statuses)}，缓存: {dict(cache)}")
+    if len(latencies):
+        p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+        print(f"延迟（毫秒）: 平均 {latencies.mean():.1f}，p50 {p50:.1f}，p90 {p90:.1f}，p99 {p99:.1f}，"
+              f"最大 {latencies.max():.1f}")
+    return 0 if statuses.get(200, 0) == len(results) else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
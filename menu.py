@@ -1,17 +1,61 @@
-from pages.home import show as home_show
-from pages.returns.adjust_coefficient import show as adjust_coefficient_show
-from pages.returns.calculate_returns import show as calculate_returns_show
+import importlib
+import sys
+import time
 
-# 定义一个字典，键为菜单项名称，值为对应的页面主函数
+import pandas as pd
+import streamlit as st
+
+# 定义一个字典，键为菜单项名称，值为对应的页面模块；页面模块在第一次被选中时才导入
 menu_dict = {
-    "Home": home_show,
-    "净值分析": adjust_coefficient_show,
-    "收益率分析": calculate_returns_show,
+    "Home": "pages.home",
+    "净值分析": "pages.returns.adjust_coefficient",
+    "收益率分析": "pages.returns.calculate_returns",
 }
 
+# 每个页面模块第一次导入的耗时（秒），进程内共享
+page_import_seconds = {}
+
+# 进程内第一次运行应用脚本的耗时（秒）
+first_run_seconds = {}
+
+
+def load_page(selected_menu):
+    """
+    导入菜单项对应的页面模块并返回其 show 函数。模块导入后由 Python 缓存，之后的选择不再有导入开销。
+    """
+    module_name = menu_dict[selected_menu]
+    if module_name in sys.modules:
+        return sys.modules[module_name].show
+
+    start = time.perf_counter()
+    module = importlib.import_module(module_name)
+    page_import_seconds[module_name] = time.perf_counter() - start
+    return module.show
+
+
 def run_menu(selected_menu):
     # 根据用户选择的菜单项，调用对应的页面函数
     if selected_menu in menu_dict:
-        menu_dict[selected_menu]()
+        load_page(selected_menu)()
     else:
         st.error(f"Page '{selected_menu}' not found.")
+
+
+def show_startup_report(script_seconds):
+    """
+    在侧边栏显示启动耗时：进程内第一次运行、本次运行的脚本耗时，以及各页面模块第一次导入的耗时。
+    页面按需导入后，只打开 Home 时不再需要支付其他页面（scipy、plotly、数据库引擎等）的导入开销。
+    """
+    first_run_seconds.setdefault('seconds', script_seconds)
+    with st.sidebar.expander("启动耗时"):
+        st.caption(f"首次运行 {first_run_seconds['seconds']:.2f} 秒，本次运行 {script_seconds:.2f} 秒")
+        if page_import_seconds:
+            report = pd.DataFrame({
+                '页面': [name for name, module in menu_dict.items() if module in page_import_seconds],
+                '首次导入耗时（秒）': [round(page_import_seconds[module], 3) for module in menu_dict.values()
+                                   if module in page_import_seconds],
+            })
+            st.dataframe(report, hide_index=True)
+        not_loaded = [name for name, module in menu_dict.items() if module not in sys.modules]
+        if not_loaded:
+            st.caption(f"尚未导入的页面：{'、'.join(not_loaded)}")
@@ -1,110 +1,72 @@
 import streamlit as st
 import pandas as pd
-from io import BytesIO
+import numpy as np
 import datetime
+import io
+import logging
+import time
 import streamlit_antd_components as sac
-from sqlalchemy import create_engine, text
-import plotly.express as px
-import plotly.graph_objects as go
+
+from pages.returns.chart_rendering import (DEFAULT_MAX_POINTS, cached_build, data_fingerprint, date_bounds, line_trace,
+                                           should_use_webgl, zoom_date_range)
+from pages.returns.comparison_pools import delete_pool, load_pools, record_pool_use, save_pool
+from pages.returns.code_upload import CODE_FILE_TYPES, check_size, content_hash, read_codes
+from pages.returns.export import EXCEL_MAX_ROWS, export_dataframe, export_download_button
+from pages.returns.fund_index import FUND_INDEX_TTL_SECONDS, build_fund_index, search_funds, validate_codes
+from pages.returns.jobs import job_progress, job_state, pop_finished_job, show_job_result, start_job
+from pages.returns.nav_data import (DATA_FREQUENCIES, calculate_adjusted_unitnv, calculate_adjustment_coefficients,
+                                     create_engine_from_config, fetch_fund_data, fetch_fund_universe,
+                                     resample_fund_data)
+from pages.returns.perf import timed
+from pages.returns.pool_preload import DEFAULT_START_DATE, seed_session_cache, start_preload
+from pages.returns.table_view import paginated_dataframe
+
+
+logger = logging.getLogger('zzb.fund_index')
 
 
 @st.cache_resource
 def create_db_engine():
-    db_config = st.secrets["connections"]["my_database"]
+    # 数据库引擎在第一次查询时才创建，打开页面本身不连接数据库
+    return create_engine_from_config(st.secrets["connections"]["my_database"])
 
-    # 构建连接字符串
-    driver = db_config["driver"].replace(" ", "+")  # 替换空格为加号
-    user = db_config["username"]
-    password = db_config["password"]
-    server = db_config["host"]
-    port = db_config["port"]
-    database = db_config["database"]
 
-    con_str = f"mssql+pyodbc://{user}:{password}@{server}:{port}/{database}?driver={driver}"
-    engine = create_engine(con_str, fast_executemany=True)
-    return engine
+@st.cache_resource(ttl=FUND_INDEX_TTL_SECONDS, show_spinner="正在加载基金代码索引...")
+def get_fund_index():
+    """
+    进程内共享的基金代码索引，按 FUND_INDEX_TTL_SECONDS 定时刷新。数据库不可用时抛出异常，由调用方处理。
+    """
+    return build_fund_index(fetch_fund_universe(create_db_engine()))
 
 
-engine = create_db_engine()
+def load_fund_index():
+    try:
+        return get_fund_index()
+    except Exception:
+        logger.exception("加载基金代码索引时出错")
+        return None
+
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def parse_code_file(digest, extension, _content):
+    """
+    按文件内容的哈希缓存解析结果，同一个文件在重新运行时不再重复解析。
+    """
+    return read_codes(io.BytesIO(_content), extension)
 
 
-@st.cache_data
-def query_fund_data(_engine, fund_main_code, start_date, end_date):
+def read_uploaded_codes(uploaded_file):
+    """
+    读取上传文件中的基金代码：超过大小上限时在读取内容之前拒绝，出错时显示错误并返回 None。
+    """
     try:
-        with _engine.connect() as conn:
-            # 创建临时表
-            create_temp_table_sql = '''
-            CREATE TABLE #MainCodes (
-                SecuCode VARCHAR(50)
-            );
-            '''
-            conn.execute(text(create_temp_table_sql))
-
-            # 插入数据到临时表
-            insert_sql = 'INSERT INTO #MainCodes (SecuCode) VALUES (:secu_code)'
-            for secu_code in fund_main_code:
-                conn.execute(text(insert_sql), {"secu_code": secu_code})
-
-            # 确保日期参数转换为字符串格式 YYYY-MM-DD
-            start_date_str = start_date.strftime('%Y-%m-%d')
-            end_date_str = end_date.strftime('%Y-%m-%d')
-
-            # 查询拆分、分红和净值数据，直接返回结果
-            sql = '''
-            WITH AllDates AS (
-                SELECT m.InnerCode, m.TradingDay
-                FROM MF_NetValuePerformanceHis m
-                WHERE m.TradingDay BETWEEN :start_date AND :end_date
-                UNION ALL
-                SELECT d.InnerCode, d.ExRightDate AS TradingDay
-                FROM MF_Dividend d
-                WHERE d.ExRightDate BETWEEN :start_date AND :end_date
-                UNION ALL
-                SELECT ss.InnerCode, ss.ActualSplitDay AS TradingDay
-                FROM MF_SharesSplit ss
-                WHERE ss.ActualSplitDay BETWEEN :start_date AND :end_date
-            )
-            SELECT 
-                a.InnerCode, 
-                s.SecuCode, 
-                s.ChiName, 
-                a.TradingDay,
-                MAX(d.ActualRatioAfterTax / 10) AS ActualRatioAfterTax,   -- 聚合分红数据
-                MAX(ss.SplitRatio) AS SplitRatio,                        -- 聚合拆分数据
-                MAX(m.UnitNV) AS UnitNV,                                 -- 聚合单位净值数据
-                MAX(f.UnitNVRestored) AS UnitNVRestored                  -- 聚合复权单位净值数据
-            FROM AllDates a
-            LEFT JOIN SecuMain s ON a.InnerCode = s.InnerCode
-            LEFT JOIN MF_Dividend d ON a.InnerCode = d.InnerCode AND a.TradingDay = d.ExRightDate
-            LEFT JOIN MF_SharesSplit ss ON a.InnerCode = ss.InnerCode AND a.TradingDay = ss.ActualSplitDay
-            LEFT JOIN MF_NetValuePerformanceHis m ON a.InnerCode = m.InnerCode AND a.TradingDay = m.TradingDay
-            LEFT JOIN MF_FundNetValueRe f ON a.InnerCode = f.InnerCode AND a.TradingDay = f.TradingDay
-            JOIN #MainCodes mc ON s.SecuCode = mc.SecuCode  -- 使用 SecuMain 表关联 SecuCode
-            WHERE s.SecuCategory = 8
-            GROUP BY 
-                a.InnerCode, 
-                s.SecuCode, 
-                s.ChiName, 
-                a.TradingDay
-            ORDER BY 
-                s.SecuCode, 
-                a.TradingDay;
-
-
-            '''
-
-            # 确保 `params` 正确绑定日期
-            df = pd.read_sql_query(text(sql), conn, params={"start_date": start_date_str, "end_date": end_date_str})
-
-            # 清除临时表
-            conn.execute(text('DROP TABLE #MainCodes'))
-
-        return df
-
-    except Exception as e:
-        st.error(f"查询数据时出错: {e}")
-        print(f"查询数据时出错: {e}")
-        return pd.DataFrame()  # 返回空数据框以防止应用崩溃
+        check_size(uploaded_file.size)
+        content = uploaded_file.getvalue()
+        extension = uploaded_file.name.rsplit('.', 1)[-1].lower()
+        return parse_code_file(content_hash(content), extension, content)
+    except ValueError as e:
+        st.error(str(e))
+        return None
 
 
 # def show():
@@ -185,16 +147,15 @@ def secucode_input(key=""):
 
     # 根据 sac.switch 的开关状态显示上传器，添加唯一的 key
     if show_uploader:
-        uploaded_file = st.file_uploader("上传一个包含 SecuCode 的 Excel 文件", type="xlsx", key=f"{key}_file_uploader")
+        uploaded_file = st.file_uploader("上传一个包含 SecuCode 列的 Excel / CSV 文件，或每行一个代码的文本文件",
+                                         type=CODE_FILE_TYPES, key=f"{key}_file_uploader")
         if uploaded_file is not None:
             # 处理上传的文件
-            df = pd.read_excel(uploaded_file, converters={'SecuCode': str})
-            if 'SecuCode' in df.columns:
-                secucodes = df['SecuCode'].dropna().tolist()
+            codes = read_uploaded_codes(uploaded_file)
+            if codes is not None:
+                secucodes = codes
                 st.session_state['secucodes'] = secucodes
                 st.success(f"成功读取 {len(secucodes)} 个基金代码")
-            else:
-                st.error("文件中未找到 'SecuCode' 列")
 
     return st.session_state.get('secucodes', [])
 
@@ -207,9 +168,9 @@ def get_net_value_data():
     return st.session_state.get('net_value_data', pd.DataFrame())
 
 
-def download_large_dataframe(df, filename="data.xlsx", sheet_name_prefix="Sheet", max_rows_per_sheet=1048576):
+def download_large_dataframe(df, filename="data.xlsx", sheet_name_prefix="Sheet", max_rows_per_sheet=EXCEL_MAX_ROWS):
     """
-    将一个大的 DataFrame 拆分成多个工作表，并生成下载按钮。
+    将一个大的 DataFrame 拆分成多个工作表流式写入临时文件，并生成下载按钮。
 
     :param df: 需要下载的 DataFrame
     :param filename: 下载的文件名
@@ -217,24 +178,15 @@ def download_large_dataframe(df, filename="data.xlsx", sheet_name_prefix="Sheet"
     :param max_rows_per_sheet: 每个工作表最多包含的行数
     :return: 生成 Streamlit 下载按钮
     """
-    output = BytesIO()
-
-    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        num_sheets = (len(df) // max_rows_per_sheet) + 1
+    path = generate_excel_file(df, sheet_name_prefix, max_rows_per_sheet)
 
-        for i in range(num_sheets):
-            start_row = i * max_rows_per_sheet
-            end_row = start_row + max_rows_per_sheet
-            df.iloc[start_row:end_row].to_excel(writer, index=False, sheet_name=f'{sheet_name_prefix}{i + 1}')
-
-    processed_data = output.getvalue()
-
-    st.download_button(
-        label=f"下载结果为 {filename}",
-        data=processed_data,
-        file_name=filename,
-        mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
+    with open(path, 'rb') as f:
+        st.download_button(
+            label=f"下载结果为 {filename}",
+            data=f,
+            file_name=filename,
+            mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        )
 
 
 # 设置页面配置为宽模式
@@ -261,27 +213,16 @@ def download_large_dataframe(df, filename="data.xlsx", sheet_name_prefix="Sheet"
 #     return data
 
 
-@st.cache_data
 def generate_excel_file(df, sheet_name_prefix="Sheet", max_rows_per_sheet=1000000):
     """
-    生成 Excel 文件并缓存起来。
+    以 constant_memory 模式将 DataFrame 流式写入临时 Excel 文件，内存占用与行数无关。
 
     :param df: 需要下载的 DataFrame
     :param sheet_name_prefix: 每个工作表的前缀名称
     :param max_rows_per_sheet: 每个工作表最多包含的行数
-    :return: 生成的 Excel 文件数据
+    :return: 生成的 Excel 文件路径
     """
-    output = BytesIO()
-
-    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        num_sheets = (len(df) // max_rows_per_sheet) + 1
-
-        for i in range(num_sheets):
-            start_row = i * max_rows_per_sheet
-            end_row = start_row + max_rows_per_sheet
-            df.iloc[start_row:end_row].to_excel(writer, index=False, sheet_name=f'{sheet_name_prefix}{i + 1}')
-
-    return output.getvalue()
+    return export_dataframe(df, 'xlsx', sheet_name_prefix=sheet_name_prefix, max_rows_per_sheet=max_rows_per_sheet)
 
 
 # def show():
@@ -328,26 +269,60 @@ def generate_excel_file(df, sheet_name_prefix="Sheet", max_rows_per_sheet=100000
 
 
 # 各个计算函数
-def calculate_adjustment_coefficients(data):
-    # 确保 SplitRatio 列为数值类型，如果不能转换则填充为 1.0
-    data['SplitRatio'] = pd.to_numeric(data['SplitRatio'], errors='coerce').fillna(1.0)
-
-    # 确保 ActualRatioAfterTax 列为数值类型，如果不能转换则填充为 0.0
-    data['ActualRatioAfterTax'] = pd.to_numeric(data['ActualRatioAfterTax'], errors='coerce').fillna(0.0)
-
-    data['a'] = 1.0
-    data['b'] = 0.0
+def update_comparison_pool(_engine, comparison_fund_list, start_date, end_date, state=None):
+    """
+    增量更新对比基金池的净值数据。
 
-    data['a'] = data.groupby('SecuCode')['SplitRatio'].cumprod()
-    data['b'] = (
-            data['a'].shift(1, fill_value=1.0) * data['ActualRatioAfterTax']
-    ).groupby(data['SecuCode']).cumsum()
-    return data
+    每只基金的查询和调整系数结果按基金代码缓存在 session_state 中，
+    基金池变动时只查询和计算新增的基金，删除的基金直接丢弃；
+    日期区间变化时缓存全部失效。
 
+    参数:
+    - _engine: 数据库引擎
+    - comparison_fund_list: 对比基金代码列表
+    - start_date: 开始日期
+    - end_date: 结束日期
+    - state: 保存缓存的字典，默认为 st.session_state；在后台任务中传入普通字典，任务结束后由页面写回
 
-def calculate_adjusted_unitnv(data):
-    data['AdjustedUnitNV'] = data['UnitNV'] * data['a'] + data['b']
-    return data
+    查询出错时抛出异常，缓存中不会记录这次新增的基金。
+    """
+    state = st.session_state if state is None else state
+    cache = state.get('comparison_fund_cache')
+    if cache is None or cache['date_range'] != (start_date, end_date):
+        cache = {'date_range': (start_date, end_date), 'funds': {}}
+        # 日期区间变化后，基金级别的滚动收益率缓存也一并失效
+        state['comparison_rolling_cache'] = {}
+    state['comparison_fund_cache'] = cache
+
+    fund_cache = cache['funds']
+    pool = set(comparison_fund_list)
+    added = sorted(pool - set(fund_cache))
+    removed = sorted(set(fund_cache) - pool)
+
+    # 删除的基金：丢弃净值数据和滚动收益率缓存
+    rolling_cache = state.setdefault('comparison_rolling_cache', {})
+    for secu_code in removed:
+        fund_cache.pop(secu_code, None)
+        rolling_cache.pop(secu_code, None)
+
+    # 新增的基金：只查询和计算这一部分。查询出错时异常直接抛出，新增基金不写入缓存，下次重新查询
+    if added:
+        added_df = fetch_fund_data(_engine, added, start_date, end_date)
+        queried = {}
+        if not added_df.empty:
+            added_df = calculate_adjustment_coefficients(added_df)
+            added_df = calculate_adjusted_unitnv(added_df)
+            queried = dict(tuple(added_df.groupby('SecuCode')))
+        # 查询成功但确实没有返回任何行的基金记录为空，避免每次都重新查询
+        for secu_code in added:
+            fund_cache[secu_code] = queried.get(secu_code, pd.DataFrame())
+
+    state['comparison_pool_changes'] = {'added': added, 'removed': removed}
+
+    frames = [fund_cache[secu_code] for secu_code in sorted(pool) if not fund_cache[secu_code].empty]
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
 
 
 def secucode_input_with_upload(label, text_input_label, upload_button_label, key):
@@ -386,32 +361,306 @@ def secucode_input_with_upload(label, text_input_label, upload_button_label, key
     with col1:
         st.session_state[f'{key}_input'] = st.text_input(text_input_label, value=st.session_state[f'{key}_input'])
 
+    # 按代码或名称搜索基金，选中的基金与手动输入、上传的代码合并
+    fund_index = load_fund_index()
+    if fund_index is not None:
+        search_query = st.text_input("搜索基金（代码前缀或名称关键字）", key=f"{key}_search")
+        matches = search_funds(fund_index, search_query)
+        options = dict(zip(matches['SecuCode'] + ' ' + matches['ChiName'], matches['SecuCode']))
+        # 保留之前选中的基金，搜索关键字改变后仍然有效
+        selected = st.session_state.get(f'{key}_search_selected', [])
+        options.update({label: label.split(' ', 1)[0] for label in selected})
+        st.multiselect("搜索结果", list(options), key=f'{key}_search_selected')
+
     with col2:
         if st.button(upload_button_label, key=f"{key}_upload_button"):
             st.session_state[f'{key}_upload'] = not st.session_state[f'{key}_upload']
 
     # 如果按钮被点击，显示上传框
     if st.session_state[f'{key}_upload']:
-        uploaded_file = st.file_uploader("上传文件", type="xlsx", key=f"{key}_file_uploader")
+        uploaded_file = st.file_uploader("上传文件", type=CODE_FILE_TYPES, key=f"{key}_file_uploader")
         if uploaded_file is not None:
-            df = pd.read_excel(uploaded_file, converters={'SecuCode': str})
-            st.session_state[f"{key}_data"] = df['SecuCode'].tolist()  # 假设文件中有 'SecuCode' 列
-            st.success(f"上传成功，共读取到 {len(df)} 条基金代码")
+            codes = read_uploaded_codes(uploaded_file)
+            if codes is not None:
+                st.session_state[f"{key}_data"] = codes
+                st.success(f"上传成功，共读取到 {len(codes)} 条基金代码")
         else:
-            st.warning("请上传一个包含基金代码的 Excel 文件")
+            st.warning("请上传一个包含 SecuCode 列的 Excel / CSV 文件，或每行一个代码的文本文件")
 
     # 合并手动输入的基金代码和上传的基金代码
     all_fund_codes = st.session_state[f'{key}_input'].split(',') if st.session_state[f'{key}_input'] else []
     if f'{key}_data' in st.session_state:
         all_fund_codes += st.session_state[f'{key}_data']
 
-    # 更新 secucodes 到 session_state
-    st.session_state[f'{key}_codes'] = list(set([x.strip() for x in all_fund_codes if x.strip()]))
+    if fund_index is not None:
+        all_fund_codes += [label.split(' ', 1)[0] for label in st.session_state.get(f'{key}_search_selected', [])]
+
+    # 查询净值之前在索引中校验代码：去除重复和不存在的代码；索引不可用时只去重
+    if fund_index is not None:
+        validation = validate_codes(fund_index, all_fund_codes)
+        if validation.duplicates:
+            st.info(f"已去除重复的基金代码：{'、'.join(validation.duplicates[:20])}")
+        if validation.unknown:
+            st.warning(f"以下 {len(validation.unknown)} 个基金代码不存在，已忽略：{'、'.join(validation.unknown[:20])}")
+        st.session_state[f'{key}_codes'] = validation.valid
+    else:
+        st.session_state[f'{key}_codes'] = list(dict.fromkeys(str(x).strip() for x in all_fund_codes
+                                                             if str(x).strip()))
 
     # 返回 session_state 中的基金代码列表，保持与之前的逻辑一致
     return st.session_state.get(f'{key}_codes', [])
 
 
+# 净值表格中可选显示的内容与对应的列
+DISPLAY_COLUMNS = {
+    '调整系数 (a, b)': ['a', 'b'],
+    '调整后净值': ['AdjustedUnitNV'],
+    '复权单位净值': ['UnitNVRestored'],
+}
+
+# 净值表格的列顺序
+DISPLAY_COLUMNS_ORDER = ['SecuCode', 'ChiName', 'TradingDay', 'UnitNV', 'a', 'b', 'AdjustedUnitNV', 'UnitNVRestored']
+
+
+def build_fund_row_index(data):
+    """
+    计算每只基金在数据中的行范围 {SecuCode: (起始行, 结束行)}。
+
+    查询结果按 SecuCode、TradingDay 排序，同一只基金的行是连续的；
+    如果不连续则返回 None，调用方退回到 isin 过滤。
+    """
+    codes = data['SecuCode'].to_numpy()
+    if len(codes) == 0:
+        return {}
+
+    boundaries = np.flatnonzero(codes[1:] != codes[:-1]) + 1
+    starts = np.concatenate([[0], boundaries])
+    stops = np.concatenate([boundaries, [len(codes)]])
+    if len(set(codes[starts])) != len(starts):
+        return None
+    return {code: (int(start), int(stop)) for code, start, stop in zip(codes[starts], starts, stops)}
+
+
+def select_fund_rows(data, fund_row_index, secucodes):
+    """
+    按基金行范围取出指定基金的行，代替 data[data['SecuCode'].isin(secucodes)]，结果保持原有行顺序。
+    """
+    if fund_row_index is None:
+        return data[data['SecuCode'].isin(secucodes)]
+
+    ranges = sorted(fund_row_index[code] for code in set(secucodes) if code in fund_row_index)
+    if not ranges:
+        return data.iloc[0:0]
+    if len(ranges) == len(fund_row_index):
+        return data
+    positions = np.concatenate([np.arange(start, stop) for start, stop in ranges])
+    return data.iloc[positions]
+
+
+# 图表中的曲线名称与净值列的对应关系
+NAV_CHART_COLUMNS = {
+    '累计净值': 'UnitNV',
+    '调整后净值': 'AdjustedUnitNV',
+    '复权单位净值': 'UnitNVRestored',
+}
+
+
+@timed('图表构建')
+def build_nav_figure(result_df, series_columns, zoom_start, zoom_end, max_points=DEFAULT_MAX_POINTS):
+    """
+    绘制基金净值曲线。
+
+    参数:
+    - result_df: 计算完调整后净值的基金数据
+    - series_columns: 需要绘制的曲线名称，见 NAV_CHART_COLUMNS
+    - zoom_start, zoom_end: 绘制的日期区间
+    - max_points: 每条曲线降采样后的最大点数
+    """
+    import plotly.graph_objects as go
+
+    plot_data = result_df[(result_df['TradingDay'] >= zoom_start) & (result_df['TradingDay'] <= zoom_end)]
+
+    # 每条曲线用 LTTB 降采样到像素级点数，总点数较多时改用 WebGL 渲染
+    fund_groups = list(plot_data.groupby('SecuCode'))
+    total_points = sum(min(len(fund_data), max_points) for _, fund_data in fund_groups)
+    use_webgl = should_use_webgl(total_points * len(series_columns))
+
+    fig = go.Figure()
+
+    # 根据基金代码分组
+    for fund_code, fund_data in fund_groups:
+        for column in series_columns:
+            fig.add_trace(line_trace(fund_data['TradingDay'], fund_data[NAV_CHART_COLUMNS[column]],
+                                     f'{fund_code} {column}', max_points, use_webgl))
+
+    fig.update_layout(
+        width=1200,  # 设置图表的宽度
+        height=500,  # 设置图表的高度
+        title="基金净值曲线",
+        # xaxis_title="日期",
+        yaxis_title="净值",
+        hovermode='x unified',  # 设置 hovermode
+        legend=dict(
+            orientation="h",  # 将图例横向排列
+            yanchor="bottom",  # 图例的 y 锚点设为底部
+            y=-0.2,  # 图例放在图表的下方
+            xanchor="center",  # 图例的 x 锚点设为中心
+            x=0.5  # 将图例居中
+        ),
+
+        # 自定义 X 轴
+        xaxis=dict(
+            tickformat="%Y-%m-%d",  # 显示年份、月份、日期
+            # dtick="M6",  # 每6个月显示一个刻度
+            nticks=10,
+            ticklabelmode="period",  # 设置日期刻度的显示方式
+            showline=True,  # 显示X轴线
+            linewidth=1.5,  # X轴线宽度
+            linecolor='grey',  # X轴线颜色
+            ticks="inside",  # 刻度线在外
+            ticklen=4,  # 刻度线的长度
+            tickwidth=1,  # 刻度线宽度
+            tickcolor='grey'  # 刻度线颜色
+        ),
+
+        # 自定义 Y 轴
+        yaxis=dict(
+            showline=True,  # 显示Y轴线
+            linewidth=1.5,  # Y轴线宽度
+            linecolor='grey',  # Y轴线颜色
+            ticks="inside",  # 刻度线在外
+            ticklen=4,  # 刻度线的长度
+            tickwidth=1,  # 刻度线宽度
+            tickcolor='grey'  # 刻度线颜色
+        ),
+
+        # 自定义图表背景
+        plot_bgcolor='white',  # 设置背景颜色为白色
+    )
+
+    return fig
+
+
+def run_nav_query(_engine, secucodes, comparison_fund_list, start_date, end_date, frequency, state, progress):
+    """
+    后台任务：查询研究基金和对比基金池的数据，计算调整系数和调整后净值，按频率重采样。
+
+    任务在工作线程中执行，不访问 session_state；对比基金池的缓存通过 state 传入，
+    结果和更新后的缓存一起返回，由页面写回 session_state。
+
+    参数:
+    - _engine: 数据库引擎
+    - secucodes: 研究基金代码列表
+    - comparison_fund_list: 对比基金代码列表，没有对比基金池时为 None
+    - start_date: 开始日期
+    - end_date: 结束日期
+    - frequency: DATA_FREQUENCIES 中的频率
+    - state: 对比基金池缓存（comparison_fund_cache、comparison_rolling_cache）
+    - progress: 汇报阶段进度的回调
+
+    返回:
+    - 结果字典，研究基金没有数据时返回 None
+    """
+    progress('查询研究基金数据', 0.05)
+    # 查询出错时异常直接抛出，任务标记为失败并由页面显示错误，不会被当作没有数据
+    result_df = fetch_fund_data(_engine, secucodes, start_date, end_date)
+    if result_df.empty:
+        return None
+
+    # 计算调整系数和调整后的净值
+    progress('计算调整系数和调整后净值', 0.3)
+    result_df = calculate_adjustment_coefficients(result_df)
+    result_df = calculate_adjusted_unitnv(result_df)
+
+    # 按选择的频率重采样，后续滚动收益率、统计、核密度和绘图都基于重采样后的数据
+    progress('重采样', 0.4)
+    resample_start = time.perf_counter()
+    daily_rows = len(result_df)
+    result_df = resample_fund_data(result_df, frequency)
+    resample_seconds = time.perf_counter() - resample_start
+    resample_summary = {'研究基金': (daily_rows, len(result_df))}
+
+    result = {
+        'result_df': result_df,
+        'result_fingerprint': data_fingerprint(result_df),
+    }
+
+    # 对比基金池处理
+    if comparison_fund_list:
+        # 增量查询并计算对比基金的调整系数和净值
+        progress('增量更新对比基金池', 0.6)
+        comparison_df = update_comparison_pool(_engine, comparison_fund_list, start_date, end_date, state=state)
+        if not comparison_df.empty:
+            progress('对比基金池重采样', 0.85)
+            resample_start = time.perf_counter()
+            daily_rows = len(comparison_df)
+            comparison_df = resample_fund_data(comparison_df, frequency)
+            resample_seconds += time.perf_counter() - resample_start
+            resample_summary['对比基金池'] = (daily_rows, len(comparison_df))
+            result['comparison_df'] = comparison_df
+
+    result.update(state)
+    return {'state': result, 'resample_summary': resample_summary, 'resample_seconds': resample_seconds}
+
+
+def named_comparison_pools(comparison_fund_pool):
+    """
+    加载、保存和删除命名对比基金池。加载时优先使用后台预热的净值和滚动收益率缓存；
+    保存后立即在后台预热该基金池。
+    """
+    try:
+        pools = load_pools()
+    except (OSError, ValueError) as e:
+        st.error(f"读取命名基金池时出错: {e}")
+        return
+
+    with st.expander("命名基金池"):
+        col1, col2, col3 = st.columns([3, 1, 1])
+        with col1:
+            selected = st.selectbox("已保存的基金池", list(pools), index=None, placeholder="选择基金池",
+                                    key="named_pool_selected")
+        with col2:
+            load_clicked = st.button("加载", key="named_pool_load", disabled=selected is None)
+        with col3:
+            delete_clicked = st.button("删除", key="named_pool_delete", disabled=selected is None)
+
+        if selected is not None:
+            pool = pools[selected]
+            st.caption(f"{len(pool['codes'])} 只基金，使用 {pool.get('use_count', 0)} 次，更新于 {pool['updated_at']}")
+
+        if load_clicked:
+            codes = pools[selected]['codes']
+            record_pool_use(selected)
+            st.session_state['comparison_fund_input_input'] = ','.join(codes)
+            st.session_state['comparison_fund_pool'] = codes
+            start_date = st.session_state.get('start_date', DEFAULT_START_DATE)
+            end_date = st.session_state.get('end_date', datetime.date.today())
+            warm = seed_session_cache(selected, codes, start_date, end_date)
+            st.session_state['named_pool_message'] = (
+                f"已加载基金池 {selected}（{len(codes)} 只基金）" + ("，使用预热缓存" if warm else ""))
+            st.rerun()
+        if delete_clicked:
+            delete_pool(selected)
+            st.session_state['named_pool_message'] = f"已删除基金池 {selected}"
+            st.rerun()
+
+        message = st.session_state.pop('named_pool_message', None)
+        if message:
+            st.success(message)
+
+        col1, col2 = st.columns([4, 1])
+        with col1:
+            name = st.text_input("基金池名称", key="named_pool_name")
+        with col2:
+            if st.button("保存", key="named_pool_save"):
+                if not name.strip() or not comparison_fund_pool:
+                    st.warning("请输入基金池名称和至少一个对比基金代码。")
+                else:
+                    save_pool(name.strip(), comparison_fund_pool)
+                    start_preload([(name.strip(), comparison_fund_pool)])
+                    st.success(f"已保存基金池 {name.strip()}，正在后台预热")
+
+
 def show():
     st.title("基金净值分析")
 
@@ -431,54 +680,76 @@ def show():
         key="comparison_fund_input"
     )
 
+    # 命名基金池：保存在本地文件中，跨会话复用
+    named_comparison_pools(comparison_fund_pool)
+
     # 保存对比基金池到 session_state
     if st.button("保存对比基金池"):
         if comparison_fund_pool:
             st.session_state['comparison_fund_pool'] = comparison_fund_pool
             st.success("对比基金池已保存。")
+
+            # 已经查询过数据时，直接增量更新对比基金池
+            if st.session_state.get('query_clicked') and 'start_date' in st.session_state:
+                try:
+                    comparison_df = update_comparison_pool(create_db_engine(), comparison_fund_pool,
+                                                           st.session_state['start_date'],
+                                                           st.session_state['end_date'])
+                except Exception as e:
+                    st.error(f"更新对比基金池时查询出错: {e}")
+                else:
+                    comparison_df = resample_fund_data(comparison_df, st.session_state.get('data_frequency', 'D'))
+                    st.session_state['comparison_df'] = comparison_df
+                    changes = st.session_state['comparison_pool_changes']
+                    st.info(f"对比基金池已增量更新：新增 {len(changes['added'])} 只，删除 {len(changes['removed'])} 只")
         else:
             st.warning("请输入至少一个基金代码。")
 
     # 日期选择
-    start_date = st.date_input("选择开始日期", value=datetime.date(2023, 1, 1), min_value=datetime.date(1980, 1, 1))
+    start_date = st.date_input("选择开始日期", value=DEFAULT_START_DATE, min_value=datetime.date(1980, 1, 1))
     end_date = st.date_input("选择结束日期", value=datetime.date.today(), min_value=start_date)
     st.session_state['start_date'] = start_date
     st.session_state['end_date'] = end_date
 
+    # 数据频率，长周期分析可以使用周度或月末数据减少计算量
+    frequency_name = st.selectbox("选择数据频率", list(DATA_FREQUENCIES), key="data_frequency_name")
+
     # 保存查询按钮的状态
     if "query_clicked" not in st.session_state:
         st.session_state['query_clicked'] = False
 
-    # 查询数据并存储
+    # 查询数据并存储：查询和计算在后台任务中执行，期间页面可以正常交互，重新运行也不会中断任务
     if st.button("查询"):
         if secucodes:
-            result_df = query_fund_data(engine, secucodes, st.session_state['start_date'], st.session_state['end_date'])
-            if not result_df.empty:
-                # 计算调整系数和调整后的净值
-                result_df = calculate_adjustment_coefficients(result_df)
-                result_df = calculate_adjusted_unitnv(result_df)
-
-                # 保存查询数据到 session_state
-                st.session_state['query_clicked'] = True
-                st.session_state['result_df'] = result_df
-
-                # 对比基金池处理
-                if 'comparison_fund_pool' in st.session_state:
-                    comparison_fund_list = st.session_state['comparison_fund_pool']
-                    comparison_df = query_fund_data(engine, comparison_fund_list, st.session_state['start_date'],
-                                                    st.session_state['end_date'])
-                    if not comparison_df.empty:
-                        # 计算对比基金的调整系数和净值
-                        comparison_df = calculate_adjustment_coefficients(comparison_df)
-                        comparison_df = calculate_adjusted_unitnv(comparison_df)
-                        st.session_state['comparison_df'] = comparison_df
-
-                st.success("查询和计算完成")
-            else:
-                st.write("未找到符合条件的基金数据。")
+            frequency = DATA_FREQUENCIES[frequency_name]
+            state = job_state(['comparison_fund_cache', 'comparison_rolling_cache'])
+            start_job('nav_query_job', "净值查询", run_nav_query, create_db_engine(), secucodes,
+                      st.session_state.get('comparison_fund_pool'), st.session_state['start_date'],
+                      st.session_state['end_date'], frequency, state)
+            st.session_state['nav_query_frequency'] = (frequency, frequency_name)
         else:
             st.warning("请提供基金代码或上传包含基金代码的 Excel 文件。")
 
+    job = pop_finished_job('nav_query_job')
+    if job is not None and show_job_result(job):
+        frequency, frequency_name = st.session_state.pop('nav_query_frequency', ('D', '日度'))
+        if job.result is None:
+            st.write("未找到符合条件的基金数据。")
+        else:
+            # 保存查询数据到 session_state
+            st.session_state.update(job.result['state'])
+            st.session_state['data_frequency'] = frequency
+            st.session_state['query_clicked'] = True
+
+            if frequency != 'D':
+                for name, (before, after) in job.result['resample_summary'].items():
+                    st.info(f"{name}：{frequency_name}重采样后数据行数 {before} → {after}"
+                            f"（减少 {1 - after / max(before, 1):.1%}）")
+                st.caption(f"重采样耗时 {job.result['resample_seconds']:.2f} 秒")
+
+            st.success(f"查询和计算完成，耗时 {job.elapsed:.1f} 秒")
+    job_progress('nav_query_job')
+
     # 如果已经查询数据，展示基金数据
     if 'query_clicked' in st.session_state and st.session_state['query_clicked']:
         if 'result_df' in st.session_state:
@@ -494,112 +765,40 @@ def show():
                 label='选择要显示的内容'
             )
 
-            # 初始化显示数据，包含基础的 TradingDay 和 UnitNV 信息
-            display_data = result_df[['SecuCode', 'ChiName', 'TradingDay', 'UnitNV']].copy()
-
-            # 如果用户选择了 "调整系数 (a, b)"，则显示调整系数
-            if '调整系数 (a, b)' in selected_items:
-                display_data = pd.merge(display_data, result_df[['TradingDay', 'SecuCode', 'a', 'b']],
-                                        on=['TradingDay', 'SecuCode'], how='left')
-
-            # 如果用户选择了 "调整后净值"，则显示调整后的净值
-            if '调整后净值' in selected_items:
-                display_data = pd.merge(display_data, result_df[['TradingDay', 'SecuCode', 'AdjustedUnitNV']],
-                                        on=['TradingDay', 'SecuCode'], how='left')
-
-            # 如果用户选择了 "复权单位净值"，则显示复权净值
-            if '复权单位净值' in selected_items:
-                display_data = pd.merge(display_data, result_df[['TradingDay', 'SecuCode', 'UnitNVRestored']],
-                                        on=['TradingDay', 'SecuCode'], how='left')
-
-            # 显示研究基金的净值表格
-            st.dataframe(display_data[display_data['SecuCode'].isin(secucodes)], use_container_width=True)
+            # 显示数据直接从 result_df 中按列取出，所需的列都在同一行上，不需要再合并
+            # 基础列为 TradingDay 和 UnitNV 信息，其余列根据用户的选择添加
+            display_columns = ['SecuCode', 'ChiName', 'TradingDay', 'UnitNV']
+            for item in selected_items:
+                display_columns += DISPLAY_COLUMNS.get(item, [])
+            display_data = result_df[[column for column in DISPLAY_COLUMNS_ORDER if column in display_columns]]
+
+            # 显示研究基金的净值表格，按预先计算的每只基金的行范围取数
+            if st.session_state.get('fund_row_index_fingerprint') != st.session_state.get('result_fingerprint'):
+                st.session_state['fund_row_index'] = build_fund_row_index(result_df)
+                st.session_state['fund_row_index_fingerprint'] = st.session_state.get('result_fingerprint')
+            # 分页展示，浏览器每次只接收当前页的数据
+            paginated_dataframe(select_fund_rows(display_data, st.session_state['fund_row_index'], secucodes),
+                                key='nav_table',
+                                data_id=(st.session_state.get('result_fingerprint'), tuple(display_data.columns),
+                                         tuple(sorted(secucodes))),
+                                date_column='TradingDay')
 
             st.session_state['display_data'] = display_data
 
-            # 添加绘图部分，默认绘制"累计净值"
-            plot_data = pd.DataFrame({'日期': display_data['TradingDay'], '累计净值': display_data['UnitNV'], 'SecuCode': display_data['SecuCode']})
-            # st.write(plot_data)
-            # 动态添加其他净值曲线
-            if '调整后净值' in selected_items and 'AdjustedUnitNV' in display_data.columns:
-                plot_data['调整后净值'] = display_data['AdjustedUnitNV']
-
-            if '复权单位净值' in selected_items and 'UnitNVRestored' in display_data.columns:
-                plot_data['复权单位净值'] = display_data['UnitNVRestored']
-
-            # 检查 plot_data 是否为空，避免图表消失
-            if not plot_data.empty:
-                fig = go.Figure()
-
-                # 根据基金代码分组
-                for fund_code, fund_data in plot_data.groupby('SecuCode'):
-
-                    # 添加累计净值曲线
-                    fig.add_trace(go.Scatter(
-                        x=fund_data['日期'], y=fund_data['累计净值'],
-                        mode='lines', name=f'{fund_code} 累计净值',
-                        # hovertemplate=f'{fund_code} 累计净值: %{y:.2f}<extra></extra>'  # 使用 Plotly 的 %{y} 占位符来引用 y 轴值
-                    ))
-
-                    # 根据选择动态添加其他曲线
-                    if '调整后净值' in selected_items and '调整后净值' in fund_data.columns:
-                        fig.add_trace(go.Scatter(
-                            x=fund_data['日期'], y=fund_data['调整后净值'],
-                            mode='lines', name=f'{fund_code} 调整后净值',
-                            # hovertemplate=f'{fund_code} 累计净值: %{y:.2f}<extra></extra>'  # 使用 Plotly 的 %{y} 占位符来引用 y 轴值
-                        ))
-
-                    if '复权单位净值' in selected_items and '复权单位净值' in fund_data.columns:
-                        fig.add_trace(go.Scatter(
-                            x=fund_data['日期'], y=fund_data['复权单位净值'],
-                            mode='lines', name=f'{fund_code} 复权单位净值',
-                            # hovertemplate=f'{fund_code} 累计净值: %{y:.2f}<extra></extra>'  # 使用 Plotly 的 %{y} 占位符来引用 y 轴值
-                        ))
-
-
-                fig.update_layout(
-                    width=1200,  # 设置图表的宽度
-                    height=500,  # 设置图表的高度
-                    title="基金净值曲线",
-                    # xaxis_title="日期",
-                    yaxis_title="净值",
-                    hovermode='x unified',  # 设置 hovermode
-                    legend=dict(
-                        orientation="h",  # 将图例横向排列
-                        yanchor="bottom",  # 图例的 y 锚点设为底部
-                        y=-0.2,  # 图例放在图表的下方
-                        xanchor="center",  # 图例的 x 锚点设为中心
-                        x=0.5  # 将图例居中
-                    ),
-
-                    # 自定义 X 轴
-                    xaxis=dict(
-                        tickformat="%Y-%m-%d",  # 显示年份、月份、日期
-                        # dtick="M6",  # 每6个月显示一个刻度
-                        nticks=10,
-                        ticklabelmode="period",  # 设置日期刻度的显示方式
-                        showline=True,  # 显示X轴线
-                        linewidth=1.5,  # X轴线宽度
-                        linecolor='grey',  # X轴线颜色
-                        ticks="inside",  # 刻度线在外
-                        ticklen=4,  # 刻度线的长度
-                        tickwidth=1,  # 刻度线宽度
-                        tickcolor='grey'  # 刻度线颜色
-                    ),
-
-                    # 自定义 Y 轴
-                    yaxis=dict(
-                        showline=True,  # 显示Y轴线
-                        linewidth=1.5,  # Y轴线宽度
-                        linecolor='grey',  # Y轴线颜色
-                        ticks="inside",  # 刻度线在外
-                        ticklen=4,  # 刻度线的长度
-                        tickwidth=1,  # 刻度线宽度
-                        tickcolor='grey'  # 刻度线颜色
-                    ),
-
-                    # 自定义图表背景
-                    plot_bgcolor='white',  # 设置背景颜色为白色
+            # 添加绘图部分，默认绘制"累计净值"，图表按数据指纹和选择缓存，未变化的重新运行直接复用
+            fingerprint = st.session_state.get('result_fingerprint') or data_fingerprint(result_df)
+            min_day, max_day = cached_build(('date_bounds', fingerprint),
+                                            lambda: date_bounds(result_df['TradingDay']))
+            if min_day is not None:
+                # 只绘制选择区间内的数据，缩小区间即可查看更高分辨率的曲线
+                zoom_start, zoom_end = zoom_date_range(min_day, max_day, key='nav_chart_range')
+
+                # 根据选择动态添加其他曲线
+                series_columns = tuple(['累计净值'] + [column for column in ['调整后净值', '复权单位净值']
+                                                      if column in selected_items])
+                fig = cached_build(
+                    ('nav_chart', fingerprint, series_columns, zoom_start, zoom_end, DEFAULT_MAX_POINTS),
+                    lambda: build_nav_figure(result_df, series_columns, zoom_start, zoom_end)
                 )
 
                 # 绘制图表
@@ -607,11 +806,4 @@ def show():
 
             # 下载表格功能
             if 'display_data' in st.session_state:
-                if st.button("生成下载文件"):
-                    processed_data = generate_excel_file(st.session_state['display_data'])
-                    st.download_button(
-                        label="点击下载",
-                        data=processed_data,
-                        file_name='基金净值分析.xlsx',
-                        mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-                    )
+                export_download_button(st.session_state['display_data'], '基金净值分析', key='nav_export')
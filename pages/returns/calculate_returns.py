@@ -3,79 +3,21 @@ import datetime
 import streamlit as st
 import pandas as pd
 import numpy as np
-import plotly.graph_objects as go
-from scipy import stats
-from dateutil.relativedelta import relativedelta
 import streamlit_antd_components as sac
 
-
-def calculate_rolling_returns(data, interval_years, net_value_column, start_date, end_date):
-    """
-    计算指定区间内的滚动年化收益率。
-
-    参数:
-    - data: 基金数据 DataFrame，包含 'SecuCode'、'TradingDay'、'AdjustedUnitNV' 等列。
-    - interval_years: 滚动窗口的年数。
-    - start_date: 用户设定的开始日期。
-    - end_date: 用户设定的结束日期。
-    """
-    results = []
-    # 确保交易日和用户设定的日期为日期类型
-    start_date = pd.to_datetime(start_date)
-    end_date = pd.to_datetime(end_date)
-
-    # 支持小于1年的interval_years，计算对应的月份
-    interval_months = int(interval_years * 12)  # 1年 = 12个月
-
-    for secu_code in data['SecuCode'].unique():
-        fund_data = data[data['SecuCode'] == secu_code].copy()
-        fund_data = fund_data.sort_values(by='TradingDay')
-
-        for start_date_window in fund_data['TradingDay']:
-            # 如果滚动窗口的开始日期早于用户设定的 start_date，跳过
-            if start_date_window < start_date:
-                continue
-
-            # 计算滚动窗口的结束日期
-            end_date_window = start_date_window + relativedelta(months=interval_months)
-
-            # 如果滚动窗口的结束日期超过用户设定的 end_date，停止计算
-            if end_date_window > end_date:
-                break
-
-            # 获取符合结束日期的交易数据
-            end_data = fund_data[fund_data['TradingDay'] <= end_date_window]
-            if end_data.empty or len(end_data) <= 1:
-                continue
-
-            # 获取起始净值和结束净值
-            start_nv = fund_data.loc[fund_data['TradingDay'] == start_date_window, net_value_column].values[0]
-            end_nv = end_data[net_value_column].values[-1]
-
-            # 计算天数
-            days_diff = (end_data['TradingDay'].values[-1] - start_date_window).days
-
-            # 打印调试信息
-            if days_diff == 0:
-                st.write(
-                    f"⚠️ Days difference is 0 for fund {secu_code}, start_date: {start_date_window}, end_date: {end_data['TradingDay'].values[-1]}")
-
-            if days_diff == 0:
-                continue  # 跳过 days_diff 为 0 的情况
-
-            # 按天计算年化收益率
-            annualized_return = ((end_nv / start_nv) ** (365 / days_diff)) - 1
-
-            # 存储结果
-            results.append({
-                'SecuCode': secu_code,
-                'start_date': start_date_window,
-                'end_date': end_data['TradingDay'].values[-1],
-                'annualized_return_rate': annualized_return * 100,
-                'interval': interval_years
-            })
-
-    return pd.DataFrame(results)
+from pages.returns.chart_rendering import (DEFAULT_MAX_POINTS, cached_build, data_fingerprint, date_bounds, line_trace,
+                                           should_use_webgl, zoom_date_range)
+from pages.returns.indicators import (calculate_moments, calculate_peer_percentiles, calculate_pool_statistics,
+                                       calculate_rolling_metric, calculate_statistics)
+from pages.returns.jobs import job_progress, job_state, pop_finished_job, show_job_result, start_job
+from pages.returns.nav_matrix import build_nav_matrix
+from pages.returns.perf import span, timed
+from pages.returns.period_returns import (PERIOD_FREQUENCIES, calculate_period_ranks, calculate_period_returns,
+                                         calculate_ytd_returns)
+from pages.returns.rolling_risk import ROLLING_METRICS
+from pages.returns.rolling_warehouse import read_rolling_metric
+from pages.returns.sql_rolling import fetch_rolling_returns, supports_sql_rolling
+from pages.returns.table_view import paginated_dataframe
 
 
 # 计算对比基金的调整后净值
@@ -86,42 +28,137 @@ def calculate_adjusted_net_value_for_comparison_funds(data, comparison_fund_pool
     return comparison_fund_data
 
 
-# 计算统计指标
-def calculate_statistics(data):
-    skewness = stats.skew(data)
-    kurtosis = stats.kurtosis(data, fisher=False)
+def load_rolling_metric(data, interval_years, net_value_column, start_date, end_date, metric, risk_free_rate, state):
+    """
+    优先从滚动指标仓库读取滚动指标，仓库只覆盖部分基金时其余基金实时计算后合并；
+    没有覆盖请求日期区间的仓库或数据经过重采样时全部实时计算。
+    读取仓库的基金数记录在 state['rolling_sources'] 中，供页面提示。
+    state['rolling_execution'] 为 'database' 时，年化收益率在数据库中计算（state['db_engine']），只传回窗口结果。
+    """
+    engine = state.get('db_engine')
+    if state.get('rolling_execution') == 'database' and metric == 'annualized_return_rate' \
+            and state.get('data_frequency', 'D') == 'D' and not data.empty \
+            and engine is not None and supports_sql_rolling(engine, net_value_column):
+        return fetch_rolling_returns(engine, list(data['SecuCode'].unique()), interval_years, net_value_column,
+                                     start_date, end_date)
+
+    if state.get('data_frequency', 'D') == 'D' and not data.empty:
+        stored = read_rolling_metric(list(data['SecuCode'].unique()), interval_years, net_value_column, start_date,
+                                     end_date, metric, risk_free_rate)
+        if stored is not None:
+            rolling, missing = stored
+            state.setdefault('rolling_sources', []).append(
+                (interval_years, data['SecuCode'].nunique() - len(missing), len(missing)))
+            if missing:
+                live = calculate_rolling_metric(data[data['SecuCode'].isin(missing)], interval_years,
+                                                net_value_column, start_date, end_date, metric, risk_free_rate)
+                rolling = pd.concat([rolling, live], ignore_index=True)
+            return rolling
+
+    return calculate_rolling_metric(data, interval_years, net_value_column, start_date, end_date, metric,
+                                    risk_free_rate)
+
+
+def get_comparison_rolling_returns(comparison_data, fund_codes, interval_years, net_value_column, start_date,
+                                   end_date, metric='annualized_return_rate', risk_free_rate=0.0, state=None):
+    """
+    按基金缓存对比基金的滚动收益率和部分聚合量，只计算缓存中缺少的基金。
 
-    return {
-        '最小值': data.min(),
-        '最大值': data.max(),
-        '平均值': data.mean(),
-        '标准差': data.std(),
-        '中位数': data.median(),
-        '偏度': skewness,
-        '峰度': kurtosis,
-        '25%分位点': data.quantile(0.25),
-        '75%分位点': data.quantile(0.75),
-        '75%分位点-25%分位点': data.quantile(0.75) - data.quantile(0.25),
-        '左0.1%尾部': data.quantile(0.001),
-        '右0.1%尾部': data.quantile(0.999)
-    }
+    缓存保存在 session_state['comparison_rolling_cache'] 中，结构为
+    {基金代码: {(区间, 净值列, 开始日期, 结束日期, 指标, 无风险利率, 数据频率): {'returns': DataFrame, 'moments': dict 或 None}}}，
+    对比基金池增量更新时由 update_comparison_pool 负责删除被移除基金的缓存。
+    state 默认为 st.session_state，在后台任务中传入包含缓存和数据频率的普通字典。
+    """
+    state = st.session_state if state is None else state
+    cache = state.setdefault('comparison_rolling_cache', {})
+    key = (interval_years, net_value_column, start_date, end_date, metric, risk_free_rate,
+           state.get('data_frequency', 'D'))
+
+    missing = [secu_code for secu_code in fund_codes if key not in cache.get(secu_code, {})]
+    if missing:
+        missing_returns = load_rolling_metric(comparison_data[comparison_data['SecuCode'].isin(missing)],
+                                              interval_years, net_value_column, start_date, end_date,
+                                              metric, risk_free_rate, state)
+        groups = dict(tuple(missing_returns.groupby('SecuCode'))) if not missing_returns.empty else {}
+        for secu_code in missing:
+            fund_returns = groups.get(secu_code, pd.DataFrame(columns=['SecuCode', 'start_date', metric]))
+            values = fund_returns[metric].dropna()
+            cache.setdefault(secu_code, {})[key] = {
+                'returns': fund_returns,
+                'moments': calculate_moments(values) if not values.empty else None,
+            }
+
+    return [cache[secu_code][key] for secu_code in fund_codes]
+
+
+@timed('图表构建')
+def plot_peer_percentiles(band_df, rank_df, research_returns, interval, value_column='annualized_return_rate',
+                          metric_name='年化收益率'):
+    """
+    绘制基金池分位数带与研究基金滚动指标的时间序列，以及研究基金的百分位排名。
+    """
+    import plotly.graph_objects as go
+
+    band_fig = go.Figure()
+    columns = list(band_df.columns)
+
+    # 由外向内成对绘制分位数带，中位数单独绘制
+    for lower, upper in zip(columns[:len(columns) // 2], columns[::-1][:len(columns) // 2]):
+        band_fig.add_trace(go.Scatter(x=band_df.index, y=band_df[upper], mode='lines', line=dict(width=0),
+                                      name=upper, showlegend=False))
+        band_fig.add_trace(go.Scatter(x=band_df.index, y=band_df[lower], mode='lines', line=dict(width=0),
+                                      fill='tonexty', fillcolor='rgba(99, 110, 250, 0.15)',
+                                      name=f'对比基金池 {lower}-{upper}'))
+    if len(columns) % 2:
+        median = columns[len(columns) // 2]
+        band_fig.add_trace(go.Scatter(x=band_df.index, y=band_df[median], mode='lines',
+                                      line=dict(color='grey', dash='dash'), name=f'对比基金池 {median}'))
+
+    for fund_code, fund_returns in research_returns.groupby('SecuCode'):
+        band_fig.add_trace(go.Scatter(x=fund_returns['start_date'], y=fund_returns[value_column],
+                                      mode='lines', name=f'基金 {fund_code} - 区间 {interval}'))
+    band_fig = apply_custom_layout(band_fig)
+    band_fig.update_layout(title=f'区间 {interval} 年滚动{metric_name}与对比基金池分位数', yaxis_title=metric_name)
+
+    rank_fig = go.Figure()
+    for fund_code in rank_df.columns:
+        rank_fig.add_trace(go.Scatter(x=rank_df.index, y=rank_df[fund_code], mode='lines',
+                                      name=f'基金 {fund_code} - 区间 {interval}'))
+    rank_fig = apply_custom_layout(rank_fig)
+    rank_fig.update_layout(title=f'区间 {interval} 年滚动{metric_name}同类百分位排名', yaxis_title='百分位排名',
+                           yaxis_range=[0, 100])
+
+    return band_fig, rank_fig
 
 
 def plot_and_calculate_distributions(data, comparison_data, research_funds_to_compare, comparison_funds_to_compare,
-                                     intervals, net_value_column):
+                                     intervals, net_value_column, metric='annualized_return_rate', risk_free_rate=0.0,
+                                     state=None, progress=None):
+    # scipy、plotly 导入较慢（scipy 约 1 秒），只在需要计算核密度和绘图时导入
+    import plotly.graph_objects as go
+    from scipy import stats
+
     statistics = []
+    peer_percentiles = {}
+    rolling_tables = {}
     fig = go.Figure()
-    start_date = st.session_state['start_date']
-    end_date = st.session_state['end_date']
+    state = st.session_state if state is None else state
+    start_date = state['start_date']
+    end_date = state['end_date']
 
     # 遍历每个区间
-    for interval in intervals:
-        interval_data = calculate_rolling_returns(data, interval, net_value_column, start_date, end_date)
-        st.write(interval_data)
+    for i, interval in enumerate(intervals):
+        if progress is not None:
+            progress(f'计算区间 {interval} 年滚动指标（{i + 1}/{len(intervals)}）', i / len(intervals))
+        interval_data = load_rolling_metric(data, interval, net_value_column, start_date, end_date, metric,
+                                            risk_free_rate, state)
+        if interval_data.empty:
+            interval_data = pd.DataFrame(columns=['SecuCode', 'start_date', metric])
+        rolling_tables[interval] = interval_data
         # 处理研究基金
         for fund_code in research_funds_to_compare:
-            fund_returns = interval_data[interval_data['SecuCode'] == fund_code]['annualized_return_rate'].dropna()
-            all_returns = interval_data['annualized_return_rate'].dropna()
+            fund_returns = interval_data[interval_data['SecuCode'] == fund_code][metric].dropna()
+            all_returns = interval_data[metric].dropna()
 
             if fund_returns.empty or all_returns.empty:
                 continue
@@ -137,7 +174,8 @@ def plot_and_calculate_distributions(data, comparison_data, research_funds_to_co
 
             # 绘制研究基金的核密度图
             x_vals_fund = np.sort(fund_returns)
-            y_vals_fund = stats.gaussian_kde(fund_returns)(x_vals_fund)
+            with span('核密度估计', rows=len(fund_returns)):
+                y_vals_fund = stats.gaussian_kde(fund_returns)(x_vals_fund)
             fig.add_trace(go.Scatter(
                 x=x_vals_fund,
                 y=y_vals_fund,
@@ -148,20 +186,23 @@ def plot_and_calculate_distributions(data, comparison_data, research_funds_to_co
 
         # 如果有对比基金池
         if comparison_data is not None:
-            comparison_interval_data = calculate_rolling_returns(comparison_data, interval, net_value_column,
-                                                                 start_date, end_date)
-            if comparison_funds_to_compare:
-                # 只计算选中的对比基金
-                comparison_returns = \
-                    comparison_interval_data[comparison_interval_data['SecuCode'].isin(comparison_funds_to_compare)][
-                        'annualized_return_rate'].dropna()
-            else:
-                # 计算全部对比基金
-                comparison_returns = comparison_interval_data['annualized_return_rate'].dropna()
+            # 只计算选中的对比基金，未选择时计算全部对比基金
+            pool_funds = list(comparison_funds_to_compare) or list(comparison_data['SecuCode'].unique())
+
+            # 按基金缓存的滚动收益率，基金池变动时只计算新增基金
+            pool_entries = get_comparison_rolling_returns(comparison_data, pool_funds, interval, net_value_column,
+                                                          start_date, end_date, metric, risk_free_rate, state)
+            pool_entries = [entry for entry in pool_entries if entry['moments'] is not None]
+            comparison_returns = pd.Series(dtype=float)
+            if pool_entries:
+                comparison_returns = pd.concat(
+                    [entry['returns'][metric] for entry in pool_entries], ignore_index=True
+                ).dropna()
 
             if not comparison_returns.empty:
-                # 计算对比基金池的统计指标
-                comp_stats_dict = calculate_statistics(comparison_returns)
+                # 由每只基金的部分聚合量合并计算对比基金池的统计指标
+                comp_stats_dict = calculate_pool_statistics([entry['moments'] for entry in pool_entries],
+                                                            comparison_returns)
                 comp_stats_dict.update({
                     '基金代码': '对比基金池',
                     '区间': interval,
@@ -171,7 +212,8 @@ def plot_and_calculate_distributions(data, comparison_data, research_funds_to_co
 
                 # 绘制对比基金池的核密度图
                 x_vals_comp = np.sort(comparison_returns)
-                y_vals_comp = stats.gaussian_kde(comparison_returns)(x_vals_comp)
+                with span('核密度估计', rows=len(comparison_returns)):
+                    y_vals_comp = stats.gaussian_kde(comparison_returns)(x_vals_comp)
                 comparison_fund_name = '对比基金池'
                 fig.add_trace(go.Scatter(
                     x=x_vals_comp,
@@ -181,9 +223,17 @@ def plot_and_calculate_distributions(data, comparison_data, research_funds_to_co
                     hovertemplate=f'{comparison_fund_name} 区间 {interval}: y=%{{y:.2f}}<extra></extra>'  # 显式设置 hover 信息的格式
                 ))
 
+                # 研究基金在对比基金池中的截面百分位排名
+                research_returns = interval_data[interval_data['SecuCode'].isin(research_funds_to_compare)]
+                if not research_returns.empty:
+                    pool_returns = pd.concat([entry['returns'] for entry in pool_entries], ignore_index=True)
+                    band_df, rank_df = calculate_peer_percentiles(research_returns, pool_returns,
+                                                                  value_column=metric)
+                    peer_percentiles[interval] = (band_df, rank_df, research_returns)
+
     # 将统计指标转换为 DataFrame
     statistics_df = pd.DataFrame(statistics)
-    return statistics_df, fig
+    return statistics_df, fig, peer_percentiles, rolling_tables
 
 
 # 计算每日收益率的通用函数
@@ -201,11 +251,30 @@ def calculate_daily_returns(data, column_name, returns_column="Adjusted_Returns"
     return data
 
 
+def calculate_all_daily_returns(data):
+    """
+    计算调整后净值和管理人净值（复权单位净值）的每日收益率，返回新的 DataFrame。
+    """
+    fund_data = data.copy()
+
+    # 计算调整后净值的每日收益率
+    fund_data = calculate_daily_returns(fund_data, 'AdjustedUnitNV', returns_column="Adjusted_Returns")
+
+    # 计算管理人净值的每日收益率
+    fund_data = calculate_daily_returns(fund_data, 'UnitNVRestored', returns_column="Manager_Returns")
+    return fund_data
+
+
 # 绘制每日收益率图的函数
-def plot_daily_returns(data):
+@timed('图表构建')
+def plot_daily_returns(data, max_points=DEFAULT_MAX_POINTS):
     """
     绘制不同基金的每日收益率曲线，应用自定义样式模板
+
+    每条曲线用 LTTB 降采样到不超过 max_points 个点，总点数较多时使用 WebGL 渲染。
     """
+    import plotly.graph_objects as go
+
     # 将 Adjusted_Returns 和 Manager_Returns 限制为两位小数
     data['Adjusted_Returns'] = data['Adjusted_Returns'].round(2)
     data['Manager_Returns'] = data['Manager_Returns'].round(2)
@@ -213,26 +282,18 @@ def plot_daily_returns(data):
     fig = go.Figure()
 
     # 对每个基金分别绘制调整后的每日收益率和管理人收益率
-    fund_groups = data.groupby('SecuCode')
+    fund_groups = list(data.groupby('SecuCode'))
+    total_points = sum(min(len(fund_data), max_points) for _, fund_data in fund_groups) * 2
+    use_webgl = should_use_webgl(total_points)
 
     for fund_code, fund_data in fund_groups:
         # 绘制调整后的每日收益率
-        fig.add_trace(go.Scatter(
-            x=fund_data['TradingDay'],
-            y=fund_data['Adjusted_Returns'],
-            mode='lines',
-            name=f'{fund_code} - 调整后收益率',
-            # hovertemplate=f'{fund_code} 调整后收益率: %{y:.2f}<extra></extra>'
-        ))
+        fig.add_trace(line_trace(fund_data['TradingDay'], fund_data['Adjusted_Returns'], f'{fund_code} - 调整后收益率',
+                                 max_points, use_webgl))
 
         # 绘制管理人收益率
-        fig.add_trace(go.Scatter(
-            x=fund_data['TradingDay'],
-            y=fund_data['Manager_Returns'],
-            mode='lines',
-            name=f'{fund_code} - 管理人收益率',
-            # hovertemplate=f'{fund_code} 管理人收益率: %{y:.2f}<extra></extra>'
-        ))
+        fig.add_trace(line_trace(fund_data['TradingDay'], fund_data['Manager_Returns'], f'{fund_code} - 管理人收益率',
+                                 max_points, use_webgl))
 
     # 应用我们之前定义的样式模板
     fig = apply_custom_layout(fig)
@@ -430,6 +491,49 @@ def apply_custom_layout(fig):
     return fig
 
 
+def run_rolling_analysis(data, comparison_data, research_funds_to_compare, comparison_funds_to_compare, intervals,
+                         column_name, metric_name, risk_free_rate, state, progress):
+    """
+    后台任务：计算滚动指标、统计指标、核密度图和同类百分位排名。
+
+    任务在工作线程中执行，不访问 session_state；日期区间、数据频率和对比基金的滚动收益率缓存通过 state 传入，
+    结果返回后由页面写回 session_state。统计表透视和图表只在这里构建一次，之后的重新运行直接展示。
+    """
+    statistics_df, fig, peer_percentiles, rolling_tables = plot_and_calculate_distributions(
+        data, comparison_data, research_funds_to_compare, comparison_funds_to_compare, intervals,
+        column_name, ROLLING_METRICS[metric_name], risk_free_rate, state, progress
+    )
+
+    progress('整理统计指标和图表', 0.9)
+    stats_pivot = None
+    if not statistics_df.empty:
+        # 确保所有数值列都是数值型
+        num_cols = ['最小值', '最大值', '平均值', '标准差', '中位数', '偏度', '峰度', '25%分位点', '75%分位点',
+                    '75%分位点-25%分位点', '左0.1%尾部', '右0.1%尾部']
+        statistics_df[num_cols] = statistics_df[num_cols].apply(pd.to_numeric, errors='coerce')
+
+        # 删除 "类型" 列，不让其参与透视表
+        stats_pivot = statistics_df.drop(columns=['类型']).set_index(['基金代码', '区间']).T
+
+    peer_figures = []
+    for interval, (band_df, rank_df, research_returns) in peer_percentiles.items():
+        band_fig, rank_fig = plot_peer_percentiles(band_df, rank_df, research_returns, interval,
+                                                   ROLLING_METRICS[metric_name], metric_name)
+        peer_figures.append((band_fig, rank_fig, band_df.join(rank_df.add_suffix(' 百分位排名'))))
+
+    return {
+        'statistics_df': statistics_df,
+        'stats_pivot': stats_pivot,
+        'fig': apply_custom_layout(fig),
+        'peer_figures': peer_figures,
+        'rolling_tables': rolling_tables,
+        # 明细表的内容指纹，作为分页表格筛选排序缓存的标识；指标、无风险利率等参数变化后内容不同，指纹随之变化
+        'rolling_table_ids': {interval: data_fingerprint(table) for interval, table in rolling_tables.items()},
+        'comparison_rolling_cache': state.get('comparison_rolling_cache', {}),
+        'rolling_sources': state.get('rolling_sources', []),
+    }
+
+
 def analyze_rolling_returns(tab_title, column_name, result_key, data, comparison_data):
     st.header(tab_title)
 
@@ -437,6 +541,17 @@ def analyze_rolling_returns(tab_title, column_name, result_key, data, comparison
     intervals = st.multiselect(f"选择{tab_title}的区间（以年为单位）", [0.5, 1, 2, 3, 5], default=[1],
                                key=f"intervals_{result_key}")
 
+    # 选择滚动指标
+    metric_name = st.selectbox("选择滚动指标", list(ROLLING_METRICS), key=f"metric_{result_key}")
+    risk_free_rate = 0.0
+    if metric_name == '夏普比率':
+        risk_free_rate = st.number_input("无风险利率（%，年化）", value=0.0, step=0.1,
+                                         key=f"risk_free_rate_{result_key}")
+
+    # 计算方式：数据库计算只传回每个窗口的年化收益率，不需要在本地逐日计算
+    execution = st.radio("计算方式", ["本地计算", "数据库计算"], horizontal=True, key=f"execution_{result_key}",
+                         help="数据库计算只支持日度数据的滚动年化收益率，其他指标仍在本地计算")
+
     # 基金选择框
     research_funds_to_compare = st.multiselect(
         "选择要分析的研究基金",
@@ -453,44 +568,135 @@ def analyze_rolling_returns(tab_title, column_name, result_key, data, comparison
         key=f"comparison_funds_{result_key}"
     )
 
+    # 分析在后台任务中执行，期间页面可以正常交互，重新运行也不会中断任务
+    job_key = f'rolling_job_{result_key}'
     if st.button(f"分析{tab_title}", key=f"analyze_button_{result_key}"):
         if not intervals:
             st.warning("请提供至少一个区间")
             return
 
-        # 计算滚动收益率并绘制图表
-        statistics_df, fig = plot_and_calculate_distributions(
-            data, comparison_data, research_funds_to_compare, comparison_funds_to_compare, intervals,
-            column_name
-        )
+        state = job_state(['start_date', 'end_date', 'data_frequency', 'comparison_rolling_cache'])
+        if execution == "数据库计算":
+            from pages.returns.adjust_coefficient import create_db_engine
+            state['rolling_execution'] = 'database'
+            state['db_engine'] = create_db_engine()
+        start_job(job_key, tab_title, run_rolling_analysis, data, comparison_data, research_funds_to_compare,
+                  comparison_funds_to_compare, intervals, column_name, metric_name, risk_free_rate, state)
+
+    job = pop_finished_job(job_key)
+    if job is not None and show_job_result(job):
+        # 按数据频率记录耗时，便于比较重采样带来的提速
+        rows = len(data) + (len(comparison_data) if comparison_data is not None else 0)
+        timings = st.session_state.setdefault(f'timings_{result_key}', {})
+        timings[st.session_state.get('data_frequency', 'D')] = {
+            '数据行数': rows,
+            '耗时（秒）': round(job.elapsed, 2),
+        }
 
         # 将计算结果保存到 session_state
-        st.session_state[f'stats_df_{result_key}'] = statistics_df
-        st.session_state[f'fig_{result_key}'] = fig
+        result = job.result
+        st.session_state['comparison_rolling_cache'] = result['comparison_rolling_cache']
+        st.session_state[f'analyzed_metric_{result_key}'] = metric_name
+        st.session_state[f'stats_df_{result_key}'] = result['statistics_df']
+        st.session_state[f'stats_pivot_{result_key}'] = result['stats_pivot']
+        st.session_state[f'fig_{result_key}'] = result['fig']
+        st.session_state[f'peer_{result_key}'] = result['peer_figures']
+        st.session_state[f'rolling_tables_{result_key}'] = result['rolling_tables']
+        st.session_state[f'rolling_table_ids_{result_key}'] = result['rolling_table_ids']
+        for interval, stored, live in result['rolling_sources']:
+            st.caption(f"区间 {interval} 年：{stored} 只基金的滚动指标来自指标仓库，{live} 只实时计算")
+    job_progress(job_key)
 
     # 如果之前已经计算过，直接从 session_state 中读取
     if f'stats_df_{result_key}' in st.session_state and f'fig_{result_key}' in st.session_state:
-        statistics_df = st.session_state[f'stats_df_{result_key}']
+        stats_pivot = st.session_state.get(f'stats_pivot_{result_key}')
         fig = st.session_state[f'fig_{result_key}']
+        analyzed_metric = st.session_state.get(f'analyzed_metric_{result_key}', '年化收益率')
 
-        if not statistics_df.empty:
-            # 确保所有数值列都是数值型
-            num_cols = ['最小值', '最大值', '平均值', '标准差', '中位数', '偏度', '峰度', '25%分位点', '75%分位点',
-                        '75%分位点-25%分位点', '左0.1%尾部', '右0.1%尾部']
-            statistics_df[num_cols] = statistics_df[num_cols].apply(pd.to_numeric, errors='coerce')
-
-            # 删除 "类型" 列，不让其参与透视表
-            stats_pivot = statistics_df.drop(columns=['类型']).set_index(['基金代码', '区间']).T
+        # 分页展示各区间的滚动指标明细
+        table_ids = st.session_state.get(f'rolling_table_ids_{result_key}', {})
+        for interval, interval_data in st.session_state.get(f'rolling_tables_{result_key}', {}).items():
+            st.caption(f"区间 {interval} 年滚动{analyzed_metric}明细")
+            table_id = table_ids.get(interval) or data_fingerprint(interval_data)
+            paginated_dataframe(interval_data, key=f"rolling_table_{result_key}_{interval}",
+                                data_id=('rolling_table', result_key, interval, table_id), date_column='start_date')
 
+        if stats_pivot is not None:
             # 按行展示每个区间的统计指标，列保持为指标
-            st.subheader(f"所有区间的{tab_title}统计指标")
+            st.subheader(f"所有区间的{tab_title}统计指标（滚动{analyzed_metric}）")
             st.dataframe(stats_pivot)
 
         # 展示核密度图
         if fig:
-            fig = apply_custom_layout(fig)
             st.plotly_chart(fig)
 
+        # 展示不同数据频率下的数据行数和耗时
+        timings = st.session_state.get(f'timings_{result_key}', {})
+        if timings:
+            frequency_names = {'D': '日度', 'W-FRI': '周度', 'M': '月末'}
+            st.caption("不同数据频率下的计算规模与耗时")
+            st.dataframe(pd.DataFrame(timings).T.rename(index=frequency_names))
+
+        # 展示研究基金在对比基金池中的百分位排名
+        peer_figures = st.session_state.get(f'peer_{result_key}', [])
+        if peer_figures:
+            st.subheader(f"{tab_title}同类百分位排名")
+            for band_fig, rank_fig, peer_table in peer_figures:
+                st.plotly_chart(band_fig)
+                st.plotly_chart(rank_fig)
+                st.dataframe(peer_table)
+
+
+def get_nav_matrix(data, net_value_column, key):
+    """
+    获取基金 × 交易日净值矩阵，同一个 DataFrame 对象在会话内只构建一次。
+    """
+    cache = st.session_state.setdefault('nav_matrix_cache', {})
+    entry = cache.get((key, net_value_column))
+    if entry is None or entry[0] is not data:
+        entry = (data, build_nav_matrix(data, net_value_column))
+        cache[(key, net_value_column)] = entry
+    return entry[1]
+
+
+def analyze_period_returns(data, comparison_data):
+    st.header("区间收益率分析")
+
+    frequency_name = st.selectbox("选择统计区间", list(PERIOD_FREQUENCIES), key="period_frequency")
+    net_value_column = st.selectbox("选择净值", ['AdjustedUnitNV', 'UnitNVRestored'], key="period_net_value_column")
+
+    # 全部基金一次性计算区间收益率
+    # 查询区间没有覆盖完整的第一个、最后一个区间时，列名标注为部分区间
+    start_date = st.session_state['start_date']
+    end_date = st.session_state['end_date']
+    research_matrix = get_nav_matrix(data, net_value_column, 'result_df')
+    research_table = calculate_period_returns(research_matrix, start_date, end_date, PERIOD_FREQUENCIES[frequency_name])
+
+    # 今年以来收益率截至查询的结束日期；数据在今年之前就结束的基金为空值
+    research_table['今年以来'] = calculate_ytd_returns(research_matrix, end_date)
+
+    st.subheader(f"{frequency_name}收益率（%）")
+    st.dataframe(research_table.round(2))
+
+    if comparison_data is not None:
+        comparison_matrix = get_nav_matrix(comparison_data, net_value_column, 'comparison_df')
+        pool_table = calculate_period_returns(comparison_matrix, start_date, end_date,
+                                              PERIOD_FREQUENCIES[frequency_name])
+        pool_table['今年以来'] = calculate_ytd_returns(comparison_matrix, end_date)
+
+        rank_df, percentile_df = calculate_period_ranks(research_table, pool_table)
+        summary = pool_table.quantile([0.25, 0.5, 0.75])
+        summary.index = ['对比基金池25%分位', '对比基金池中位数', '对比基金池75%分位']
+
+        st.subheader("对比基金池收益率分布（%）")
+        st.dataframe(summary.round(2))
+
+        st.subheader("同类排名")
+        st.dataframe(rank_df)
+
+        st.subheader("同类百分位排名")
+        st.dataframe(percentile_df.round(2))
+
 
 def show():
     st.title("基金收益率分析")
@@ -509,7 +715,7 @@ def show():
         comparison_data = st.session_state['comparison_df']
 
     # 创建 tabs
-    tab1, tab2, tab3 = st.tabs(["滚动收益率分布分析", "每日收益率", "管理人收益率滚动分布"])
+    tab1, tab2, tab3, tab4 = st.tabs(["滚动收益率分布分析", "每日收益率", "管理人收益率滚动分布", "区间收益率"])
 
     # 滚动收益率分布分析
     with tab1:
@@ -519,25 +725,34 @@ def show():
     with tab2:
         st.header("每日收益率分析")
 
-        # 计算每日收益率
-        fund_data = data.copy()
-
-        # 计算调整后净值的每日收益率
-        fund_data = calculate_daily_returns(fund_data, 'AdjustedUnitNV', returns_column="Adjusted_Returns")
-
-        # 计算管理人净值的每日收益率
-        fund_data = calculate_daily_returns(fund_data, 'UnitNVRestored', returns_column="Manager_Returns")
+        # 计算每日收益率，按数据指纹缓存，未变化的重新运行直接复用
+        fingerprint = st.session_state.get('result_fingerprint') or data_fingerprint(data)
+        fund_data = cached_build(('daily_returns', fingerprint), lambda: calculate_all_daily_returns(data))
 
         # 展示每日收益率
         st.subheader("每日收益率数据")
-        st.dataframe(
-            fund_data[['TradingDay', 'AdjustedUnitNV', 'UnitNVRestored', 'Adjusted_Returns', 'Manager_Returns']])
+        paginated_dataframe(
+            fund_data[['SecuCode', 'TradingDay', 'AdjustedUnitNV', 'UnitNVRestored', 'Adjusted_Returns',
+                       'Manager_Returns']],
+            key='daily_returns_table', data_id=('daily_returns', fingerprint), date_column='TradingDay')
 
-        # 绘制每日收益率图
+        # 绘制每日收益率图，只绘制选择区间内的数据
         st.subheader("每日收益率和净值图表")
-        fig = plot_daily_returns(fund_data)
-        st.plotly_chart(fig)
+        min_day, max_day = cached_build(('date_bounds', fingerprint), lambda: date_bounds(fund_data['TradingDay']))
+        zoom_start, zoom_end = zoom_date_range(min_day, max_day, key='daily_returns_chart_range')
+        if zoom_start is not None:
+            fig = cached_build(
+                ('daily_returns_chart', fingerprint, zoom_start, zoom_end, DEFAULT_MAX_POINTS),
+                lambda: plot_daily_returns(
+                    fund_data[(fund_data['TradingDay'] >= zoom_start) & (fund_data['TradingDay'] <= zoom_end)]
+                )
+            )
+            st.plotly_chart(fig)
 
     # 管理人收益率滚动分布分析
     with tab3:
         analyze_rolling_returns("管理人收益率滚动分布分析", "UnitNVRestored", "tab3", data, comparison_data)
+
+    # 日历区间收益率分析
+    with tab4:
+        analyze_period_returns(data, comparison_data)
@@ -0,0 +1,144 @@
+import hashlib
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+
+# 每条曲线最多保留的点数，约等于图表宽度的像素数，更多的点在屏幕上也无法分辨
+DEFAULT_MAX_POINTS = 1200
+
+# 整张图的总点数超过该值时改用 WebGL 渲染（Scattergl）
+WEBGL_THRESHOLD = 20000
+
+# 会话内最多缓存的图表数量
+FIGURE_CACHE_SIZE = 16
+
+
+def lttb_indices(x, y, threshold):
+    """
+    使用 Largest-Triangle-Three-Buckets 算法选出 threshold 个代表点，返回其位置。
+
+    首尾两点固定保留，中间的点均分到 threshold - 2 个桶中，每个桶选出与
+    上一个已选点、下一个桶均值点构成三角形面积最大的点，能较好地保留曲线的形状和极值。
+
+    参数:
+    - x: 横坐标数组（日期会先转换为数值）
+    - y: 纵坐标数组，不能包含 NaN
+    - threshold: 保留的点数
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+
+    # 桶的边界：第一个点和最后一个点之外的部分均分
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    starts, ends = edges[:-1], edges[1:]
+
+    # 用累积和一次算出每个桶的均值点
+    cum_x = np.concatenate([[0.0], np.cumsum(x)])
+    cum_y = np.concatenate([[0.0], np.cumsum(y)])
+    sizes = ends - starts
+    avg_x = np.append((cum_x[ends] - cum_x[starts]) / sizes, x[-1])
+    avg_y = np.append((cum_y[ends] - cum_y[starts]) / sizes, y[-1])
+
+    selected = np.empty(threshold, dtype=int)
+    selected[0] = 0
+    selected[-1] = n - 1
+    anchor = 0
+    for i, (start, end) in enumerate(zip(starts, ends)):
+        next_x, next_y = avg_x[i + 1], avg_y[i + 1]
+        area = np.abs((x[anchor] - next_x) * (y[start:end] - y[anchor])
+                      - (x[anchor] - x[start:end]) * (next_y - y[anchor]))
+        anchor = start + int(np.argmax(area))
+        selected[i + 1] = anchor
+
+    return selected
+
+
+def downsample_series(x, y, max_points=DEFAULT_MAX_POINTS):
+    """
+    去掉缺失值后用 LTTB 将序列降采样到不超过 max_points 个点。
+    """
+    x = pd.Series(x).reset_index(drop=True)
+    y = pd.Series(y).reset_index(drop=True)
+    valid = y.notna().to_numpy()
+    x, y = x[valid], y[valid]
+
+    numeric_x = x.astype('int64') if pd.api.types.is_datetime64_any_dtype(x) else x
+    positions = lttb_indices(numeric_x.to_numpy(), y.to_numpy(), max_points)
+    return x.to_numpy()[positions], y.to_numpy()[positions]
+
+
+def line_trace(x, y, name, max_points=DEFAULT_MAX_POINTS, use_webgl=False, **kwargs):
+    """
+    生成降采样后的折线 trace，use_webgl 为 True 时使用 Scattergl。
+    """
+    # plotly 只在绘图时导入，导入页面模块时不需要
+    import plotly.graph_objects as go
+
+    x_values, y_values = downsample_series(x, y, max_points)
+    trace_type = go.Scattergl if use_webgl else go.Scatter
+    return trace_type(x=x_values, y=y_values, mode='lines', name=name, **kwargs)
+
+
+def should_use_webgl(total_points, threshold=WEBGL_THRESHOLD):
+    """
+    根据整张图降采样后的总点数决定是否使用 WebGL 渲染。
+    """
+    return total_points > threshold
+
+
+def data_fingerprint(data):
+    """
+    计算 DataFrame 的内容指纹，用于图表缓存的键。数据较大时应在数据生成时计算一次并保存。
+    """
+    hashed = pd.util.hash_pandas_object(data, index=False)
+    return hashlib.sha1(hashed.to_numpy().tobytes()).hexdigest()[:16]
+
+
+def cached_build(key, build):
+    """
+    按 key 缓存 build() 的结果（图表等），key 不变的重新运行直接返回上次的结果，
+    不做任何 pandas 或 Plotly 计算。缓存保存在 session_state 中，超过 FIGURE_CACHE_SIZE 时淘汰最早的一项。
+
+    参数:
+    - key: 可哈希的缓存键，应包含数据指纹和所有影响结果的选择
+    - build: 无参数的构建函数
+    """
+    cache = st.session_state.setdefault('figure_cache', {})
+    if key not in cache:
+        if len(cache) >= FIGURE_CACHE_SIZE:
+            cache.pop(next(iter(cache)))
+        cache[key] = build()
+    return cache[key]
+
+
+def date_bounds(trading_days):
+    """
+    返回日期序列的最早和最晚日期（datetime.date），没有有效日期时返回 (None, None)。
+    """
+    trading_days = pd.to_datetime(pd.Series(trading_days)).dropna()
+    if trading_days.empty:
+        return None, None
+    return trading_days.min().date(), trading_days.max().date()
+
+
+def zoom_date_range(min_day, max_day, key):
+    """
+    显示日期区间滑块，返回用户选择的区间。
+
+    图表只发送降采样后的数据，需要查看细节时在这里缩小区间，
+    区间内的数据会按完整分辨率重新降采样（点数不超过上限时即为全部原始数据）。
+    """
+    if min_day is None:
+        return None, None
+    if min_day == max_day:
+        return pd.Timestamp(min_day), pd.Timestamp(max_day)
+
+    start_day, end_day = st.slider("图表显示区间", min_value=min_day, max_value=max_day, value=(min_day, max_day),
+                                   key=key)
+    return pd.Timestamp(start_day), pd.Timestamp(end_day)
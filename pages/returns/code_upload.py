@@ -0,0 +1,131 @@
+import csv
+import hashlib
+import io
+import os
+
+
+# 上传的基金代码文件大小上限（MB），可通过环境变量 CODE_FILE_MAX_MB 修改；
+# .streamlit/config.toml 中的 server.maxUploadSize 在浏览器上传时先行拒绝更大的文件
+CODE_FILE_MAX_MB = float(os.environ.get('CODE_FILE_MAX_MB', 20))
+
+# 单个文件最多读取的基金代码数量，超过时停止读取并报错
+CODE_FILE_MAX_CODES = 100000
+
+# 支持的文件类型
+CODE_FILE_TYPES = ['xlsx', 'csv', 'txt']
+
+CODE_COLUMN = 'SecuCode'
+
+
+def content_hash(content):
+    return hashlib.sha1(content).hexdigest()
+
+
+def check_size(size):
+    """
+    文件超过 CODE_FILE_MAX_MB 时抛出 ValueError，在读取内容之前调用。
+    """
+    if size > CODE_FILE_MAX_MB * 1024 * 1024:
+        raise ValueError(f"文件大小 {size / 1024 / 1024:.1f} MB 超过上限 {CODE_FILE_MAX_MB:g} MB")
+
+
+def cell_to_code(value):
+    # Excel 中以数字保存的代码读取为 int / float，转换为不带小数的文本，前导零由校验时补足
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def append_code(codes, value):
+    if value is None:
+        return
+    code = cell_to_code(value)
+    if code:
+        if len(codes) >= CODE_FILE_MAX_CODES:
+            raise ValueError(f"基金代码超过 {CODE_FILE_MAX_CODES} 个，请拆分文件后上传")
+        codes.append(code)
+
+
+def read_excel_codes(stream):
+    """
+    以只读流式模式读取第一个工作表的 SecuCode 列，只遍历这一列，不解析其他列和工作表。
+    """
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(stream, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        header = next(sheet.iter_rows(min_row=1, max_row=1, values_only=True), ())
+        headers = [str(value).strip() if value is not None else '' for value in header]
+        if CODE_COLUMN not in headers:
+            raise ValueError(f"文件中未找到 '{CODE_COLUMN}' 列")
+        column = headers.index(CODE_COLUMN) + 1
+
+        codes = []
+        for (value,) in sheet.iter_rows(min_row=2, min_col=column, max_col=column, values_only=True):
+            append_code(codes, value)
+        return codes
+    finally:
+        workbook.close()
+
+
+def read_csv_codes(stream):
+    """
+    逐行读取 CSV 的 SecuCode 列。
+    """
+    reader = csv.reader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+    headers = [value.strip() for value in next(reader, [])]
+    if CODE_COLUMN not in headers:
+        raise ValueError(f"文件中未找到 '{CODE_COLUMN}' 列")
+    column = headers.index(CODE_COLUMN)
+
+    codes = []
+    for row in reader:
+        if column < len(row):
+            append_code(codes, row[column])
+    return codes
+
+
+def read_text_codes(stream):
+    """
+    读取文本文件，每行一个代码或以逗号、空白分隔；第一行为 SecuCode 时作为表头跳过。
+    """
+    codes = []
+    for line in io.TextIOWrapper(stream, encoding='utf-8-sig'):
+        for value in line.replace(',', ' ').split():
+            if value != CODE_COLUMN:
+                append_code(codes, value)
+    return codes
+
+
+CODE_READERS = {
+    'xlsx': read_excel_codes,
+    'csv': read_csv_codes,
+    'txt': read_text_codes,
+}
+
+
+def read_codes(stream, extension):
+    """
+    从文件流中读取基金代码列表（未去重），extension 为 'xlsx'、'csv' 或 'txt'。
+    文件格式错误、缺少 SecuCode 列或代码过多时抛出 ValueError。
+    """
+    extension = extension.lower().lstrip('.')
+    if extension not in CODE_READERS:
+        raise ValueError(f"不支持的文件类型: {extension}，可选 {'、'.join(CODE_FILE_TYPES)}")
+    try:
+        return CODE_READERS[extension](stream)
+    except ValueError:
+        raise
+    except Exception as e:
+        raise ValueError(f"无法读取文件: {e}") from e
+
+
+def read_codes_file(path):
+    """
+    读取本地基金代码文件，.xlsx / .csv 需要包含 SecuCode 列，其余按每行一个代码（或逗号分隔）读取。
+    """
+    check_size(os.path.getsize(path))
+    extension = os.path.splitext(path)[1].lower().lstrip('.')
+    with open(path, 'rb') as f:
+        return read_codes(f, extension if extension in CODE_READERS else 'txt')
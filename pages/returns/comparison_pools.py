@@ -0,0 +1,77 @@
+import datetime
+import json
+import os
+import threading
+
+
+# 命名对比基金池的保存文件，可通过环境变量 COMPARISON_POOLS_PATH 修改
+COMPARISON_POOLS_PATH = os.environ.get('COMPARISON_POOLS_PATH', 'comparison_pools.json')
+
+# 每天预热的基金池数量（按使用次数取前几个）
+PRELOAD_POOL_COUNT = int(os.environ.get('PRELOAD_POOL_COUNT', 3))
+
+_lock = threading.Lock()
+
+
+def load_pools(path=None):
+    """
+    读取全部命名基金池：{名称: {'codes': [...], 'created_at', 'updated_at', 'use_count', 'last_used'}}。
+    """
+    path = path or COMPARISON_POOLS_PATH
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def write_pools(pools, path=None):
+    # 先写临时文件再替换，多个会话同时保存时不会读到写了一半的文件
+    path = path or COMPARISON_POOLS_PATH
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(pools, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def save_pool(name, codes, path=None):
+    """
+    保存（或覆盖）命名基金池，保留原有的使用次数。
+    """
+    now = datetime.datetime.now().isoformat(timespec='seconds')
+    with _lock:
+        pools = load_pools(path)
+        pool = pools.get(name, {'created_at': now, 'use_count': 0, 'last_used': None})
+        pool.update({'codes': list(dict.fromkeys(codes)), 'updated_at': now})
+        pools[name] = pool
+        write_pools(pools, path)
+    return pool
+
+
+def delete_pool(name, path=None):
+    with _lock:
+        pools = load_pools(path)
+        if pools.pop(name, None) is not None:
+            write_pools(pools, path)
+
+
+def record_pool_use(name, path=None):
+    """
+    记录基金池被加载一次，预热时按使用次数选择基金池。
+    """
+    with _lock:
+        pools = load_pools(path)
+        if name not in pools:
+            return
+        pools[name]['use_count'] = pools[name].get('use_count', 0) + 1
+        pools[name]['last_used'] = datetime.datetime.now().isoformat(timespec='seconds')
+        write_pools(pools, path)
+
+
+def most_used_pools(count=PRELOAD_POOL_COUNT, path=None):
+    """
+    按使用次数（其次按最近使用时间）返回前 count 个基金池：[(名称, 基金代码列表)]。
+    """
+    pools = load_pools(path)
+    ranked = sorted(pools.items(), key=lambda item: (item[1].get('use_count', 0), item[1].get('last_used') or ''),
+                    reverse=True)
+    return [(name, pool['codes']) for name, pool in ranked[:count] if pool.get('codes')]
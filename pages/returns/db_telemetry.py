@@ -0,0 +1,174 @@
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import pandas as pd
+from sqlalchemy import event
+
+
+# 执行 + 读取耗时超过该秒数的语句写入慢查询日志，可通过环境变量 SLOW_QUERY_SECONDS 修改
+SLOW_QUERY_SECONDS = float(os.environ.get('SLOW_QUERY_SECONDS', 5.0))
+
+# 慢查询日志文件（JSON Lines），可通过环境变量 SLOW_QUERY_LOG_PATH 修改
+SLOW_QUERY_LOG_PATH = os.environ.get('SLOW_QUERY_LOG_PATH',
+                                     os.path.join(tempfile.gettempdir(), 'zzb_slow_queries.jsonl'))
+
+# 进程内保留的语句记录数量
+QUERY_HISTORY_SIZE = 2000
+
+# 记录中参数的最大长度，过长的参数截断
+MAX_PARAMETER_LENGTH = 500
+
+_queries = deque(maxlen=QUERY_HISTORY_SIZE)
+_connection_waits = deque(maxlen=QUERY_HISTORY_SIZE)
+_lock = threading.Lock()
+
+
+def normalize_statement(statement):
+    """
+    合并空白并截断，用于按语句分组统计。
+    """
+    return re.sub(r'\s+', ' ', statement).strip()[:200]
+
+
+def format_parameters(parameters, executemany=False):
+    # executemany 的参数是多组参数的列表，只记录组数和前几组，不对整个列表做 repr
+    if executemany and isinstance(parameters, (list, tuple)) and len(parameters) > 3:
+        text = f'{len(parameters)} 组参数: {parameters[:3]!r} ...'
+    else:
+        text = repr(parameters)
+    return text if len(text) <= MAX_PARAMETER_LENGTH else text[:MAX_PARAMETER_LENGTH] + '...'
+
+
+def write_slow_query(record):
+    record['slow'] = True
+    with _lock, open(SLOW_QUERY_LOG_PATH, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+
+
+def check_slow(record):
+    total = record['execute_seconds'] + (record['fetch_seconds'] or 0.0)
+    if total >= SLOW_QUERY_SECONDS and not record.get('slow'):
+        write_slow_query(record)
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_start'].pop()
+    record = {
+        'started_at': time.time() - elapsed,
+        'statement': normalize_statement(statement),
+        'parameters': format_parameters(parameters, executemany),
+        'executemany': executemany,
+        'execute_seconds': round(elapsed, 6),
+        'fetch_seconds': None,
+        'rows': cursor.rowcount if cursor.rowcount is not None and cursor.rowcount >= 0 else None,
+        'thread': threading.current_thread().name,
+    }
+    with _lock:
+        _queries.append(record)
+    # 读取结果的耗时由 record_fetch 补充到同一条记录
+    conn.info['last_query'] = record
+    check_slow(record)
+
+
+def install_telemetry(engine):
+    """
+    在引擎上注册事件监听，记录每条语句的参数、执行耗时和行数。同一个引擎只注册一次。
+    """
+    if getattr(engine, '_telemetry_installed', False):
+        return engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', after_cursor_execute)
+    engine._telemetry_installed = True
+    return engine
+
+
+@contextmanager
+def connect(engine):
+    """
+    与 engine.connect() 相同，同时记录获取连接的耗时（连接池排队等待或新建连接）。
+    """
+    start = time.perf_counter()
+    with engine.connect() as conn:
+        wait = time.perf_counter() - start
+        status = engine.pool.status() if hasattr(engine.pool, 'status') else ''
+        with _lock:
+            _connection_waits.append({'started_at': time.time() - wait, 'wait_seconds': round(wait, 6),
+                                      'pool_status': status})
+        yield conn
+
+
+def record_fetch(conn, seconds, rows):
+    """
+    把读取结果的耗时和行数补充到该连接上最近一条语句的记录中，并重新检查是否为慢查询。
+    """
+    record = conn.info.get('last_query')
+    if record is None:
+        return
+    record['fetch_seconds'] = round(seconds, 6)
+    record['rows'] = rows
+    check_slow(record)
+
+
+def query_history():
+    with _lock:
+        return pd.DataFrame(list(_queries))
+
+
+def query_summary():
+    """
+    按语句汇总：次数、执行和读取耗时（合计、平均、P95、最大）以及行数，用于容量规划。
+    """
+    history = query_history()
+    if history.empty:
+        return history
+
+    history['fetch_seconds'] = history['fetch_seconds'].astype(float).fillna(0.0)
+    history['total_seconds'] = history['execute_seconds'] + history['fetch_seconds']
+    summary = history.groupby('statement').agg(
+        次数=('total_seconds', 'size'),
+        总耗时秒=('total_seconds', 'sum'),
+        平均耗时秒=('total_seconds', 'mean'),
+        P95耗时秒=('total_seconds', lambda seconds: seconds.quantile(0.95)),
+        最大耗时秒=('total_seconds', 'max'),
+        平均读取秒=('fetch_seconds', 'mean'),
+        总行数=('rows', lambda rows: rows.dropna().sum()),
+    )
+    return summary.sort_values('总耗时秒', ascending=False).round(4)
+
+
+def connection_wait_summary():
+    """
+    获取连接耗时的统计：次数、平均、P95、最大，以及最近一次的连接池状态。
+    """
+    with _lock:
+        waits = pd.DataFrame(list(_connection_waits))
+    if waits.empty:
+        return {}
+    return {
+        '次数': len(waits),
+        '平均耗时秒': round(waits['wait_seconds'].mean(), 4),
+        'P95耗时秒': round(waits['wait_seconds'].quantile(0.95), 4),
+        '最大耗时秒': round(waits['wait_seconds'].max(), 4),
+        '连接池状态': waits['pool_status'].iloc[-1],
+    }
+
+
+def read_slow_queries(limit=100):
+    """
+    读取慢查询日志中最近的 limit 条记录。
+    """
+    if not os.path.exists(SLOW_QUERY_LOG_PATH):
+        return pd.DataFrame()
+    with open(SLOW_QUERY_LOG_PATH, encoding='utf-8') as f:
+        lines = deque(f, maxlen=limit)
+    return pd.DataFrame([json.loads(line) for line in lines])
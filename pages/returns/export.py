@@ -0,0 +1,122 @@
+import os
+import tempfile
+import time
+
+import streamlit as st
+
+from pages.returns.file_writers import EXCEL_MAX_ROWS, write_csv_gz, write_excel, write_parquet
+
+
+# 导出文件的临时存放目录，可通过环境变量 EXPORT_DIR 修改
+EXPORT_DIR = os.environ.get('EXPORT_DIR', os.path.join(tempfile.gettempdir(), 'zzb_exports'))
+
+# 超过该小时数的导出文件会在生成新文件时清理
+EXPORT_MAX_AGE_HOURS = 24
+
+# 通过浏览器下载的文件大小上限（MB），可通过环境变量 EXPORT_DOWNLOAD_MAX_MB 修改。
+# st.download_button 会把整个文件读入服务器内存再发送，超过上限的文件只显示服务器上的保存路径
+EXPORT_DOWNLOAD_MAX_MB = float(os.environ.get('EXPORT_DOWNLOAD_MAX_MB', 200))
+
+# 导出格式：显示名称 -> (扩展名, MIME 类型)
+EXPORT_FORMATS = {
+    'Excel (.xlsx)': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'CSV (.csv.gz)': ('csv.gz', 'application/gzip'),
+    'Parquet (.parquet)': ('parquet', 'application/octet-stream'),
+}
+
+
+def remove_stale_exports(export_dir=None, max_age_hours=EXPORT_MAX_AGE_HOURS):
+    """
+    删除超过 max_age_hours 小时的导出文件。
+    """
+    export_dir = export_dir or EXPORT_DIR
+    if not os.path.isdir(export_dir):
+        return
+
+    cutoff = time.time() - max_age_hours * 3600
+    for name in os.listdir(export_dir):
+        path = os.path.join(export_dir, name)
+        if os.path.isfile(path) and os.path.getmtime(path) < cutoff:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def export_dataframe(df, extension='xlsx', export_dir=None, **kwargs):
+    """
+    将 DataFrame 流式写入导出目录下的临时文件，返回文件路径。
+
+    参数:
+    - df: 需要导出的 DataFrame
+    - extension: 'xlsx'、'csv.gz' 或 'parquet'
+    - export_dir: 导出目录，默认为 EXPORT_DIR
+    - kwargs: 传给对应写入函数的参数（如 sheet_name_prefix、max_rows_per_sheet）
+    """
+    writers = {'xlsx': write_excel, 'csv.gz': write_csv_gz, 'parquet': write_parquet}
+    if extension not in writers:
+        raise ValueError(f"不支持的导出格式：{extension}")
+
+    export_dir = export_dir or EXPORT_DIR
+    os.makedirs(export_dir, exist_ok=True)
+    remove_stale_exports(export_dir)
+
+    fd, path = tempfile.mkstemp(dir=export_dir, prefix='export_', suffix=f'.{extension}')
+    os.close(fd)
+    try:
+        writers[extension](df, path, **kwargs)
+    except Exception:
+        os.remove(path)
+        raise
+    return path
+
+
+def export_download_button(df, file_stem, key):
+    """
+    显示导出格式选择和“生成下载文件”按钮。文件流式写入磁盘，写入过程的内存占用与行数无关，
+    session_state 中只保存文件路径，重新生成时删除旧文件。
+    下载时 st.download_button 仍会把整个文件读入服务器内存，因此超过 EXPORT_DOWNLOAD_MAX_MB 的文件
+    不提供下载按钮，只显示服务器上的文件路径（更大的数据建议用 batch.py 直接导出）。
+
+    参数:
+    - df: 需要导出的 DataFrame
+    - file_stem: 下载文件名（不含扩展名）
+    - key: 控件 key 的前缀，同一页面中需要唯一
+    """
+    col1, col2 = st.columns([2, 1])
+    with col1:
+        format_name = st.selectbox("导出格式", list(EXPORT_FORMATS), key=f"{key}_format")
+    extension, mime = EXPORT_FORMATS[format_name]
+    if len(df) > EXCEL_MAX_ROWS and extension == 'xlsx':
+        st.info("数据超过 Excel 单表行数上限，将拆分为多个工作表；大数据量建议导出 CSV 或 Parquet。")
+
+    state_key = f"{key}_export_path"
+    with col2:
+        generate = st.button("生成下载文件", key=f"{key}_generate")
+    if generate:
+        previous = st.session_state.pop(state_key, None)
+        if previous and os.path.exists(previous[0]):
+            os.remove(previous[0])
+        with st.spinner("正在生成下载文件..."):
+            try:
+                st.session_state[state_key] = (export_dataframe(df, extension), extension, mime)
+            except ImportError as e:
+                st.error(str(e))
+
+    exported = st.session_state.get(state_key)
+    if exported and os.path.exists(exported[0]):
+        path, extension, mime = exported
+        size_mb = os.path.getsize(path) / 1024 / 1024
+        st.caption(f"文件大小：{size_mb:.1f} MB")
+        if size_mb > EXPORT_DOWNLOAD_MAX_MB:
+            st.warning(f"文件超过 {EXPORT_DOWNLOAD_MAX_MB:g} MB，不通过浏览器下载，已保存在服务器：{path}"
+                       f"（{EXPORT_MAX_AGE_HOURS} 小时后自动清理）")
+            return
+        with open(path, 'rb') as f:
+            st.download_button(
+                label="点击下载",
+                data=f,
+                file_name=f'{file_stem}.{extension}',
+                mime=mime,
+                key=f"{key}_download",
+            )
@@ -0,0 +1,133 @@
+import gzip
+
+import pandas as pd
+
+from pages.returns.perf import timed
+
+
+# Excel 单个工作表最多 1048576 行，其中一行为表头
+EXCEL_MAX_ROWS = 1048575
+
+# 每次从 DataFrame 中取出并写入的行数，决定导出时额外占用的内存
+EXPORT_CHUNK_ROWS = 50000
+
+
+def iter_chunks(df, start=0, stop=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    """
+    按行分块遍历 DataFrame 的 [start, stop) 区间，每次只复制 chunk_rows 行。
+    """
+    stop = len(df) if stop is None else min(stop, len(df))
+    for chunk_start in range(start, stop, chunk_rows):
+        yield df.iloc[chunk_start:min(chunk_start + chunk_rows, stop)]
+
+
+@timed('Excel 导出')
+def write_excel(df, path, sheet_name_prefix="Sheet", max_rows_per_sheet=EXCEL_MAX_ROWS,
+                chunk_rows=EXPORT_CHUNK_ROWS):
+    """
+    以 xlsxwriter 的 constant_memory 模式流式写入 Excel 文件。
+
+    constant_memory 模式下每写完一行就把该行刷到磁盘，内存占用与行数无关，
+    但要求按行顺序写入，因此这里逐块按行写出，而不使用 DataFrame.to_excel（按列写入单元格）。
+    超过 max_rows_per_sheet 行时拆分到多个工作表。
+
+    参数:
+    - df: 需要导出的 DataFrame
+    - path: 输出文件路径
+    - sheet_name_prefix: 每个工作表的前缀名称
+    - max_rows_per_sheet: 每个工作表最多包含的行数（不含表头）
+    - chunk_rows: 每次写入的行数
+    """
+    import xlsxwriter
+
+    max_rows_per_sheet = max(1, min(max_rows_per_sheet, EXCEL_MAX_ROWS))
+    workbook = xlsxwriter.Workbook(path, {
+        'constant_memory': True,
+        'default_date_format': 'yyyy-mm-dd',
+        'strings_to_numbers': False,
+        'strings_to_urls': False,
+    })
+    header = [str(column) for column in df.columns]
+    try:
+        num_sheets = max(1, -(-len(df) // max_rows_per_sheet))
+        for i in range(num_sheets):
+            worksheet = workbook.add_worksheet(f'{sheet_name_prefix}{i + 1}')
+            worksheet.write_row(0, 0, header)
+
+            row = 1
+            start_row = i * max_rows_per_sheet
+            for chunk in iter_chunks(df, start_row, start_row + max_rows_per_sheet, chunk_rows):
+                # 缺失值写为空单元格，xlsxwriter 无法写入 NaN
+                values = chunk.astype(object).where(chunk.notna(), None).to_numpy()
+                for record in values:
+                    worksheet.write_row(row, 0, record)
+                    row += 1
+    finally:
+        workbook.close()
+
+
+@timed('CSV 导出')
+def write_csv_gz(df, path, chunk_rows=EXPORT_CHUNK_ROWS):
+    """
+    分块写入 gzip 压缩的 CSV 文件（UTF-8 BOM，Excel 可直接打开中文）。
+    """
+    with gzip.open(path, 'wt', encoding='utf-8-sig', newline='') as f:
+        for i, chunk in enumerate(iter_chunks(df, chunk_rows=chunk_rows)):
+            chunk.to_csv(f, index=False, header=(i == 0))
+        if df.empty:
+            df.to_csv(f, index=False)
+
+
+def parquet_schema(df):
+    """
+    根据整列数据确定每列的 Arrow 类型。object 列（如日期、混合空值的文本）按全部非空值确定类型，
+    不能只看空表或第一块数据；全为空值或类型混杂的列按文本保存。每次只转换一列。
+
+    返回:
+    - (schema, 需要转换为文本的列)
+    """
+    import pyarrow as pa
+
+    fields = []
+    text_columns = []
+    for column in df.columns:
+        series = df[column]
+        if series.dtype == object:
+            values = series.dropna()
+            try:
+                # 转换整列而不只是推断：推断只检查部分取值，混杂类型要到写入时才会出错
+                arrow_type = pa.array(values.to_numpy(), from_pandas=True).type if len(values) else pa.string()
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                arrow_type = pa.string()
+                text_columns.append(column)
+            if pa.types.is_null(arrow_type):
+                arrow_type = pa.string()
+        else:
+            arrow_type = pa.Schema.from_pandas(series.iloc[:0].to_frame(), preserve_index=False).field(0).type
+        fields.append(pa.field(str(column), arrow_type))
+    return pa.schema(fields), text_columns
+
+
+@timed('Parquet 导出')
+def write_parquet(df, path, chunk_rows=EXPORT_CHUNK_ROWS, schema=None):
+    """
+    按行组分块写入 Parquet 文件，需要安装 pyarrow。
+
+    参数:
+    - schema: 指定的 Arrow schema，默认由 parquet_schema 根据整列数据确定
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("导出 Parquet 需要安装 pyarrow：pip install pyarrow")
+
+    text_columns = []
+    if schema is None:
+        schema, text_columns = parquet_schema(df)
+    with pq.ParquetWriter(path, schema, compression='snappy') as writer:
+        for chunk in iter_chunks(df, chunk_rows=chunk_rows):
+            if text_columns:
+                chunk = chunk.assign(**{column: chunk[column].map(lambda value: None if pd.isna(value) else str(value))
+                                        for column in text_columns})
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
@@ -0,0 +1,74 @@
+import os
+import sqlite3
+
+import pandas as pd
+
+from pages.returns.synthetic_data import generate_fund_data
+
+
+# 表结构与生产库中查询用到的列一致，日期以 YYYY-MM-DD 文本保存，与查询参数的格式相同
+FIXTURE_SCHEMA = '''
+CREATE TABLE SecuMain (InnerCode INTEGER PRIMARY KEY, SecuCode VARCHAR(50), ChiName VARCHAR(200),
+                       SecuCategory INTEGER);
+CREATE TABLE MF_NetValuePerformanceHis (InnerCode INTEGER, TradingDay DATE, UnitNV DECIMAL(18, 6));
+CREATE TABLE MF_FundNetValueRe (InnerCode INTEGER, TradingDay DATE, UnitNVRestored DECIMAL(18, 6));
+CREATE TABLE MF_Dividend (InnerCode INTEGER, ExRightDate DATE, ActualRatioAfterTax DECIMAL(18, 6));
+CREATE TABLE MF_SharesSplit (InnerCode INTEGER, ActualSplitDay DATE, SplitRatio DECIMAL(18, 6));
+CREATE INDEX IX_SecuMain_SecuCode ON SecuMain (SecuCode);
+CREATE INDEX IX_NetValue ON MF_NetValuePerformanceHis (TradingDay, InnerCode);
+CREATE INDEX IX_NetValue_Inner ON MF_NetValuePerformanceHis (InnerCode, TradingDay);
+CREATE INDEX IX_NetValueRe ON MF_FundNetValueRe (InnerCode, TradingDay);
+CREATE INDEX IX_Dividend ON MF_Dividend (InnerCode, ExRightDate);
+CREATE INDEX IX_SharesSplit ON MF_SharesSplit (InnerCode, ActualSplitDay);
+'''
+
+# 写入时每批的基金数
+FIXTURE_CHUNK_FUNDS = 500
+
+
+def split_tables(data):
+    """
+    把 generate_fund_data 生成的宽表拆成与生产库相同的五张表。
+    查询中分红比例按每 10 份计（ActualRatioAfterTax / 10），写入时乘以 10。
+    """
+    days = data['TradingDay'].dt.strftime('%Y-%m-%d')
+    secu_main = data.drop_duplicates('InnerCode')[['InnerCode', 'SecuCode', 'ChiName']].assign(SecuCategory=8)
+    dividends = data['ActualRatioAfterTax'].notna()
+    splits = data['SplitRatio'].notna()
+    return {
+        'SecuMain': secu_main,
+        'MF_NetValuePerformanceHis': pd.DataFrame({'InnerCode': data['InnerCode'], 'TradingDay': days,
+                                                   'UnitNV': data['UnitNV']}),
+        'MF_FundNetValueRe': pd.DataFrame({'InnerCode': data['InnerCode'], 'TradingDay': days,
+                                           'UnitNVRestored': data['UnitNVRestored']}),
+        'MF_Dividend': pd.DataFrame({'InnerCode': data.loc[dividends, 'InnerCode'],
+                                     'ExRightDate': days[dividends],
+                                     'ActualRatioAfterTax': data.loc[dividends, 'ActualRatioAfterTax'] * 10}),
+        'MF_SharesSplit': pd.DataFrame({'InnerCode': data.loc[splits, 'InnerCode'], 'ActualSplitDay': days[splits],
+                                        'SplitRatio': data.loc[splits, 'SplitRatio']}),
+    }
+
+
+def create_fixture_database(path, n_funds, years, end_date='2024-12-31', seed=0):
+    """
+    生成本地 SQLite 数据库，包含 n_funds 只模拟基金 years 年的净值、分红和拆分数据。
+    已存在的文件会被覆盖。配置中设置 dialect = "sqlite"、database = path 即可用该数据库代替生产库。
+
+    返回:
+    - 写入的净值行数
+    """
+    if os.path.exists(path):
+        os.remove(path)
+
+    total_rows = 0
+    with sqlite3.connect(path) as conn:
+        conn.executescript(FIXTURE_SCHEMA)
+        # 分批生成和写入，内存占用与基金总数无关
+        for first in range(0, n_funds, FIXTURE_CHUNK_FUNDS):
+            count = min(FIXTURE_CHUNK_FUNDS, n_funds - first)
+            data = generate_fund_data(count, years, end_date=end_date, seed=seed + first, first_code=first)
+            for table, frame in split_tables(data).items():
+                frame.to_sql(table, conn, if_exists='append', index=False)
+            total_rows += len(data)
+        conn.execute('ANALYZE')
+    return total_rows
@@ -0,0 +1,94 @@
+import os
+import re
+import time
+from collections import namedtuple
+
+import numpy as np
+
+
+# 基金代码索引的刷新间隔（秒），可通过环境变量 FUND_INDEX_TTL_SECONDS 修改
+FUND_INDEX_TTL_SECONDS = int(os.environ.get('FUND_INDEX_TTL_SECONDS', 6 * 3600))
+
+# 搜索默认返回的结果数量
+SEARCH_LIMIT = 20
+
+# 基金代码的后缀（如 000001.OF），校验时去除
+CODE_SUFFIX_PATTERN = re.compile(r'\.[A-Za-z]+$')
+
+# funds: 按 SecuCode 排序的 DataFrame（InnerCode、SecuCode、ChiName），codes: 排序后的代码数组，用于前缀二分查找
+# search_text: 每只基金的 "代码 名称"（小写），用于子串搜索；positions: 代码 → 行号；loaded_at: 加载时间
+FundIndex = namedtuple('FundIndex', ['funds', 'codes', 'search_text', 'positions', 'loaded_at'])
+
+# 代码列表校验结果：valid 为去重后的有效代码（保持输入顺序），duplicates 为重复输入的代码，unknown 为不存在的代码
+CodeValidation = namedtuple('CodeValidation', ['valid', 'duplicates', 'unknown'])
+
+
+def build_fund_index(universe):
+    """
+    由 fetch_fund_universe 的结果构建基金代码索引，之后的搜索和校验都在内存中完成，不再查询数据库。
+    """
+    funds = universe.drop_duplicates('SecuCode').sort_values('SecuCode', kind='stable').reset_index(drop=True)
+    funds['SecuCode'] = funds['SecuCode'].astype(str)
+    funds['ChiName'] = funds['ChiName'].fillna('').astype(str)
+    codes = funds['SecuCode'].to_numpy(dtype=str)
+    search_text = (funds['SecuCode'] + ' ' + funds['ChiName']).str.lower()
+    positions = {code: i for i, code in enumerate(codes)}
+    return FundIndex(funds, codes, search_text, positions, time.time())
+
+
+def search_funds(index, query, limit=SEARCH_LIMIT):
+    """
+    按代码前缀或代码、名称子串搜索基金，代码前缀匹配的结果排在前面。
+
+    返回:
+    - DataFrame，包含 'InnerCode'、'SecuCode'、'ChiName' 列，最多 limit 行
+    """
+    query = query.strip()
+    if not query:
+        return index.funds.iloc[:0]
+
+    # 排序后的代码数组上二分查找前缀的范围
+    lower = np.searchsorted(index.codes, query, side='left')
+    upper = np.searchsorted(index.codes, query + '\uffff', side='left')
+    prefix = list(range(lower, min(upper, lower + limit)))
+
+    if len(prefix) < limit:
+        matched = np.flatnonzero(index.search_text.str.contains(query.lower(), regex=False).to_numpy())
+        seen = set(prefix)
+        prefix += [i for i in matched if i not in seen][:limit - len(prefix)]
+    return index.funds.iloc[prefix]
+
+
+def normalize_code(code):
+    """
+    规范化输入的基金代码：去除空白和后缀；Excel 中被当作数字读取后丢失的前导零补足为六位。
+    """
+    code = CODE_SUFFIX_PATTERN.sub('', str(code).strip())
+    if code.endswith('.0') and code[:-2].isdigit():
+        code = code[:-2]
+    if code.isdigit() and len(code) < 6:
+        code = code.zfill(6)
+    return code
+
+
+def validate_codes(index, codes):
+    """
+    批量校验手动输入或上传的基金代码：规范化、去重，并找出不存在的代码，在查询净值之前完成。
+    """
+    valid = []
+    duplicates = []
+    unknown = []
+    seen = set()
+    for code in codes:
+        code = normalize_code(code)
+        if not code or code.lower() == 'nan':
+            continue
+        if code in seen:
+            duplicates.append(code)
+            continue
+        seen.add(code)
+        if code in index.positions:
+            valid.append(code)
+        else:
+            unknown.append(code)
+    return CodeValidation(valid, list(dict.fromkeys(duplicates)), unknown)
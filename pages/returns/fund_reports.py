@@ -0,0 +1,242 @@
+import datetime
+import hashlib
+import importlib.util
+import json
+import os
+
+import pandas as pd
+import plotly.graph_objects as go
+
+from pages.returns.indicators import calculate_peer_percentiles, calculate_rolling_returns, calculate_statistics
+from pages.returns.nav_matrix import build_nav_matrix
+from pages.returns.perf import timed
+from pages.returns.period_returns import calculate_period_ranks, calculate_period_returns, calculate_ytd_returns
+
+
+# 报告默认包含的滚动区间（年）和使用的净值列
+REPORT_INTERVALS = [1, 3]
+REPORT_NET_VALUE_COLUMN = 'AdjustedUnitNV'
+
+# 净值表的列顺序，与净值分析页面一致
+REPORT_NAV_COLUMNS = ['SecuCode', 'ChiName', 'TradingDay', 'UnitNV', 'a', 'b', 'AdjustedUnitNV', 'UnitNVRestored']
+
+# 基金池缓存内容的版本，计算口径变化时加一，旧的缓存文件不再被使用
+POOL_CACHE_VERSION = 3
+
+# 安装了 kaleido 时额外导出 PNG 图片，否则只导出可交互的 HTML 图表
+KALEIDO_AVAILABLE = importlib.util.find_spec('kaleido') is not None
+
+
+def pool_cache_key(pool_codes, start_date, end_date, intervals, net_value_column, frequency):
+    """
+    基金池计算结果的缓存键：基金代码、日期区间、区间、净值列和区间收益率频率都相同时复用。
+    """
+    payload = json.dumps([POOL_CACHE_VERSION, sorted(pool_codes), str(start_date), str(end_date), list(intervals), net_value_column,
+                          frequency])
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def period_table(nav, net_value_column, frequency, start_date, end_date):
+    """
+    日历区间收益率表，首尾未完整覆盖的区间标注为部分区间，最后一列为截至 end_date 的今年以来收益率。
+    """
+    matrix = build_nav_matrix(nav, net_value_column)
+    table = calculate_period_returns(matrix, start_date, end_date, frequency)
+    table['今年以来'] = calculate_ytd_returns(matrix, end_date)
+    return table
+
+
+@timed('基金池计算')
+def compute_pool_context(pool_nav, pool_rolling, net_value_column, frequency, start_date, end_date):
+    """
+    计算所有基金报告共用的基金池结果，只计算一次。
+
+    参数:
+    - pool_nav: 基金池的调整后净值
+    - pool_rolling: {区间: 基金池滚动收益率}
+    - net_value_column: 净值列
+    - frequency: 区间收益率的频率（'Y'、'Q'、'M'）
+    - start_date, end_date: 查询的日期区间，今年以来收益率截至 end_date
+    """
+    statistics = {}
+    for interval, rolling in pool_rolling.items():
+        values = rolling['annualized_return_rate'].dropna() if not rolling.empty else pd.Series(dtype=float)
+        statistics[interval] = calculate_statistics(values) if not values.empty else {}
+
+    return {
+        'fund_count': pool_nav['SecuCode'].nunique() if not pool_nav.empty else 0,
+        'net_value_column': net_value_column,
+        'frequency': frequency,
+        'rolling': pool_rolling,
+        'statistics': statistics,
+        'period_table': (period_table(pool_nav, net_value_column, frequency, start_date, end_date)
+                         if not pool_nav.empty else None),
+    }
+
+
+@timed('基金报告计算')
+def build_fund_report(fund_nav, pool, start_date, end_date, fund_rolling=None):
+    """
+    计算一只基金的报告内容：净值表、滚动收益率及其统计、同类百分位和区间收益率排名。
+
+    参数:
+    - fund_nav: 该基金的调整后净值
+    - pool: compute_pool_context 的结果
+    - fund_rolling: {区间: 该基金的滚动收益率}，为 None 时在本地计算
+    """
+    net_value_column = pool['net_value_column']
+    fund_nav = fund_nav.sort_values('TradingDay')
+    if fund_rolling is None:
+        fund_rolling = {interval: calculate_rolling_returns(fund_nav, interval, net_value_column, start_date,
+                                                            end_date)
+                        for interval in pool['rolling']}
+
+    statistics = {}
+    peers = {}
+    for interval, rolling in fund_rolling.items():
+        values = rolling['annualized_return_rate'].dropna() if not rolling.empty else pd.Series(dtype=float)
+        if values.empty:
+            continue
+        statistics[(interval, '研究基金')] = calculate_statistics(values)
+        if pool['statistics'].get(interval):
+            statistics[(interval, '对比基金池')] = pool['statistics'][interval]
+        pool_rolling = pool['rolling'][interval]
+        if not pool_rolling.empty:
+            band_df, rank_df = calculate_peer_percentiles(rolling, pool_rolling)
+            peers[interval] = band_df.join(rank_df.rename(columns=lambda code: '研究基金百分位排名'))
+            peers[interval] = peers[interval].join(rolling.set_index('start_date')['annualized_return_rate']
+                                                   .rename('研究基金'))
+
+    periods = period_table(fund_nav, net_value_column, pool['frequency'], start_date, end_date)
+    if pool['period_table'] is not None:
+        rank_df, percentile_df = calculate_period_ranks(periods, pool['period_table'])
+        summary = pool['period_table'].reindex(columns=periods.columns).quantile([0.25, 0.5, 0.75])
+        summary.index = ['对比基金池25%分位', '对比基金池中位数', '对比基金池75%分位']
+        periods = pd.concat([periods.rename(index=lambda code: '研究基金'), summary,
+                             rank_df.rename(index=lambda code: '同类排名'),
+                             percentile_df.round(2).rename(index=lambda code: '百分位排名')])
+
+    return {
+        'secucode': fund_nav['SecuCode'].iloc[0],
+        'name': fund_nav['ChiName'].iloc[0] if 'ChiName' in fund_nav else '',
+        'nav': fund_nav[[column for column in REPORT_NAV_COLUMNS if column in fund_nav]],
+        'rolling': pd.concat([rolling.assign(interval=interval) for interval, rolling in fund_rolling.items()
+                              if not rolling.empty], ignore_index=True) if fund_rolling else pd.DataFrame(),
+        'statistics': pd.DataFrame(statistics),
+        'peers': peers,
+        'periods': periods,
+        'pool_fund_count': pool['fund_count'],
+        'start_date': start_date,
+        'end_date': end_date,
+    }
+
+
+def add_line_chart(workbook, worksheet, sheet_name, title, first_row, last_row, date_column, series_columns,
+                   names, anchor):
+    """
+    在工作表中插入 Excel 原生折线图，数据引用同一工作表中的列（列号从 0 开始）。
+    """
+    chart = workbook.add_chart({'type': 'line'})
+    for column, name in zip(series_columns, names):
+        chart.add_series({
+            'name': name,
+            'categories': [sheet_name, first_row, date_column, last_row, date_column],
+            'values': [sheet_name, first_row, column, last_row, column],
+            'line': {'width': 1.25},
+        })
+    chart.set_title({'name': title})
+    chart.set_x_axis({'date_axis': True, 'num_format': 'yyyy-mm-dd'})
+    chart.set_legend({'position': 'bottom'})
+    chart.set_size({'width': 900, 'height': 420})
+    worksheet.insert_chart(anchor, chart)
+
+
+@timed('基金报告写入')
+def write_fund_workbook(report, path):
+    """
+    写入一只基金的报告工作簿：概览、净值（含净值走势图）、滚动收益率统计与明细、同类百分位（含分位走势图）、区间收益率。
+    """
+    with pd.ExcelWriter(path, engine='xlsxwriter', datetime_format='yyyy-mm-dd',
+                        date_format='yyyy-mm-dd') as writer:
+        workbook = writer.book
+        overview = pd.DataFrame({
+            '项目': ['基金代码', '基金名称', '开始日期', '结束日期', '对比基金池基金数', '生成时间'],
+            '内容': [report['secucode'], report['name'], str(report['start_date']), str(report['end_date']),
+                     report['pool_fund_count'], datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')],
+        })
+        overview.to_excel(writer, sheet_name='概览', index=False)
+
+        nav = report['nav']
+        nav.to_excel(writer, sheet_name='净值', index=False)
+        if len(nav) > 1:
+            columns = list(nav.columns)
+            nav_columns = [column for column in ['AdjustedUnitNV', 'UnitNVRestored'] if column in columns]
+            add_line_chart(workbook, writer.sheets['净值'], '净值', '净值走势', 1, len(nav),
+                           columns.index('TradingDay'), [columns.index(column) for column in nav_columns],
+                           nav_columns, 'K2')
+
+        if not report['statistics'].empty:
+            report['statistics'].to_excel(writer, sheet_name='滚动收益率统计')
+        if not report['rolling'].empty:
+            report['rolling'].to_excel(writer, sheet_name='滚动收益率明细', index=False)
+
+        for interval, peers in report['peers'].items():
+            sheet_name = f'同类百分位_{interval:g}年'
+            peers.to_excel(writer, sheet_name=sheet_name)
+            series = [column for column in peers.columns if column != '研究基金百分位排名']
+            add_line_chart(workbook, writer.sheets[sheet_name], sheet_name, f'{interval:g} 年滚动年化收益率同类分位',
+                           1, len(peers), 0, [peers.columns.get_loc(column) + 1 for column in series], series,
+                           f'{chr(ord("A") + len(peers.columns) + 2)}2')
+
+        report['periods'].to_excel(writer, sheet_name='区间收益率')
+
+
+def build_report_figures(report):
+    """
+    报告中的交互图表：净值走势，以及各区间研究基金滚动收益率与基金池分位带。
+    """
+    figures = {}
+    nav = report['nav']
+    fig = go.Figure()
+    for column in ['AdjustedUnitNV', 'UnitNVRestored']:
+        if column in nav:
+            fig.add_trace(go.Scatter(x=nav['TradingDay'], y=nav[column], mode='lines', name=column))
+    fig.update_layout(title=f"{report['secucode']} {report['name']} 净值走势", plot_bgcolor='white')
+    figures['净值走势'] = fig
+
+    for interval, peers in report['peers'].items():
+        fig = go.Figure()
+        for column in peers.columns:
+            if column.endswith('%分位') or column == '研究基金':
+                fig.add_trace(go.Scatter(x=peers.index, y=peers[column], mode='lines', name=column,
+                                         line={'width': 2.5 if column == '研究基金' else 1}))
+        fig.update_layout(title=f'{interval:g} 年滚动年化收益率（%）与对比基金池分位', plot_bgcolor='white')
+        figures[f'滚动收益率_{interval:g}年'] = fig
+    return figures
+
+
+@timed('基金报告图表')
+def write_report_charts(report, fund_dir):
+    """
+    把图表写入一个 HTML 文件；安装了 kaleido 时每个图表另存为 PNG。
+    """
+    figures = build_report_figures(report)
+    parts = [figure.to_html(full_html=False, include_plotlyjs='cdn' if i == 0 else False)
+             for i, figure in enumerate(figures.values())]
+    with open(os.path.join(fund_dir, 'charts.html'), 'w', encoding='utf-8') as f:
+        f.write('<html><head><meta charset="utf-8"></head><body>' + ''.join(parts) + '</body></html>')
+
+    if KALEIDO_AVAILABLE:
+        for name, figure in figures.items():
+            figure.write_image(os.path.join(fund_dir, f'{name}.png'), width=1000, height=500)
+
+
+def write_fund_report(report, output_dir):
+    """
+    在 output_dir/基金代码/ 下写入报告工作簿和图表，返回该目录。
+    """
+    fund_dir = os.path.join(output_dir, report['secucode'])
+    os.makedirs(fund_dir, exist_ok=True)
+    write_fund_workbook(report, os.path.join(fund_dir, f"{report['secucode']}_报告.xlsx"))
+    write_report_charts(report, fund_dir)
+    return fund_dir
@@ -0,0 +1,360 @@
+import asyncio
+import contextlib
+import datetime
+import functools
+import io
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+from pages.returns.fund_index import normalize_code
+from pages.returns.indicators import calculate_rolling_returns
+from pages.returns.nav_data import DATA_FREQUENCIES, create_engine_from_config
+from pages.returns.pipeline import compute_fund_nav, rolling_statistics
+from pages.returns.rolling_warehouse import read_rolling_metric
+from pages.returns.sql_rolling import fetch_rolling_returns
+
+
+# 计算线程数，同时在计算的请求不超过该数量，可通过环境变量 API_WORKERS 修改
+API_WORKERS = int(os.environ.get('API_WORKERS', 4))
+
+# 排队等待计算的请求上限，超过时直接返回 503，避免请求无限堆积
+API_MAX_PENDING = int(os.environ.get('API_MAX_PENDING', 64))
+
+# 结果缓存的条目数和有效期（秒）
+API_CACHE_ENTRIES = int(os.environ.get('API_CACHE_ENTRIES', 256))
+API_CACHE_TTL_SECONDS = int(os.environ.get('API_CACHE_TTL_SECONDS', 600))
+
+# 单个请求估算的最大净值行数（基金数 × 区间内的工作日数），按计算量而不是基金数限制请求，
+# 默认约相当于 500 只基金 × 7 年的日度净值；可通过环境变量 API_MAX_ROWS 修改
+API_MAX_ROWS = int(os.environ.get('API_MAX_ROWS', 1_000_000))
+
+# 接口可选的净值列
+API_NET_VALUE_COLUMNS = ['AdjustedUnitNV', 'UnitNVRestored']
+
+# Arrow IPC 流格式的媒体类型，请求参数 format=arrow 或 Accept 头包含该类型时使用
+ARROW_MEDIA_TYPE = 'application/vnd.apache.arrow.stream'
+
+
+class ServiceBusy(Exception):
+    """排队的请求超过 API_MAX_PENDING 时抛出，返回 503。"""
+
+
+class ResultCache:
+    """
+    进程内共享的结果缓存：按键保存计算结果的 Future，最近最少使用的条目先淘汰，超过有效期的条目重新计算。
+    相同参数的请求同时到达时共用一次计算；计算出错的结果不缓存。
+    """
+
+    def __init__(self, max_entries=API_CACHE_ENTRIES, ttl_seconds=API_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_submit(self, key, executor, func, *args, steal=False):
+        """
+        返回 (Future, 命中状态)：'hit' 为已有结果，'shared' 为共用正在进行的计算，'miss' 为新提交到 executor 的计算。
+        steal 为 True 时，共用的计算如果还在排队，直接在当前线程中执行。
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and time.time() - entry[1] < self.ttl_seconds:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                future, _, run = entry
+                status = 'hit' if future.done() else 'shared'
+            else:
+                self.misses += 1
+                future = Future()
+                run = functools.partial(self.run, future, func, args)
+                self.entries[key] = (future, time.time(), run)
+                self.entries.move_to_end(key)
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+                status = 'miss'
+
+        # 在锁外执行或提交，计算内部可以再次读取缓存
+        if status == 'shared' and steal:
+            run()
+        elif status == 'miss':
+            future.add_done_callback(lambda done: self.discard_failed(key, done))
+            try:
+                executor.submit(run)
+            except Exception as e:
+                future.set_exception(e)
+        return future, status
+
+    @staticmethod
+    def run(future, func, args):
+        # 同一个计算可能被线程池和等待它的计算线程同时执行，只有先把 Future 置为运行中的一方计算
+        try:
+            if not future.set_running_or_notify_cancel():
+                return
+        except RuntimeError:
+            return
+        try:
+            future.set_result(func(*args))
+        except Exception as e:
+            future.set_exception(e)
+
+    def discard_failed(self, key, future):
+        if not future.cancelled() and future.exception() is None:
+            return
+        with self.lock:
+            if key in self.entries and self.entries[key][0] is future:
+                del self.entries[key]
+
+    def stats(self):
+        with self.lock:
+            return {'entries': len(self.entries), 'hits': self.hits, 'misses': self.misses}
+
+
+class BoundedExecutor:
+    """
+    固定线程数的线程池，排队（含正在计算）的任务超过 max_pending 时拒绝提交。
+    """
+
+    def __init__(self, workers=API_WORKERS, max_pending=API_MAX_PENDING):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='api')
+        self.max_pending = max_pending
+        self.pending = 0
+        self.lock = threading.Lock()
+
+    def submit(self, func, *args):
+        with self.lock:
+            if self.pending >= self.max_pending:
+                raise ServiceBusy(f"服务繁忙，排队的请求已达 {self.max_pending} 个")
+            self.pending += 1
+        future = self.executor.submit(func, *args)
+        future.add_done_callback(self.release)
+        return future
+
+    def release(self, future):
+        with self.lock:
+            self.pending -= 1
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def parse_codes(params):
+    codes = list(dict.fromkeys(normalize_code(code) for code in params.get('codes', '').split(',') if code.strip()))
+    if not codes:
+        raise ValueError("缺少参数 codes（逗号分隔的基金代码）")
+    return tuple(sorted(codes))
+
+
+def parse_date(params, name, default=None):
+    value = params.get(name)
+    if not value:
+        if default is None:
+            raise ValueError(f"缺少参数 {name}（YYYY-MM-DD）")
+        return default
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"参数 {name} 不是有效日期: {value}") from None
+
+
+def parse_choice(params, name, choices, default):
+    value = params.get(name, default)
+    if value not in choices:
+        raise ValueError(f"参数 {name} 可选 {'、'.join(choices)}，收到: {value}")
+    return value
+
+
+def parse_interval(params):
+    try:
+        interval = float(params.get('interval', 1))
+    except ValueError:
+        raise ValueError(f"参数 interval 不是数字: {params.get('interval')}") from None
+    if interval <= 0 or interval * 12 != int(interval * 12):
+        raise ValueError("参数 interval 需为正数，且为整月（如 0.5、1、3）")
+    return interval
+
+
+def estimate_rows(codes, start_date, end_date):
+    """
+    估算请求需要查询和计算的净值行数：基金数 × 区间内的工作日数。
+    查询、调整系数和滚动收益率的耗时都与行数成正比，日期区间越长，允许的基金数越少。
+    """
+    return len(codes) * max(int(np.busday_count(start_date, end_date + datetime.timedelta(days=1))), 1)
+
+
+def parse_request(params, rolling=False):
+    """
+    解析并校验查询参数，返回可用作缓存键的元组。估算行数超过 API_MAX_ROWS 的请求返回 400。
+    """
+    codes = parse_codes(params)
+    start_date = parse_date(params, 'start')
+    end_date = parse_date(params, 'end', datetime.date.today())
+    if start_date >= end_date:
+        raise ValueError("开始日期需早于结束日期")
+    rows = estimate_rows(codes, start_date, end_date)
+    if rows > API_MAX_ROWS:
+        raise ValueError(f"请求的数据量过大：{len(codes)} 只基金 × {rows // len(codes)} 个交易日约 {rows} 行，"
+                         f"超过上限 {API_MAX_ROWS} 行，请减少基金数或缩短日期区间")
+    if not rolling:
+        frequency = parse_choice(params, 'frequency', sorted(set(DATA_FREQUENCIES.values())), 'D')
+        return codes, start_date, end_date, frequency
+    interval = parse_interval(params)
+    column = parse_choice(params, 'column', API_NET_VALUE_COLUMNS, 'AdjustedUnitNV')
+    execution = parse_choice(params, 'execution', ['local', 'database'], 'local')
+    return codes, start_date, end_date, interval, column, execution
+
+
+def encode_json(df):
+    """
+    JSON 结果：{"columns": [...], "data": [[...], ...]}，日期为 ISO 格式，缺失值为 null。
+    """
+    return df.to_json(orient='split', index=False, date_format='iso', double_precision=10,
+                      force_ascii=False).encode('utf-8')
+
+
+def encode_arrow(df):
+    """
+    Arrow IPC 流格式，按列编码，数值列不经过文本转换；基金代码、名称等文本列按字典编码，每个取值只传一次。
+    """
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(df, preserve_index=False).replace_schema_metadata(None)
+    for i, field in enumerate(table.schema):
+        if pa.types.is_string(field.type) or pa.types.is_large_string(field.type):
+            table = table.set_column(i, field.name, table.column(i).dictionary_encode())
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+
+def wants_arrow(request):
+    requested = request.query_params.get('format')
+    if requested:
+        return parse_choice(request.query_params, 'format', ['json', 'arrow'], 'json') == 'arrow'
+    return ARROW_MEDIA_TYPE in request.headers.get('accept', '')
+
+
+def create_app(db_config, workers=API_WORKERS, max_pending=API_MAX_PENDING, cache_entries=API_CACHE_ENTRIES,
+               cache_ttl_seconds=API_CACHE_TTL_SECONDS):
+    """
+    创建只读指标接口。数据库引擎、结果缓存和计算线程池在应用内共享，查询、调整系数和滚动收益率
+    与页面、批处理使用相同的函数。
+
+    接口（均为 GET，codes 为逗号分隔的基金代码，start / end 为 YYYY-MM-DD，end 默认为今天）:
+    - /health: 服务状态和缓存命中情况
+    - /nav?codes=&start=&end=&frequency=D: 调整后净值
+    - /rolling?codes=&start=&end=&interval=1&column=AdjustedUnitNV&execution=local: 滚动年化收益率
+    - /statistics?（与 /rolling 相同）: 每只基金的滚动收益率统计指标
+    format=arrow 或 Accept: application/vnd.apache.arrow.stream 时返回 Arrow IPC，否则返回 JSON。
+    """
+    engine = create_engine_from_config(db_config)
+    cache = ResultCache(cache_entries, cache_ttl_seconds)
+    executor = BoundedExecutor(workers, max_pending)
+
+    def load_nav(codes, start_date, end_date, frequency):
+        nav = compute_fund_nav(engine, list(codes), start_date, end_date, frequency)
+        if not nav.empty:
+            nav['TradingDay'] = pd.to_datetime(nav['TradingDay'])
+        return nav
+
+    def load_rolling(codes, start_date, end_date, interval, column, execution):
+        # 与收益率分析页面相同：优先读取滚动收益率仓库，仓库未覆盖的基金再基于（缓存的）净值计算
+        if execution == 'database':
+            return fetch_rolling_returns(engine, list(codes), interval, column, start_date, end_date)
+        missing = list(codes)
+        frames = []
+        stored = read_rolling_metric(missing, interval, column, start_date, end_date, 'annualized_return_rate')
+        if stored is not None:
+            rolling, missing = stored
+            frames.append(rolling)
+        if missing:
+            nav = cached(('nav', tuple(missing), start_date, end_date, 'D'), load_nav, tuple(missing), start_date,
+                         end_date, 'D').result()
+            if not nav.empty:
+                frames.append(calculate_rolling_returns(nav, interval, column, start_date, end_date))
+        frames = [frame for frame in frames if not frame.empty]
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    def load_statistics(codes, start_date, end_date, interval, column, execution):
+        rolling = cached(('rolling', codes, start_date, end_date, interval, column, execution), load_rolling, codes,
+                         start_date, end_date, interval, column, execution).result()
+        if rolling.empty:
+            return pd.DataFrame()
+        return pd.DataFrame(rolling_statistics(rolling, interval, column))
+
+    def cached(key, func, *args):
+        # 计算线程内部的依赖（如滚动收益率依赖净值）在当前线程计算，还在线程池中排队的同一计算也由当前线程接手，
+        # 避免所有计算线程都在等待排队中的任务
+        future, _ = cache.get_or_submit(key, InlineExecutor, func, *args, steal=True)
+        return future
+
+    async def respond(request, name, func, rolling):
+        try:
+            key = parse_request(request.query_params, rolling)
+            arrow = wants_arrow(request)
+            start = time.perf_counter()
+            future, status = cache.get_or_submit((name,) + key, executor, func, *key)
+            result = await asyncio.wrap_future(future)
+            # 编码后的响应体同样缓存，命中缓存的请求不再重复编码；编码在计算线程池中进行，不阻塞事件循环
+            encode = encode_arrow if arrow else encode_json
+            body_future, _ = cache.get_or_submit((name, 'arrow' if arrow else 'json') + key, executor, encode,
+                                                 result)
+            body = await asyncio.wrap_future(body_future)
+        except ValueError as e:
+            return JSONResponse({'error': str(e)}, status_code=400)
+        except ServiceBusy as e:
+            return JSONResponse({'error': str(e)}, status_code=503, headers={'Retry-After': '1'})
+        except Exception as e:
+            return JSONResponse({'error': f"计算出错: {e}"}, status_code=500)
+
+        response = Response(body, media_type=ARROW_MEDIA_TYPE if arrow else 'application/json')
+        response.headers['X-Cache'] = status
+        response.headers['Server-Timing'] = f'compute;dur={(time.perf_counter() - start) * 1000:.1f}'
+        return response
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        yield
+        executor.shutdown()
+        engine.dispose()
+
+    async def health(request):
+        return JSONResponse({'status': 'ok', 'cache': cache.stats(), 'pending': executor.pending})
+
+    async def nav(request):
+        return await respond(request, 'nav', load_nav, rolling=False)
+
+    async def rolling(request):
+        return await respond(request, 'rolling', load_rolling, rolling=True)
+
+    async def statistics(request):
+        return await respond(request, 'statistics', load_statistics, rolling=True)
+
+    app = Starlette(routes=[
+        Route('/health', health),
+        Route('/nav', nav),
+        Route('/rolling', rolling),
+        Route('/statistics', statistics),
+    ], lifespan=lifespan)
+    app.state.cache = cache
+    app.state.engine = engine
+    return app
+
+
+class InlineExecutor:
+    """在调用线程中立即执行的执行器，接口与 ThreadPoolExecutor.submit 相同。"""
+
+    @staticmethod
+    def submit(func, *args):
+        func(*args)
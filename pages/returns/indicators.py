@@ -0,0 +1,252 @@
+import numpy as np
+import pandas as pd
+
+from pages.returns.perf import timed
+from pages.returns.rolling_risk import calculate_rolling_risk_metrics
+
+
+@timed('滚动收益率')
+def calculate_rolling_returns(data, interval_years, net_value_column, start_date, end_date):
+    """
+    计算指定区间内的滚动年化收益率。
+
+    窗口结束日为不晚于 起始日 + 区间月数 的最后一个交易日，每只基金用一次二分查找得到全部窗口的结束位置，
+    整体 O(n log n)；结果与逐窗口筛选的实现相同（见 tests/test_rolling_returns.py）。
+    净值缺失的行（只有分红、拆分记录的日期）不参与计算，与 calculate_rolling_risk_metrics 和数据库计算的规则相同。
+
+    参数:
+    - data: 基金数据 DataFrame，包含 'SecuCode'、'TradingDay'、'AdjustedUnitNV' 等列。
+    - interval_years: 滚动窗口的年数。
+    - start_date: 用户设定的开始日期。
+    - end_date: 用户设定的结束日期。
+    """
+    start_date = pd.to_datetime(start_date)
+    end_date = pd.to_datetime(end_date)
+    # 净值缺失的行（例如只有分红记录的日期）不参与计算
+    data = data[['SecuCode', 'TradingDay', net_value_column]].dropna(subset=[net_value_column])
+    if data.empty:
+        return pd.DataFrame()
+
+    # 按基金（首次出现的顺序）和交易日排序
+    fund_index, fund_codes = pd.factorize(data['SecuCode'])
+    trading_days = pd.to_datetime(data['TradingDay']).to_numpy()
+    order = np.lexsort((trading_days, fund_index))
+    fund_index = fund_index[order]
+    trading_days = pd.DatetimeIndex(trading_days[order])
+    nav = data[net_value_column].to_numpy(dtype=float)[order]
+
+    # 每个窗口的目标结束日期，以及每只基金内不晚于该日期的最后一个位置
+    window_end_dates = trading_days + pd.DateOffset(months=int(interval_years * 12))
+    day_values = trading_days.values
+    end_values = window_end_dates.values
+    block_starts = np.flatnonzero(np.r_[True, fund_index[1:] != fund_index[:-1]])
+    block_stops = np.r_[block_starts[1:], len(fund_index)]
+    ends = np.empty(len(fund_index), dtype=np.int64)
+    for lo, hi in zip(block_starts, block_stops):
+        ends[lo:hi] = lo + np.searchsorted(day_values[lo:hi], end_values[lo:hi], side='right') - 1
+
+    # 起始日不早于 start_date、目标结束日不晚于 end_date、且窗口跨越至少一天
+    positions = np.arange(len(fund_index))
+    days_diff = np.floor((day_values[ends] - day_values) / np.timedelta64(1, 'D'))
+    keep = (trading_days >= start_date) & (window_end_dates <= end_date) & (ends > positions) & (days_diff > 0)
+    if not keep.any():
+        return pd.DataFrame()
+
+    starts = positions[keep]
+    window_ends = ends[keep]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        annualized_return = (nav[window_ends] / nav[starts]) ** (365 / days_diff[keep]) - 1
+
+    return pd.DataFrame({
+        'SecuCode': fund_codes[fund_index[starts]],
+        'start_date': day_values[starts],
+        'end_date': day_values[window_ends],
+        'annualized_return_rate': annualized_return * 100,
+        'interval': interval_years,
+    })
+
+
+def calculate_rolling_metric(data, interval_years, net_value_column, start_date, end_date,
+                             metric='annualized_return_rate', risk_free_rate=0.0):
+    """
+    计算指定的滚动指标。年化收益率使用 calculate_rolling_returns，风险指标使用 calculate_rolling_risk_metrics。
+    """
+    if metric == 'annualized_return_rate':
+        return calculate_rolling_returns(data, interval_years, net_value_column, start_date, end_date)
+    return calculate_rolling_risk_metrics(data, interval_years, net_value_column, start_date, end_date,
+                                          risk_free_rate)
+
+
+# 计算统计指标
+@timed('统计指标')
+def calculate_statistics(data):
+    # scipy 导入较慢（约 1 秒），只在需要计算统计指标时导入
+    from scipy import stats
+
+    skewness = stats.skew(data)
+    kurtosis = stats.kurtosis(data, fisher=False)
+
+    return {
+        '最小值': data.min(),
+        '最大值': data.max(),
+        '平均值': data.mean(),
+        '标准差': data.std(),
+        '中位数': data.median(),
+        '偏度': skewness,
+        '峰度': kurtosis,
+        '25%分位点': data.quantile(0.25),
+        '75%分位点': data.quantile(0.75),
+        '75%分位点-25%分位点': data.quantile(0.75) - data.quantile(0.25),
+        '左0.1%尾部': data.quantile(0.001),
+        '右0.1%尾部': data.quantile(0.999)
+    }
+
+
+@timed('统计指标（按基金）')
+def calculate_grouped_statistics(data, groups):
+    """
+    按 groups 分组一次性计算每组的统计指标，各列与 calculate_statistics 一致（偏度、峰度为有偏估计，
+    与 scipy.stats.skew / kurtosis(fisher=False) 相同），不逐组调用 scipy。
+
+    参数:
+    - data: 收益率 Series，NaN 需要事先去掉
+    - groups: 与 data 对齐的分组键（如基金代码）
+
+    返回:
+    - 以分组键为索引、统计指标为列的 DataFrame
+    """
+    grouped = data.groupby(groups, sort=False)
+    deviation = data - grouped.transform('mean')
+    moments = pd.DataFrame({'m2': deviation ** 2, 'm3': deviation ** 3, 'm4': deviation ** 4}).groupby(
+        groups, sort=False).mean()
+    quantiles = grouped.quantile([0.25, 0.75, 0.001, 0.999]).unstack()
+    with np.errstate(invalid='ignore', divide='ignore'):
+        skewness = (moments['m3'] / moments['m2'] ** 1.5).where(moments['m2'] > 0)
+        kurtosis = (moments['m4'] / moments['m2'] ** 2).where(moments['m2'] > 0)
+
+    return pd.DataFrame({
+        '最小值': grouped.min(),
+        '最大值': grouped.max(),
+        '平均值': grouped.mean(),
+        '标准差': grouped.std(),
+        '中位数': grouped.median(),
+        '偏度': skewness,
+        '峰度': kurtosis,
+        '25%分位点': quantiles[0.25],
+        '75%分位点': quantiles[0.75],
+        '75%分位点-25%分位点': quantiles[0.75] - quantiles[0.25],
+        '左0.1%尾部': quantiles[0.001],
+        '右0.1%尾部': quantiles[0.999],
+    })
+
+
+def calculate_moments(data):
+    """
+    计算单只基金收益率序列的部分聚合量，用于合并出基金池整体的统计指标。
+
+    返回样本数、均值、2~4 阶中心矩之和以及最小值、最大值。
+    """
+    values = np.asarray(data, dtype=float)
+    mean = values.mean()
+    deviation = values - mean
+    return {
+        'n': len(values),
+        'mean': mean,
+        'M2': np.sum(deviation ** 2),
+        'M3': np.sum(deviation ** 3),
+        'M4': np.sum(deviation ** 4),
+        'min': values.min(),
+        'max': values.max(),
+    }
+
+
+@timed('统计指标')
+def calculate_pool_statistics(moments, data):
+    """
+    由每只基金的部分聚合量合并计算基金池的统计指标，结果与 calculate_statistics 一致。
+
+    参数:
+    - moments: calculate_moments 返回值组成的列表
+    - data: 基金池全部收益率（分位数需要完整样本）
+    """
+    m = pd.DataFrame(moments)
+    n = m['n'].sum()
+    mean = (m['n'] * m['mean']).sum() / n
+    delta = m['mean'] - mean
+
+    # 按组合并中心矩：M_k = Σ(组内中心矩 + 组均值偏移带来的修正项)
+    m2 = (m['M2'] + m['n'] * delta ** 2).sum()
+    m3 = (m['M3'] + 3 * delta * m['M2'] + m['n'] * delta ** 3).sum()
+    m4 = (m['M4'] + 4 * delta * m['M3'] + 6 * delta ** 2 * m['M2'] + m['n'] * delta ** 4).sum()
+
+    variance = m2 / n
+    return {
+        '最小值': m['min'].min(),
+        '最大值': m['max'].max(),
+        '平均值': mean,
+        '标准差': np.sqrt(m2 / (n - 1)) if n > 1 else np.nan,
+        '中位数': data.median(),
+        '偏度': (m3 / n) / variance ** 1.5 if variance > 0 else np.nan,
+        '峰度': (m4 / n) / variance ** 2 if variance > 0 else np.nan,
+        '25%分位点': data.quantile(0.25),
+        '75%分位点': data.quantile(0.75),
+        '75%分位点-25%分位点': data.quantile(0.75) - data.quantile(0.25),
+        '左0.1%尾部': data.quantile(0.001),
+        '右0.1%尾部': data.quantile(0.999)
+    }
+
+
+def calculate_peer_percentiles(research_returns, pool_returns, bands=(5, 25, 50, 75, 95),
+                               value_column='annualized_return_rate'):
+    """
+    计算研究基金在对比基金池中的截面百分位排名，以及基金池各分位数随窗口起始日的变化。
+
+    基金池滚动收益率按窗口起始日对齐成 基金 × 日期 矩阵，所有日期一次性向量化计算，
+    不对基金池逐只循环。
+
+    参数:
+    - research_returns: 研究基金的滚动收益率（calculate_rolling_returns 的输出）
+    - pool_returns: 对比基金池的滚动收益率（calculate_rolling_returns 的输出）
+    - bands: 需要计算的基金池分位数
+    - value_column: 参与排名的指标列
+
+    返回:
+    - band_df: 以窗口起始日为索引、各分位数为列的 DataFrame
+    - rank_df: 以窗口起始日为索引、研究基金代码为列的百分位排名（0~100，越高表示指标值越大）
+    """
+    # 基金 × 日期矩阵，缺失的窗口为 NaN（用整数编码直接填充，比 DataFrame.pivot 快得多）
+    fund_index, fund_codes = pd.factorize(pool_returns['SecuCode'])
+    date_index, dates = pd.factorize(pool_returns['start_date'], sort=True)
+    values = np.full((len(fund_codes), len(dates)), np.nan)
+    values[fund_index, date_index] = pool_returns[value_column].to_numpy(dtype=float)
+    counts = (~np.isnan(values)).sum(axis=0)
+    has_peers = counts > 0
+
+    # 每列排序一次（NaN 排在最后），按有效样本数线性插值得到各分位数
+    sorted_values = np.sort(values, axis=0)
+    positions = np.outer(np.asarray(bands) / 100, np.maximum(counts - 1, 0))
+    lower = np.floor(positions).astype(int)
+    upper = np.minimum(lower + 1, np.maximum(counts - 1, 0))
+    columns = np.arange(len(dates))
+    lower_values = sorted_values[lower, columns]
+    upper_values = sorted_values[upper, columns]
+    band_values = lower_values + (upper_values - lower_values) * (positions - lower)
+    band_values[:, ~has_peers] = np.nan
+    band_df = pd.DataFrame(band_values.T, index=dates, columns=[f'{band}%分位' for band in bands])
+
+    # 研究基金按相同日期对齐，与基金池整列比较得到排名（相同指标值记一半）
+    research_matrix = research_returns.pivot(index='start_date', columns='SecuCode',
+                                             values=value_column).reindex(dates)
+    ranks = {}
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for fund_code in research_matrix.columns:
+            fund_values = research_matrix[fund_code].to_numpy(dtype=float)
+            below = (values < fund_values).sum(axis=0)
+            equal = (values == fund_values).sum(axis=0)
+            rank = (below + 0.5 * equal) / counts * 100
+            rank[np.isnan(fund_values) | ~has_peers] = np.nan
+            ranks[fund_code] = rank
+    rank_df = pd.DataFrame(ranks, index=dates)
+    rank_df.index.name = band_df.index.name = 'start_date'
+
+    return band_df, rank_df
@@ -0,0 +1,232 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+from pages.returns.perf import collect_spans
+from pages.returns.perf_panel import record_spans
+
+
+# 后台任务的工作线程数，可通过环境变量 JOB_WORKERS 修改
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+
+# 页面轮询任务进度的间隔（秒）
+JOB_POLL_SECONDS = 1.0
+
+# 已结束但没有被页面读取的任务在注册表中保留的时间（秒），超时后清理
+JOB_MAX_AGE_SECONDS = 3600
+
+logger = logging.getLogger('zzb.jobs')
+
+
+class JobCancelled(Exception):
+    """任务被取消时由 Job.report 抛出，用于中断正在运行的任务。"""
+
+
+class Job:
+    """
+    一个后台任务的状态。任务函数通过 report(stage, progress) 汇报当前阶段和进度，
+    页面只读取这些属性，不与任务线程共享 session_state。
+    """
+
+    def __init__(self, name):
+        self.job_id = uuid.uuid4().hex[:8]
+        self.name = name
+        self.status = 'pending'  # pending / running / done / failed / cancelled
+        self.stage = '排队中'
+        self.progress = 0.0
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_requested = False
+        self.spans = []
+
+    @property
+    def done(self):
+        return self.status in ('done', 'failed', 'cancelled')
+
+    @property
+    def elapsed(self):
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+    def report(self, stage, progress=None):
+        """
+        汇报任务阶段和进度（0~1）。任务已被取消时抛出 JobCancelled，在阶段之间中断任务。
+        """
+        if self.cancel_requested:
+            raise JobCancelled()
+        self.stage = stage
+        if progress is not None:
+            self.progress = min(max(float(progress), 0.0), 1.0)
+
+    def run(self, func, args, kwargs):
+        self.status = 'running'
+        self.started_at = time.time()
+        try:
+            self.report('开始', 0.0)
+            # 任务中各阶段的耗时记录，任务结束后显示在性能面板中
+            with collect_spans() as spans:
+                self.spans = spans
+                self.result = func(*args, progress=self.report, **kwargs)
+            self.status = 'done'
+            self.stage = '完成'
+            self.progress = 1.0
+        except JobCancelled:
+            self.status = 'cancelled'
+            self.stage = '已取消'
+        except Exception as e:
+            self.status = 'failed'
+            self.error = f"{type(e).__name__}: {e}"
+            logger.exception("后台任务 %s（%s）出错", self.name, self.job_id)
+        finally:
+            self.finished_at = time.time()
+
+
+@st.cache_resource
+def get_job_registry():
+    """
+    进程级的任务注册表和线程池，所有会话共享，页面重新运行时任务不受影响。
+    """
+    return {
+        'executor': ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix='zzb_job'),
+        'jobs': {},
+        'lock': threading.Lock(),
+    }
+
+
+def submit_job(name, func, *args, **kwargs):
+    """
+    提交后台任务，返回任务 ID。
+
+    任务函数在工作线程中执行，调用方式为 func(*args, progress=job.report, **kwargs)，
+    不能访问 st.session_state 或调用 Streamlit 组件，所需的输入和缓存都应通过参数传入
+    （会被修改的缓存用 job_state 复制），结果只通过 Job.result 返回，由页面在任务结束后写回 session_state。
+    """
+    registry = get_job_registry()
+    remove_finished_jobs()
+
+    job = Job(name)
+    with registry['lock']:
+        registry['jobs'][job.job_id] = job
+    registry['executor'].submit(job.run, func, args, kwargs)
+    return job.job_id
+
+
+def get_job(job_id):
+    if job_id is None:
+        return None
+    return get_job_registry()['jobs'].get(job_id)
+
+
+def cancel_job(job_id):
+    """
+    请求取消任务，任务会在下一次汇报进度时停止；尚未开始的任务不会再执行计算。
+    """
+    job = get_job(job_id)
+    if job is not None and not job.done:
+        job.cancel_requested = True
+        job.stage = '正在取消'
+
+
+def remove_finished_jobs(max_age_seconds=JOB_MAX_AGE_SECONDS):
+    """
+    清理结束超过 max_age_seconds 秒的任务。
+    """
+    registry = get_job_registry()
+    cutoff = time.time() - max_age_seconds
+    with registry['lock']:
+        for job_id in [job_id for job_id, job in registry['jobs'].items()
+                       if job.done and job.finished_at < cutoff]:
+            registry['jobs'].pop(job_id)
+
+
+def copy_dicts(value):
+    # 逐层复制嵌套字典，叶子对象（DataFrame 等）共享，按只读使用
+    if isinstance(value, dict):
+        return {key: copy_dicts(item) for key, item in value.items()}
+    return value
+
+
+def job_state(keys):
+    """
+    为后台任务复制 session_state 中的缓存等状态。嵌套字典逐层复制，任务线程只修改自己的副本，
+    不与页面同时读写同一个字典；任务把更新后的副本放在结果中返回，由页面在主线程写回 session_state。
+    """
+    return {key: copy_dicts(st.session_state[key]) for key in keys if key in st.session_state}
+
+
+def start_job(session_key, name, func, *args, **kwargs):
+    """
+    提交任务并把任务 ID 记录在 session_state[session_key] 中；同一位置已有未结束的任务时先取消。
+    """
+    cancel_job(st.session_state.get(session_key))
+    st.session_state[session_key] = submit_job(name, func, *args, **kwargs)
+    return st.session_state[session_key]
+
+
+def pop_finished_job(session_key):
+    """
+    session_state[session_key] 对应的任务已结束时返回该任务并清除记录，否则返回 None。
+    返回的任务同时从进程级注册表中删除，结果只由本次运行写回 session_state，不在注册表中再保留一份。
+    """
+    job_id = st.session_state.get(session_key)
+    if job_id is None:
+        return None
+
+    job = get_job(job_id)
+    if job is None:
+        # 任务已被清理（例如服务重启），放弃等待
+        st.session_state.pop(session_key, None)
+        return None
+    if job.done:
+        st.session_state.pop(session_key, None)
+        registry = get_job_registry()
+        with registry['lock']:
+            registry['jobs'].pop(job_id, None)
+        record_spans(f"任务：{job.name}", job.spans)
+        return job
+    return None
+
+
+def job_progress(session_key):
+    """
+    显示 session_state[session_key] 对应任务的进度。没有任务时不渲染定时刷新的片段，页面不会周期性地重新运行。
+    """
+    if st.session_state.get(session_key) is None:
+        return
+    job_progress_fragment(session_key)
+
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def job_progress_fragment(session_key):
+    """
+    定时刷新的任务进度条。只有这个片段会周期性地重新运行，页面其他部分可以正常交互；
+    任务结束（或已被清理）后触发整页重新运行，由页面通过 pop_finished_job 读取结果并清除任务记录，
+    之后不再渲染这个片段，轮询随之停止。
+    """
+    job = get_job(st.session_state.get(session_key))
+    if job is None or job.done:
+        st.rerun()
+
+    st.progress(job.progress, text=f"{job.name}：{job.stage}（任务 {job.job_id}，已运行 {job.elapsed:.0f} 秒）")
+    if st.button("取消任务", key=f"{session_key}_cancel"):
+        cancel_job(job.job_id)
+
+
+def show_job_result(job):
+    """
+    显示失败或取消的任务信息，任务成功时返回 True。
+    """
+    if job.status == 'failed':
+        st.error(f"{job.name}失败: {job.error}")
+    elif job.status == 'cancelled':
+        st.warning(f"{job.name}已取消。")
+    return job.status == 'done'
@@ -0,0 +1,229 @@
+import time
+import tomllib
+from contextlib import contextmanager
+
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+from pages.returns.db_telemetry import connect, install_telemetry, record_fetch
+from pages.returns.perf import span, timed
+
+
+# 默认的数据库配置文件，与 Streamlit 页面共用 .streamlit/secrets.toml
+SECRETS_PATH = '.streamlit/secrets.toml'
+
+# 拆分、分红和净值数据的公共表表达式 FundRows，每只基金每个日期一行；
+# 基金代码通过临时表传入，{codes_table} 由各数据库的临时表名替换
+FUND_ROWS_CTE = '''
+AllDates AS (
+    SELECT m.InnerCode, m.TradingDay
+    FROM MF_NetValuePerformanceHis m
+    WHERE m.TradingDay BETWEEN :start_date AND :end_date
+    UNION ALL
+    SELECT d.InnerCode, d.ExRightDate AS TradingDay
+    FROM MF_Dividend d
+    WHERE d.ExRightDate BETWEEN :start_date AND :end_date
+    UNION ALL
+    SELECT ss.InnerCode, ss.ActualSplitDay AS TradingDay
+    FROM MF_SharesSplit ss
+    WHERE ss.ActualSplitDay BETWEEN :start_date AND :end_date
+),
+FundRows AS (
+SELECT 
+    a.InnerCode, 
+    s.SecuCode, 
+    s.ChiName, 
+    a.TradingDay,
+    MAX(d.ActualRatioAfterTax / 10) AS ActualRatioAfterTax,   -- 聚合分红数据
+    MAX(ss.SplitRatio) AS SplitRatio,                        -- 聚合拆分数据
+    MAX(m.UnitNV) AS UnitNV,                                 -- 聚合单位净值数据
+    MAX(f.UnitNVRestored) AS UnitNVRestored                  -- 聚合复权单位净值数据
+FROM AllDates a
+LEFT JOIN SecuMain s ON a.InnerCode = s.InnerCode
+LEFT JOIN MF_Dividend d ON a.InnerCode = d.InnerCode AND a.TradingDay = d.ExRightDate
+LEFT JOIN MF_SharesSplit ss ON a.InnerCode = ss.InnerCode AND a.TradingDay = ss.ActualSplitDay
+LEFT JOIN MF_NetValuePerformanceHis m ON a.InnerCode = m.InnerCode AND a.TradingDay = m.TradingDay
+LEFT JOIN MF_FundNetValueRe f ON a.InnerCode = f.InnerCode AND a.TradingDay = f.TradingDay
+JOIN {codes_table} mc ON s.SecuCode = mc.SecuCode  -- 使用 SecuMain 表关联 SecuCode
+WHERE s.SecuCategory = 8
+GROUP BY 
+    a.InnerCode, 
+    s.SecuCode, 
+    s.ChiName, 
+    a.TradingDay
+)
+'''
+
+# 查询拆分、分红和净值数据
+FUND_DATA_SQL = 'WITH' + FUND_ROWS_CTE + '''
+SELECT * FROM FundRows
+ORDER BY 
+    SecuCode, 
+    TradingDay;
+'''
+
+
+# 各数据库保存基金代码的临时表：(表名, 建表语句, 删除语句)。
+# mssql 为生产数据库；sqlite 为本地文件数据库，表结构与生产库相同，由 fixture_db.create_fixture_database 生成，
+# 用于离线运行和压测
+CODES_TEMP_TABLES = {
+    'mssql': ('#MainCodes', 'CREATE TABLE #MainCodes (SecuCode VARCHAR(50))', 'DROP TABLE #MainCodes'),
+    'sqlite': ('temp.MainCodes', 'CREATE TEMP TABLE MainCodes (SecuCode VARCHAR(50))', 'DROP TABLE temp.MainCodes'),
+}
+
+
+def load_db_config(path=SECRETS_PATH):
+    """
+    从 secrets.toml 中读取 [connections.my_database] 数据库配置，供不启动 Streamlit 的批处理使用。
+    """
+    with open(path, 'rb') as f:
+        return tomllib.load(f)['connections']['my_database']
+
+
+def create_engine_from_config(db_config):
+    """
+    按配置中的 dialect 创建数据库引擎：默认 mssql；dialect = "sqlite" 时 database 为本地数据库文件路径。
+    """
+    dialect = db_config.get("dialect", "mssql")
+    if dialect == "sqlite":
+        # 连接在线程池的不同线程中使用，每个连接同一时间只被一个线程占用；
+        # 只读查询使用自动提交，删除临时表立即生效，不会在连接归还时被回滚
+        engine = create_engine(f"sqlite:///{db_config['database']}", isolation_level="AUTOCOMMIT",
+                               connect_args={"check_same_thread": False})
+        return install_telemetry(engine)
+    if dialect != "mssql":
+        raise ValueError(f"不支持的数据库类型: {dialect}，可选 {'、'.join(CODES_TEMP_TABLES)}")
+
+    # 构建连接字符串
+    driver = db_config["driver"].replace(" ", "+")  # 替换空格为加号
+    user = db_config["username"]
+    password = db_config["password"]
+    server = db_config["host"]
+    port = db_config["port"]
+    database = db_config["database"]
+
+    con_str = f"mssql+pyodbc://{user}:{password}@{server}:{port}/{database}?driver={driver}"
+    engine = create_engine(con_str, fast_executemany=True)
+    # 记录每条语句的耗时、行数和获取连接的耗时，超过阈值的写入慢查询日志
+    return install_telemetry(engine)
+
+
+@contextmanager
+def codes_temp_table(conn, secucodes):
+    """
+    把基金代码写入当前连接的临时表，返回临时表名；退出时删除临时表，连接归还连接池后不会残留。
+    """
+    codes_table, create_sql, drop_sql = CODES_TEMP_TABLES[conn.dialect.name]
+    with span('临时表写入', rows=len(secucodes)):
+        # 创建临时表
+        conn.execute(text(create_sql))
+
+        # 一次 executemany 插入全部基金代码（mssql 引擎开启了 fast_executemany），只产生一条语句记录
+        insert_sql = f'INSERT INTO {codes_table} (SecuCode) VALUES (:secu_code)'
+        if len(secucodes):
+            conn.execute(text(insert_sql), [{"secu_code": secu_code} for secu_code in secucodes])
+
+    try:
+        yield codes_table
+    finally:
+        conn.execute(text(drop_sql))
+
+
+def read_query(conn, sql, params):
+    """
+    执行查询并读取为 DataFrame。执行和读取分开计时，与 pd.read_sql_query 一样把 Decimal 转为浮点数。
+    """
+    with span('SQL 执行'):
+        result = conn.execute(text(sql), params)
+    with span('结果读取') as record:
+        fetch_start = time.perf_counter()
+        df = pd.DataFrame.from_records(result.fetchall(), columns=list(result.keys()), coerce_float=True)
+        record['rows'] = len(df)
+        record_fetch(conn, time.perf_counter() - fetch_start, len(df))
+    return df
+
+
+def fetch_fund_data(engine, fund_main_code, start_date, end_date):
+    """
+    查询基金的拆分、分红和净值数据，出错时直接抛出异常，由调用方决定如何处理。
+
+    参数:
+    - engine: 数据库引擎
+    - fund_main_code: 基金代码列表
+    - start_date: 开始日期
+    - end_date: 结束日期
+    """
+    # 确保日期参数转换为字符串格式 YYYY-MM-DD
+    start_date_str = start_date.strftime('%Y-%m-%d')
+    end_date_str = end_date.strftime('%Y-%m-%d')
+
+    with connect(engine) as conn, codes_temp_table(conn, fund_main_code) as codes_table:
+        df = read_query(conn, FUND_DATA_SQL.format(codes_table=codes_table),
+                        {"start_date": start_date_str, "end_date": end_date_str})
+
+    # SQLite 的日期以文本保存，统一转换为日期类型
+    df['TradingDay'] = pd.to_datetime(df['TradingDay'])
+    return df
+
+
+def fetch_fund_universe(engine):
+    """
+    查询全部公募基金（SecuCategory = 8）的内部编码、代码和名称。
+    """
+    sql = 'SELECT InnerCode, SecuCode, ChiName FROM SecuMain WHERE SecuCategory = 8 ORDER BY SecuCode'
+    with connect(engine) as conn:
+        return pd.read_sql_query(text(sql), conn)
+
+
+@timed('调整系数')
+def calculate_adjustment_coefficients(data):
+    # 确保 SplitRatio 列为数值类型，如果不能转换则填充为 1.0
+    data['SplitRatio'] = pd.to_numeric(data['SplitRatio'], errors='coerce').fillna(1.0)
+
+    # 确保 ActualRatioAfterTax 列为数值类型，如果不能转换则填充为 0.0
+    data['ActualRatioAfterTax'] = pd.to_numeric(data['ActualRatioAfterTax'], errors='coerce').fillna(0.0)
+
+    data['a'] = 1.0
+    data['b'] = 0.0
+
+    data['a'] = data.groupby('SecuCode')['SplitRatio'].cumprod()
+    # 按基金分组取前一行的 a，保证每只基金的结果与其他基金无关（增量计算依赖这一点）
+    data['b'] = (
+            data.groupby('SecuCode')['a'].shift(1, fill_value=1.0) * data['ActualRatioAfterTax']
+    ).groupby(data['SecuCode']).cumsum()
+    return data
+
+
+@timed('调整后净值')
+def calculate_adjusted_unitnv(data):
+    data['AdjustedUnitNV'] = data['UnitNV'] * data['a'] + data['b']
+    return data
+
+
+# 数据频率：日度保持原样，周度取每周最后一个观测，月末取每月最后一个观测
+DATA_FREQUENCIES = {
+    '日度': 'D',
+    '周度': 'W-FRI',
+    '月末': 'M',
+}
+
+
+@timed('重采样')
+def resample_fund_data(data, frequency):
+    """
+    按基金对调整后的净值数据做末值重采样，在 calculate_adjusted_unitnv 之后调用。
+
+    分红和拆分已经累积在调整系数 a、b 中，丢弃中间行不影响调整后净值；
+    每只基金每个周期只保留最后一个有净值的观测，整表一次性向量化完成。
+
+    参数:
+    - data: 基金数据 DataFrame，包含 'SecuCode'、'TradingDay'、'AdjustedUnitNV' 等列
+    - frequency: DATA_FREQUENCIES 中的频率，'D' 表示不重采样
+    """
+    if frequency == 'D' or data.empty:
+        return data
+
+    data = data[data['AdjustedUnitNV'].notna()].sort_values(['SecuCode', 'TradingDay'], kind='stable')
+    periods = pd.to_datetime(data['TradingDay']).dt.to_period(frequency)
+    last_in_period = ~pd.DataFrame({'SecuCode': data['SecuCode'], 'period': periods}).duplicated(keep='last')
+    return data[last_in_period.to_numpy()].reset_index(drop=True)
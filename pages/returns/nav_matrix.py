@@ -0,0 +1,104 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+
+# 基金 × 交易日净值矩阵的默认存放目录，可通过环境变量 NAV_MATRIX_DIR 修改
+NAV_MATRIX_DIR = os.environ.get('NAV_MATRIX_DIR', os.path.join(tempfile.gettempdir(), 'zzb_nav_matrix'))
+
+# 超过该天数未使用的矩阵文件会在构建新矩阵时清理
+NAV_MATRIX_MAX_AGE_DAYS = 7
+
+# values: float32 的 基金 × 交易日 矩阵（只读内存映射），缺失为 NaN
+# secucodes: 行索引（SecuCode），trading_days: 列索引（TradingDay），path: 矩阵文件所在目录
+NavMatrix = namedtuple('NavMatrix', ['values', 'secucodes', 'trading_days', 'path'])
+
+
+def nav_matrix_fingerprint(data, net_value_column):
+    """
+    根据基金代码、交易日和净值列计算数据指纹，相同数据对应同一个矩阵文件。
+    """
+    hashed = pd.util.hash_pandas_object(data[['SecuCode', 'TradingDay', net_value_column]], index=False)
+    return hashlib.sha1(hashed.to_numpy().tobytes()).hexdigest()[:16]
+
+
+def load_nav_matrix(path):
+    """
+    以只读内存映射方式打开已持久化的净值矩阵，多个进程或会话可以共享同一份文件而不复制数据。
+    """
+    values = np.load(os.path.join(path, 'values.npy'), mmap_mode='r')
+    secucodes = pd.Index(np.load(os.path.join(path, 'secucodes.npy')), name='SecuCode')
+    trading_days = pd.DatetimeIndex(np.load(os.path.join(path, 'trading_days.npy')), name='TradingDay')
+    return NavMatrix(values, secucodes, trading_days, path)
+
+
+def build_nav_matrix(data, net_value_column='AdjustedUnitNV', base_dir=None):
+    """
+    将长表格式的基金净值（fetch_fund_data + calculate_adjusted_unitnv 的结果）转换成
+    float32 的 基金 × 交易日 矩阵，并持久化为可内存映射的 .npy 文件。
+
+    参数:
+    - data: 基金数据 DataFrame，包含 'SecuCode'、'TradingDay' 和净值列
+    - net_value_column: 转换的净值列，默认为 'AdjustedUnitNV'
+    - base_dir: 矩阵文件存放目录，默认为 NAV_MATRIX_DIR
+
+    返回:
+    - NavMatrix，values 为只读内存映射
+    """
+    base_dir = base_dir or NAV_MATRIX_DIR
+    os.makedirs(base_dir, exist_ok=True)
+
+    path = os.path.join(base_dir, f'{net_value_column}_{nav_matrix_fingerprint(data, net_value_column)}')
+    if os.path.exists(os.path.join(path, 'values.npy')):
+        # 更新访问时间，避免被清理
+        os.utime(path)
+        return load_nav_matrix(path)
+
+    remove_stale_nav_matrices(base_dir)
+
+    data = data.dropna(subset=[net_value_column])
+    fund_index, secucodes = pd.factorize(data['SecuCode'], sort=True)
+    day_index, trading_days = pd.factorize(pd.to_datetime(data['TradingDay']), sort=True)
+
+    # 先写入临时目录，完成后整体重命名，避免其他进程读到写了一半的文件
+    tmp_path = tempfile.mkdtemp(dir=base_dir, prefix='.building_')
+    try:
+        values = np.lib.format.open_memmap(os.path.join(tmp_path, 'values.npy'), mode='w+', dtype=np.float32,
+                                           shape=(len(secucodes), len(trading_days)))
+        values[:] = np.nan
+        values[fund_index, day_index] = data[net_value_column].to_numpy(dtype=np.float32)
+        values.flush()
+        del values
+
+        np.save(os.path.join(tmp_path, 'secucodes.npy'), np.asarray(secucodes, dtype=str))
+        np.save(os.path.join(tmp_path, 'trading_days.npy'), trading_days.values.astype('datetime64[D]'))
+        os.replace(tmp_path, path)
+    except OSError:
+        # 其他进程已经构建了同一个矩阵
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        if not os.path.exists(os.path.join(path, 'values.npy')):
+            raise
+
+    return load_nav_matrix(path)
+
+
+def remove_stale_nav_matrices(base_dir=None, max_age_days=NAV_MATRIX_MAX_AGE_DAYS):
+    """
+    删除超过 max_age_days 天未使用的矩阵文件。
+    """
+    base_dir = base_dir or NAV_MATRIX_DIR
+    if not os.path.isdir(base_dir):
+        return
+
+    cutoff = time.time() - max_age_days * 86400
+    for name in os.listdir(base_dir):
+        path = os.path.join(base_dir, name)
+        if os.path.isdir(path) and os.path.getmtime(path) < cutoff:
+            shutil.rmtree(path, ignore_errors=True)
+
@@ -0,0 +1,128 @@
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+
+# 设置环境变量 PERF_LOG_PATH 后，每个阶段的耗时记录以 JSON Lines 格式追加到该文件
+PERF_LOG_PATH = os.environ.get('PERF_LOG_PATH')
+
+logger = logging.getLogger('zzb.perf')
+
+_local = threading.local()
+_log_lock = threading.Lock()
+
+
+def current_rss_mb():
+    """
+    当前进程的常驻内存（MB）。Linux 下读取 /proc/self/statm，其他平台返回峰值常驻内存。
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+    except (OSError, ValueError, AttributeError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def row_count(value):
+    """
+    DataFrame / Series / 列表等返回行数，其他对象返回 None。
+    """
+    if isinstance(value, (pd.DataFrame, pd.Series, list, tuple)):
+        return len(value)
+    return None
+
+
+def write_log(record):
+    logger.debug(json.dumps(record, ensure_ascii=False))
+    if PERF_LOG_PATH:
+        with _log_lock, open(PERF_LOG_PATH, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+@contextmanager
+def collect_spans():
+    """
+    在当前线程中收集 span 记录，返回记录列表。可以嵌套，内层收集的记录同时追加到外层。
+    """
+    records = []
+    stack = _local.__dict__.setdefault('collectors', [])
+    stack.append(records)
+    try:
+        yield records
+    finally:
+        stack.pop()
+
+
+@contextmanager
+def span(name, rows=None, **fields):
+    """
+    记录一个阶段的耗时、行数和内存变化。
+
+    用法:
+        with span('SQL 执行') as record:
+            ...
+            record['rows'] = len(df)
+
+    记录追加到当前线程所有 collect_spans() 收集器中，并写入结构化日志。
+    """
+    parents = _local.__dict__.setdefault('parents', [])
+    record = {
+        'name': name,
+        'parent': parents[-1] if parents else None,
+        'started_at': time.time(),
+        'rows': rows,
+        'thread': threading.current_thread().name,
+        **fields,
+    }
+    start = time.perf_counter()
+    start_rss = current_rss_mb()
+    parents.append(name)
+    try:
+        yield record
+    finally:
+        parents.pop()
+        record['seconds'] = round(time.perf_counter() - start, 6)
+        record['memory_delta_mb'] = round(current_rss_mb() - start_rss, 2)
+        for records in _local.__dict__.get('collectors', []):
+            records.append(record)
+        write_log(record)
+
+
+def timed(name):
+    """
+    装饰器：用 span 记录函数的耗时，行数取返回值的行数。
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name) as record:
+                result = func(*args, **kwargs)
+                record['rows'] = row_count(result)
+                return result
+        return wrapper
+    return decorator
+
+
+def summarize_spans(records):
+    """
+    按阶段汇总 span 记录：次数、总耗时、最大耗时、总行数和内存变化。
+    """
+    if not records:
+        return pd.DataFrame()
+
+    df = pd.DataFrame(records)
+    summary = df.groupby('name', sort=False).agg(
+        次数=('seconds', 'size'),
+        总耗时秒=('seconds', 'sum'),
+        最大耗时秒=('seconds', 'max'),
+        行数=('rows', lambda rows: rows.dropna().sum() if rows.notna().any() else None),
+        内存变化MB=('memory_delta_mb', 'sum'),
+    )
+    return summary.sort_values('总耗时秒', ascending=False).round(4)
@@ -0,0 +1,74 @@
+import datetime
+import json
+
+import streamlit as st
+
+from pages.returns.perf import summarize_spans
+
+
+# 会话内保留的运行记录数量
+PERF_HISTORY_SIZE = 20
+
+
+def record_spans(label, records):
+    """
+    保存一次页面运行或后台任务的 span 记录，供性能面板查看。
+    """
+    if not records:
+        return
+    history = st.session_state.setdefault('perf_history', [])
+    history.append({'label': f"{datetime.datetime.now():%H:%M:%S} {label}", 'records': list(records)})
+    del history[:-PERF_HISTORY_SIZE]
+
+
+def show_perf_panel():
+    """
+    侧边栏性能面板：按阶段汇总最近的运行记录，并可下载全部记录（JSON Lines）。
+    """
+    if not st.sidebar.checkbox("显示性能面板", key="perf_panel_enabled"):
+        return
+
+    show_sql_stats()
+
+    with st.sidebar.expander("性能面板", expanded=True):
+        history = st.session_state.get('perf_history', [])
+        if not history:
+            st.caption("暂无耗时记录")
+            return
+
+        labels = [entry['label'] for entry in reversed(history)]
+        selected = st.selectbox("运行记录", labels, key="perf_panel_run")
+        records = next(entry['records'] for entry in history if entry['label'] == selected)
+        st.caption(f"共 {len(records)} 个阶段记录，总耗时按阶段累计（嵌套阶段会重复计入上层）")
+        st.dataframe(summarize_spans(records))
+
+        lines = [json.dumps({'run': entry['label'], **record}, ensure_ascii=False, default=str)
+                 for entry in history for record in entry['records']]
+        st.download_button("下载耗时记录（JSON Lines）", data='\n'.join(lines), file_name='perf_spans.jsonl',
+                           mime='application/json', key="perf_panel_download")
+
+
+def show_sql_stats():
+    """
+    SQL 统计：进程内各语句的次数和耗时分布、获取连接的耗时，以及慢查询日志中最近的记录。
+    """
+    # db_telemetry 依赖 sqlalchemy，只在打开性能面板时导入
+    from pages.returns.db_telemetry import (SLOW_QUERY_SECONDS, connection_wait_summary, query_summary,
+                                            read_slow_queries)
+
+    with st.sidebar.expander("SQL 统计"):
+        summary = query_summary()
+        if summary.empty:
+            st.caption("暂无 SQL 记录")
+            return
+
+        st.dataframe(summary)
+        waits = connection_wait_summary()
+        if waits:
+            st.caption("获取连接：" + "，".join(f"{name} {value}" for name, value in waits.items()))
+
+        slow_queries = read_slow_queries(limit=20)
+        st.caption(f"慢查询（超过 {SLOW_QUERY_SECONDS:g} 秒）：{len(slow_queries)} 条")
+        if not slow_queries.empty:
+            st.dataframe(slow_queries[['statement', 'parameters', 'execute_seconds', 'fetch_seconds', 'rows']],
+                         hide_index=True)
@@ -0,0 +1,148 @@
+import numpy as np
+import pandas as pd
+
+
+# 区间收益率的统计频率
+PERIOD_FREQUENCIES = {
+    '年度': 'Y',
+    '季度': 'Q',
+    '月度': 'M',
+}
+
+
+def period_labels(periods, start_date, end_date):
+    """
+    区间列名。查询的开始日期晚于区间第一天、或结束日期早于区间最后一天时，该区间只覆盖了一部分，
+    列名标注实际覆盖的日期，不与完整区间混淆。
+    """
+    start_date = pd.Timestamp(start_date).normalize()
+    end_date = pd.Timestamp(end_date).normalize()
+    labels = []
+    for period in periods:
+        partial_start = start_date > period.start_time
+        partial_end = end_date < period.end_time.normalize()
+        if partial_start and partial_end:
+            labels.append(f'{period}（部分：{start_date:%Y-%m-%d} ~ {end_date:%Y-%m-%d}）')
+        elif partial_start:
+            labels.append(f'{period}（部分：{start_date:%Y-%m-%d} 起）')
+        elif partial_end:
+            labels.append(f'{period}（部分：截至 {end_date:%Y-%m-%d}）')
+        else:
+            labels.append(str(period))
+    return labels
+
+
+def calculate_period_returns(matrix, start_date, end_date, frequency='Y'):
+    """
+    基于 基金 × 交易日 净值矩阵一次性计算所有基金的日历区间收益率。
+
+    每个区间的收益率 = 区间内最后一个净值 / 上一区间最后一个净值 - 1；
+    基金在该区间之前没有净值（成立当期）时，以区间内第一个净值为基准。区间内没有净值的记为 NaN。
+    区间内的“最后一个净值”通过沿交易日方向累积最后一个有效列位置得到，全程为矩阵运算。
+    查询区间没有覆盖完整的第一个、最后一个区间时，这两个区间的收益率只是部分区间的收益率，
+    列名按 period_labels 标注为“部分”；研究基金和对比基金池使用相同的日期时列名一致，排名只在相同的部分区间内比较。
+
+    参数:
+    - matrix: build_nav_matrix 返回的 NavMatrix
+    - start_date: 查询的开始日期
+    - end_date: 查询的结束日期
+    - frequency: 'Y'（年度）、'Q'（季度）或 'M'（月度）
+
+    返回:
+    - 以 SecuCode 为索引、区间为列的收益率（%）DataFrame
+    """
+    values = np.asarray(matrix.values, dtype=float)
+    fund_count, day_count = values.shape
+    columns = np.arange(day_count)
+    valid = ~np.isnan(values)
+
+    # 每个位置之前（含）最后一个有效净值的列位置，以及之后（含）第一个有效净值的列位置
+    last_valid = np.maximum.accumulate(np.where(valid, columns, -1), axis=1)
+    next_valid = np.minimum.accumulate(np.where(valid, columns, day_count)[:, ::-1], axis=1)[:, ::-1]
+
+    # 每个日历区间在矩阵中的列范围 [period_starts, period_ends]
+    period_codes, periods = pd.factorize(matrix.trading_days.to_period(frequency))
+    period_starts = np.flatnonzero(np.r_[True, period_codes[1:] != period_codes[:-1]])
+    period_ends = np.r_[period_starts[1:], day_count] - 1
+
+    rows = np.arange(fund_count)[:, None]
+    end_position = last_valid[:, period_ends]
+    has_data = end_position >= period_starts
+
+    # 基准：上一区间最后一个净值，没有则取本区间第一个净值
+    previous_position = np.where(period_starts > 0, last_valid[:, np.maximum(period_starts - 1, 0)], -1)
+    base_position = np.where(previous_position >= 0, previous_position, next_valid[:, period_starts])
+
+    end_nv = values[rows, np.maximum(end_position, 0)]
+    base_nv = values[rows, np.minimum(base_position, day_count - 1)]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        returns = np.where(has_data, (end_nv / base_nv - 1) * 100, np.nan)
+
+    return pd.DataFrame(returns, index=matrix.secucodes, columns=period_labels(periods, start_date, end_date))
+
+
+def calculate_ytd_returns(matrix, end_date):
+    """
+    基于净值矩阵计算截至 end_date 的今年以来收益率。
+
+    今年以来收益率 = end_date 当天或之前最后一个净值 / 上一年 12 月 31 日当天或之前最后一个净值 - 1；
+    基金在上一年末之前没有净值（今年成立）时，以今年第一个净值为基准。
+    今年（end_date 所在年份）没有净值的基金记为 NaN，不会把往年的收益率当作今年以来收益率。
+
+    返回:
+    - 以 SecuCode 为索引的收益率（%）Series
+    """
+    end_date = pd.Timestamp(end_date)
+    values = np.asarray(matrix.values, dtype=float)
+    day_count = values.shape[1]
+    columns = np.arange(day_count)
+    valid = ~np.isnan(values)
+
+    before_year = np.asarray(matrix.trading_days < pd.Timestamp(end_date.year, 1, 1))
+    this_year = ~before_year & np.asarray(matrix.trading_days <= end_date)
+
+    base_position = np.where(valid & before_year, columns, -1).max(axis=1, initial=-1)
+    first_position = np.where(valid & this_year, columns, day_count).min(axis=1, initial=day_count)
+    end_position = np.where(valid & this_year, columns, -1).max(axis=1, initial=-1)
+    base_position = np.where(base_position >= 0, base_position, first_position)
+
+    rows = np.arange(values.shape[0])
+    has_data = end_position >= 0
+    end_nv = values[rows, np.maximum(end_position, 0)]
+    base_nv = values[rows, np.minimum(base_position, day_count - 1)] if day_count else end_nv
+    with np.errstate(invalid='ignore', divide='ignore'):
+        returns = np.where(has_data, (end_nv / base_nv - 1) * 100, np.nan)
+    return pd.Series(returns, index=matrix.secucodes, name='今年以来')
+
+
+def calculate_period_ranks(research_table, pool_table):
+    """
+    计算研究基金每个区间收益率在对比基金池中的排名。
+
+    返回:
+    - rank_df: “名次/基金池有效基金数”形式的同类排名
+    - percentile_df: 百分位排名（0~100，越高表示收益率越靠前，相同收益率记一半）
+    """
+    pool_table = pool_table.reindex(columns=research_table.columns)
+    pool_values = pool_table.to_numpy(dtype=float)
+    counts = (~np.isnan(pool_values)).sum(axis=0)
+
+    ranks = {}
+    percentiles = {}
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for secu_code, fund_values in research_table.iterrows():
+            fund_values = fund_values.to_numpy(dtype=float)
+            above = (pool_values > fund_values).sum(axis=0)
+            equal = (pool_values == fund_values).sum(axis=0)
+            below = (pool_values < fund_values).sum(axis=0)
+            missing = np.isnan(fund_values) | (counts == 0)
+
+            percentile = (below + 0.5 * equal) / counts * 100
+            percentile[missing] = np.nan
+            percentiles[secu_code] = percentile
+            ranks[secu_code] = [None if skip else f'{rank}/{count}'
+                                for skip, rank, count in zip(missing, above + 1, counts)]
+
+    rank_df = pd.DataFrame.from_dict(ranks, orient='index', columns=research_table.columns)
+    percentile_df = pd.DataFrame.from_dict(percentiles, orient='index', columns=research_table.columns)
+    return rank_df, percentile_df
@@ -0,0 +1,104 @@
+import pandas as pd
+
+from pages.returns.indicators import calculate_grouped_statistics, calculate_rolling_returns
+from pages.returns.nav_data import (calculate_adjusted_unitnv, calculate_adjustment_coefficients, fetch_fund_data,
+                                    resample_fund_data)
+from pages.returns.sql_rolling import fetch_rolling_returns
+
+
+# 批处理默认计算的滚动区间（年）和净值列
+DEFAULT_INTERVALS = [0.5, 1, 2, 3, 5]
+DEFAULT_NET_VALUE_COLUMNS = ['AdjustedUnitNV', 'UnitNVRestored']
+
+
+def compute_fund_nav(engine, secucodes, start_date, end_date, frequency='D'):
+    """
+    查询基金数据并计算调整系数、调整后净值，按 frequency 重采样。不依赖 Streamlit，出错时抛出异常。
+    """
+    data = fetch_fund_data(engine, secucodes, start_date, end_date)
+    if data.empty:
+        return data
+
+    data = calculate_adjustment_coefficients(data)
+    data = calculate_adjusted_unitnv(data)
+    return resample_fund_data(data, frequency)
+
+
+def compute_rolling_indicators(data, intervals, net_value_columns, start_date, end_date):
+    """
+    计算每只基金在各区间、各净值列上的滚动年化收益率及其统计指标。
+
+    返回:
+    - rolling_df: 滚动收益率明细，包含 'net_value_column' 列标明使用的净值
+    - statistics_df: 每只基金每个区间、每个净值列一行的统计指标
+    """
+    rolling_frames = []
+    statistics = []
+    for net_value_column in net_value_columns:
+        for interval in intervals:
+            rolling = calculate_rolling_returns(data, interval, net_value_column, start_date, end_date)
+            if rolling.empty:
+                continue
+            rolling['net_value_column'] = net_value_column
+            rolling_frames.append(rolling)
+            statistics.extend(rolling_statistics(rolling, interval, net_value_column))
+
+    rolling_df = pd.concat(rolling_frames, ignore_index=True) if rolling_frames else pd.DataFrame()
+    return rolling_df, pd.DataFrame(statistics)
+
+
+def compute_rolling_indicators_in_database(engine, secucodes, intervals, net_value_columns, start_date, end_date):
+    """
+    与 compute_rolling_indicators 相同，但调整后净值和滚动收益率在数据库中计算，只传回每个窗口的结果。
+    """
+    rolling_frames = []
+    statistics = []
+    for net_value_column in net_value_columns:
+        for interval in intervals:
+            rolling = fetch_rolling_returns(engine, secucodes, interval, net_value_column, start_date, end_date)
+            if rolling.empty:
+                continue
+            rolling['net_value_column'] = net_value_column
+            rolling_frames.append(rolling)
+            statistics.extend(rolling_statistics(rolling, interval, net_value_column))
+
+    rolling_df = pd.concat(rolling_frames, ignore_index=True) if rolling_frames else pd.DataFrame()
+    return rolling_df, pd.DataFrame(statistics)
+
+
+def rolling_statistics(rolling, interval, net_value_column):
+    """
+    每只基金一行的滚动收益率统计指标，所有基金一次分组计算。
+    """
+    rolling = rolling.dropna(subset=['annualized_return_rate'])
+    if rolling.empty:
+        return []
+    statistics = calculate_grouped_statistics(rolling['annualized_return_rate'], rolling['SecuCode'])
+    statistics = statistics.assign(基金代码=statistics.index, 区间=interval, 净值列=net_value_column)
+    return statistics.to_dict('records')
+
+
+def run_pipeline(engine, secucodes, start_date, end_date, intervals=DEFAULT_INTERVALS,
+                 net_value_columns=DEFAULT_NET_VALUE_COLUMNS, frequency='D', execution='local'):
+    """
+    完整的指标计算流程：query → 调整系数 → 调整后净值 → 滚动收益率 → 统计指标。
+    execution 为 'database' 时调整后净值和滚动收益率在数据库中计算，不传回每日净值，结果中的 nav 为空；
+    数据库计算只支持日度数据。
+
+    返回:
+    - {'nav': 净值数据, 'rolling': 滚动收益率明细, 'statistics': 统计指标}
+    """
+    if execution == 'database':
+        if frequency != 'D':
+            raise ValueError("数据库计算只支持日度数据")
+        rolling, statistics = compute_rolling_indicators_in_database(engine, secucodes, intervals, net_value_columns,
+                                                                     start_date, end_date)
+        return {'nav': pd.DataFrame(), 'rolling': rolling, 'statistics': statistics}
+
+    nav = compute_fund_nav(engine, secucodes, start_date, end_date, frequency)
+    if nav.empty:
+        return {'nav': nav, 'rolling': pd.DataFrame(), 'statistics': pd.DataFrame()}
+
+    nav['TradingDay'] = pd.to_datetime(nav['TradingDay'])
+    rolling, statistics = compute_rolling_indicators(nav, intervals, net_value_columns, start_date, end_date)
+    return {'nav': nav, 'rolling': rolling, 'statistics': statistics}
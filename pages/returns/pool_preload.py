@@ -0,0 +1,115 @@
+import datetime
+import threading
+import time
+
+import streamlit as st
+
+from pages.returns.comparison_pools import most_used_pools
+
+
+# 与净值分析页面默认的查询区间一致：开始日期 2023-01-01，结束日期为当天
+DEFAULT_START_DATE = datetime.date(2023, 1, 1)
+
+# 预热的滚动区间（年）和净值列，与收益率分析页面可选的区间、两个滚动分布页签一致
+PRELOAD_INTERVALS = [0.5, 1, 2, 3, 5]
+PRELOAD_NET_VALUE_COLUMNS = ['AdjustedUnitNV', 'UnitNVRestored']
+
+
+@st.cache_resource
+def get_warm_store():
+    """
+    进程级的预热缓存，所有会话共享：{'pools': {名称: 预热结果}, 'lock': 锁}。
+    预热结果包含基金代码、日期区间，以及与会话中 comparison_fund_cache、comparison_rolling_cache 结构相同的缓存。
+    """
+    return {'pools': {}, 'lock': threading.Lock()}
+
+
+def preload_pools(pools, start_date, end_date, progress, intervals=PRELOAD_INTERVALS,
+                  net_value_columns=PRELOAD_NET_VALUE_COLUMNS):
+    """
+    后台任务：查询基金池的净值、计算调整系数和日度滚动年化收益率，结果保存在进程级的预热缓存中。
+    查询出错时任务失败，不会把没有查到的基金池写入预热缓存。
+    """
+    # 页面模块较重，只在任务线程中导入，不影响应用启动
+    from pages.returns.adjust_coefficient import create_db_engine, update_comparison_pool
+    from pages.returns.calculate_returns import get_comparison_rolling_returns
+
+    engine = create_db_engine()
+    store = get_warm_store()
+    steps = max(len(pools) * (1 + len(intervals) * len(net_value_columns)), 1)
+    done = 0
+    for name, codes in pools:
+        progress(f'预热基金池 {name}：查询净值', done / steps)
+        state = {'data_frequency': 'D'}
+        comparison_df = update_comparison_pool(engine, codes, start_date, end_date, state)
+        done += 1
+        for net_value_column in net_value_columns:
+            for interval in intervals:
+                progress(f'预热基金池 {name}：{net_value_column} {interval} 年滚动收益率', done / steps)
+                if not comparison_df.empty:
+                    get_comparison_rolling_returns(comparison_df, codes, interval, net_value_column, start_date,
+                                                   end_date, state=state)
+                done += 1
+
+        with store['lock']:
+            store['pools'][name] = {
+                'codes': list(codes),
+                'date_range': (start_date, end_date),
+                'fund_cache': state['comparison_fund_cache'],
+                'rolling_cache': state.get('comparison_rolling_cache', {}),
+                'warmed_at': time.time(),
+            }
+    return [name for name, _ in pools]
+
+
+def start_preload(pools, start_date=DEFAULT_START_DATE, end_date=None):
+    """
+    提交预热任务，返回任务 ID；没有基金池时返回 None。
+    """
+    if not pools:
+        return None
+    # 只有需要预热时才导入任务模块（及其线程池）
+    from pages.returns.jobs import submit_job
+
+    end_date = end_date or datetime.date.today()
+    return submit_job("对比基金池预热", preload_pools, pools, start_date, end_date)
+
+
+@st.cache_resource
+def start_daily_preload(day):
+    """
+    每个进程每天第一次运行应用时预热使用最多的基金池，当天之后的运行直接返回已提交的任务 ID。
+    """
+    return start_preload(most_used_pools(), DEFAULT_START_DATE, day)
+
+
+def seed_session_cache(name, codes, start_date, end_date, state=None):
+    """
+    把基金池的预热结果合并到会话的对比基金池缓存中，日期区间和基金代码与预热时一致时生效。
+    合并后 update_comparison_pool 和 get_comparison_rolling_returns 直接命中缓存，不再查询和计算。
+
+    返回:
+    - 是否使用了预热结果
+    """
+    state = st.session_state if state is None else state
+    store = get_warm_store()
+    with store['lock']:
+        entry = store['pools'].get(name)
+    if entry is None or entry['date_range'] != (start_date, end_date) or set(entry['codes']) != set(codes):
+        return False
+
+    cache = state.get('comparison_fund_cache')
+    if cache is None or cache['date_range'] != (start_date, end_date):
+        cache = {'date_range': (start_date, end_date), 'funds': {}}
+        state['comparison_rolling_cache'] = {}
+    state['comparison_fund_cache'] = cache
+
+    # 复制外层字典，会话中增删基金不会改动共享的预热结果；DataFrame 只读共享
+    for secu_code, fund_data in entry['fund_cache']['funds'].items():
+        cache['funds'].setdefault(secu_code, fund_data)
+    rolling_cache = state.setdefault('comparison_rolling_cache', {})
+    for secu_code, entries in entry['rolling_cache'].items():
+        merged = dict(entries)
+        merged.update(rolling_cache.get(secu_code, {}))
+        rolling_cache[secu_code] = merged
+    return True
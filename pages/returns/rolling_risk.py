@@ -0,0 +1,177 @@
+import numpy as np
+import pandas as pd
+
+from pages.returns.perf import timed
+
+
+# 滚动指标名称与结果列名的对应关系
+ROLLING_METRICS = {
+    '年化收益率': 'annualized_return_rate',
+    '年化波动率': 'annualized_volatility',
+    '最大回撤': 'max_drawdown',
+    '卡玛比率': 'calmar_ratio',
+    '夏普比率': 'sharpe_ratio',
+}
+
+
+def rolling_window_ends(trading_days, interval_years):
+    """
+    计算每个窗口起始位置对应的窗口结束位置。
+
+    窗口结束日期为起始日期加上 interval_years 对应的月数，结束位置取不晚于该日期的最后一个交易日，
+    与 calculate_rolling_returns 的规则一致（两者都先去掉净值缺失的行）。由于交易日有序，返回的结束位置单调不减。
+
+    参数:
+    - trading_days: 已排序的交易日数组
+    - interval_years: 滚动窗口的年数
+    """
+    interval_months = int(interval_years * 12)
+    trading_days = pd.DatetimeIndex(trading_days)
+    window_end_dates = trading_days + pd.DateOffset(months=interval_months)
+    ends = np.searchsorted(trading_days.values, window_end_dates.values, side='right') - 1
+    return ends, window_end_dates
+
+
+def rolling_max_drawdown(log_nav, ends):
+    """
+    计算每个窗口 [i, ends[i]] 内的最大回撤（对数净值的最大跌幅），整体 O(n)。
+
+    窗口两端都单调右移，按“双栈队列”的思路把序列切成若干段：以分段点 pivot 为界，
+    窗口左半部分用段内的后缀聚合（后缀最大值、后缀最小值、后缀最大回撤），
+    右半部分用从 pivot 开始的前缀聚合（前缀最小值、前缀最大回撤），两部分合并即为窗口的最大回撤。
+    每个位置只参与常数次累积运算。
+
+    参数:
+    - log_nav: 对数净值数组
+    - ends: 每个起始位置对应的窗口结束位置，需满足 ends[i] >= i 且单调不减
+    """
+    n = len(log_nav)
+    best = np.empty(n)
+    seg_start = 0
+
+    while seg_start < n:
+        pivot = ends[seg_start] + 1
+
+        # 左半部分：[seg_start, pivot) 的后缀聚合
+        left = log_nav[seg_start:pivot][::-1]
+        suffix_min = np.minimum.accumulate(left)
+        suffix_max = np.maximum.accumulate(left)
+        suffix_best = np.maximum.accumulate(left - suffix_min)[::-1]
+        suffix_max = suffix_max[::-1]
+
+        seg_ends = ends[seg_start:pivot]
+        seg_best = suffix_best.copy()
+
+        # 右半部分：[pivot, 段内最大结束位置] 的前缀聚合
+        right_end = seg_ends[-1]
+        if right_end >= pivot:
+            right = log_nav[pivot:right_end + 1]
+            prefix_min = np.minimum.accumulate(right)
+            prefix_best = np.maximum.accumulate(np.maximum.accumulate(right) - right)
+
+            has_right = seg_ends >= pivot
+            k = seg_ends[has_right] - pivot
+            seg_best[has_right] = np.maximum.reduce([
+                suffix_best[has_right],
+                prefix_best[k],
+                suffix_max[has_right] - prefix_min[k],
+            ])
+
+        best[seg_start:pivot] = seg_best
+        seg_start = pivot
+
+    return best
+
+
+def calculate_fund_rolling_risk(trading_days, nav, interval_years, start_date, end_date, risk_free_rate=0.0):
+    """
+    计算单只基金的滚动风险指标，返回窗口起止位置和各指标数组。
+
+    年化收益率与 calculate_rolling_returns 一致；波动率基于对数收益率的累积和与累积平方和，
+    按窗口内实际观测频率年化；最大回撤使用 rolling_max_drawdown；
+    卡玛比率 = 年化收益率 / 最大回撤，夏普比率 = (年化收益率 - 无风险利率) / 年化波动率。
+    """
+    trading_days = pd.DatetimeIndex(trading_days)
+    nav = np.asarray(nav, dtype=float)
+    ends, window_end_dates = rolling_window_ends(trading_days, interval_years)
+
+    # 只保留起始日不早于 start_date、窗口结束日不晚于 end_date 且包含至少两个交易日的窗口
+    positions = np.arange(len(nav))
+    keep = (trading_days >= start_date) & (window_end_dates <= end_date) & (ends > positions)
+    starts = positions[keep]
+    window_ends = ends[keep]
+
+    days_values = trading_days.values
+    days_diff = (days_values[window_ends] - days_values[starts]) / np.timedelta64(1, 'D')
+    annualized_return = (nav[window_ends] / nav[starts]) ** (365 / days_diff) - 1
+
+    # 对数收益率的累积和，窗口 (s, e] 的和为 c[e] - c[s]
+    log_nav = np.log(nav)
+    log_returns = np.diff(log_nav)
+    cum_sum = np.concatenate([[0.0], np.cumsum(log_returns)])
+    cum_square = np.concatenate([[0.0], np.cumsum(log_returns ** 2)])
+    count = window_ends - starts
+    sum_returns = cum_sum[window_ends] - cum_sum[starts]
+    sum_squares = cum_square[window_ends] - cum_square[starts]
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        variance = (sum_squares - sum_returns ** 2 / count) / (count - 1)
+        variance = np.where(count > 1, np.maximum(variance, 0.0), np.nan)
+        periods_per_year = count * 365 / days_diff
+        annualized_volatility = np.sqrt(variance * periods_per_year)
+
+        max_drawdown = 1 - np.exp(-rolling_max_drawdown(log_nav, ends)[keep])
+        calmar_ratio = np.where(max_drawdown > 0, annualized_return / max_drawdown, np.nan)
+        sharpe_ratio = np.where(annualized_volatility > 0,
+                                (annualized_return - risk_free_rate / 100) / annualized_volatility, np.nan)
+
+    return starts, window_ends, {
+        'annualized_return_rate': annualized_return * 100,
+        'annualized_volatility': annualized_volatility * 100,
+        'max_drawdown': max_drawdown * 100,
+        'calmar_ratio': calmar_ratio,
+        'sharpe_ratio': sharpe_ratio,
+    }
+
+
+@timed('滚动风险指标')
+def calculate_rolling_risk_metrics(data, interval_years, net_value_column, start_date, end_date, risk_free_rate=0.0):
+    """
+    计算指定区间内的滚动年化收益率、年化波动率、最大回撤、卡玛比率和夏普比率。
+
+    参数:
+    - data: 基金数据 DataFrame，包含 'SecuCode'、'TradingDay' 和净值列。
+    - interval_years: 滚动窗口的年数。
+    - net_value_column: 使用的净值列，例如 'AdjustedUnitNV' 或 'UnitNVRestored'。
+    - start_date: 用户设定的开始日期。
+    - end_date: 用户设定的结束日期。
+    - risk_free_rate: 年化无风险利率（%），用于夏普比率。
+    """
+    start_date = pd.to_datetime(start_date)
+    end_date = pd.to_datetime(end_date)
+
+    # 净值缺失的行（例如只有分红记录的日期）不参与计算
+    data = data[['SecuCode', 'TradingDay', net_value_column]].dropna(subset=[net_value_column])
+    data = data.assign(TradingDay=pd.to_datetime(data['TradingDay'])).sort_values(['SecuCode', 'TradingDay'])
+
+    results = []
+    for secu_code, fund_data in data.groupby('SecuCode', sort=False):
+        trading_days = fund_data['TradingDay'].values
+        starts, window_ends, metrics = calculate_fund_rolling_risk(
+            trading_days, fund_data[net_value_column].values, interval_years, start_date, end_date, risk_free_rate
+        )
+        if len(starts) == 0:
+            continue
+
+        fund_results = pd.DataFrame({
+            'SecuCode': secu_code,
+            'start_date': trading_days[starts],
+            'end_date': trading_days[window_ends],
+            **metrics,
+            'interval': interval_years,
+        })
+        results.append(fund_results)
+
+    if not results:
+        return pd.DataFrame()
+    return pd.concat(results, ignore_index=True)
@@ -0,0 +1,211 @@
+import datetime
+import json
+import os
+import shutil
+
+import pandas as pd
+
+from pages.returns.nav_data import calculate_adjusted_unitnv, calculate_adjustment_coefficients, fetch_fund_data
+from pages.returns.rolling_risk import calculate_rolling_risk_metrics
+
+
+# 滚动指标仓库的存放目录，可通过环境变量 ROLLING_WAREHOUSE_DIR 修改
+WAREHOUSE_DIR = os.environ.get('ROLLING_WAREHOUSE_DIR', 'rolling_warehouse')
+
+# 仓库中保存的滚动指标列；夏普比率依赖无风险利率，读取时由年化收益率和年化波动率计算
+WAREHOUSE_METRICS = ['annualized_return_rate', 'annualized_volatility', 'max_drawdown', 'calmar_ratio']
+
+# 依赖查询开始日期的净值列：调整系数 a、b 从查询开始日起累积，
+# 开始日期之前有分红时，同一窗口的调整后净值之比会随开始日期变化，只能使用基准日与分析开始日期相同的仓库
+BASE_DEPENDENT_COLUMNS = ['AdjustedUnitNV']
+
+# 已读取的 manifest，按文件修改时间失效
+_manifests = {}
+
+
+def base_path(base_start, warehouse_dir=None):
+    return os.path.join(warehouse_dir or WAREHOUSE_DIR, f'base={pd.Timestamp(base_start):%Y-%m-%d}')
+
+
+def partition_path(base_dir, net_value_column, interval):
+    return os.path.join(base_dir, f'net_value_column={net_value_column}', f'interval={interval:g}')
+
+
+def window_end_dates(start_dates, interval_years):
+    """
+    窗口的目标结束日期：起始日期加上区间对应的月数，与 rolling_window_ends 的规则一致。
+    """
+    return pd.DatetimeIndex(start_dates) + pd.DateOffset(months=int(interval_years * 12))
+
+
+def read_manifest(base_dir):
+    """
+    读取仓库的 manifest：基准日、区间、净值列，以及每只基金已计算到的日期（该基金实际的最后一个交易日）。
+    不存在时返回 None。
+    """
+    path = os.path.join(base_dir, 'manifest.json')
+    if not os.path.exists(path):
+        return None
+
+    mtime = os.path.getmtime(path)
+    cached = _manifests.get(path)
+    if cached is None or cached[0] != mtime:
+        with open(path, encoding='utf-8') as f:
+            cached = (mtime, json.load(f))
+        _manifests[path] = cached
+    return cached[1]
+
+
+def write_manifest(base_dir, manifest):
+    # 先写临时文件再替换，读取方不会读到写了一半的 manifest
+    path = os.path.join(base_dir, 'manifest.json')
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def materialize_funds(engine, secucodes, base_start, since, end_date, intervals, net_value_columns):
+    """
+    计算一批基金的滚动指标。
+
+    净值从 base_start 开始查询，调整系数与以 base_start 为开始日期的页面查询一致；
+    since 不为 None 时只计算窗口结束日期晚于 since 的窗口（增量更新），否则计算全部窗口。
+    每只基金只保存目标结束日期不晚于其最后一个交易日的窗口：end_date 当天的净值还没有入库时，
+    之后的窗口留到净值到齐后的增量更新中计算，不会保存不完整的窗口。
+
+    返回:
+    - results: {(净值列, 区间): DataFrame}
+    - last_days: {基金代码: 实际查询到的最后一个交易日 'YYYY-MM-DD'}，没有净值的基金不包含在内
+    """
+    data = fetch_fund_data(engine, secucodes, base_start, end_date)
+    results = {}
+    if data.empty:
+        return results, {}
+
+    data = calculate_adjusted_unitnv(calculate_adjustment_coefficients(data))
+    last_trading_days = pd.to_datetime(data['TradingDay']).groupby(data['SecuCode']).max()
+    last_days = {code: f'{day:%Y-%m-%d}' for code, day in last_trading_days.items()}
+    for net_value_column in net_value_columns:
+        for interval in intervals:
+            start_date = pd.Timestamp(base_start)
+            if since is not None:
+                # 窗口结束日期晚于 since 的窗口，起始日期一定晚于 since 减去区间长度，多留几天余量后再精确过滤
+                start_date = max(start_date, pd.Timestamp(since) - pd.DateOffset(months=int(interval * 12))
+                                 - pd.Timedelta(days=3))
+            rolling = calculate_rolling_risk_metrics(data, interval, net_value_column, start_date, end_date)
+            if rolling.empty:
+                continue
+            target_ends = window_end_dates(rolling['start_date'], interval)
+            keep = target_ends <= rolling['SecuCode'].map(last_trading_days).to_numpy()
+            if since is not None:
+                keep &= target_ends > pd.Timestamp(since)
+            results[(net_value_column, interval)] = rolling.loc[keep, ['SecuCode', 'start_date', 'end_date']
+                                                                + WAREHOUSE_METRICS]
+    return results, last_days
+
+
+def stage_results(results, staging_dir, part):
+    """
+    把一批基金的结果写入暂存目录，全部完成后由 publish_staging 移入仓库。
+    """
+    for (net_value_column, interval), rolling in results.items():
+        if rolling.empty:
+            continue
+        path = partition_path(staging_dir, net_value_column, interval)
+        os.makedirs(path, exist_ok=True)
+        rolling.to_parquet(os.path.join(path, f'part-{part}.parquet'), index=False)
+
+
+def publish_staging(staging_dir, base_dir, run_tag):
+    """
+    将暂存目录中的分片移入仓库对应的分区，文件名加上本次运行的标记。
+    """
+    for root, _, files in os.walk(staging_dir):
+        relative = os.path.relpath(root, staging_dir)
+        for name in files:
+            target_dir = os.path.join(base_dir, relative)
+            os.makedirs(target_dir, exist_ok=True)
+            os.replace(os.path.join(root, name), os.path.join(target_dir, f'{run_tag}-{name}'))
+    shutil.rmtree(staging_dir, ignore_errors=True)
+
+
+def compact_partitions(base_dir):
+    """
+    把每个分区中的多个增量分片合并为一个文件，减少读取时打开的文件数。
+    """
+    for root, _, files in os.walk(base_dir):
+        parts = sorted(name for name in files if name.endswith('.parquet'))
+        if len(parts) <= 1:
+            continue
+        merged = pd.concat([pd.read_parquet(os.path.join(root, name)) for name in parts], ignore_index=True)
+        tmp_path = os.path.join(root, 'compacted.parquet.tmp')
+        merged.to_parquet(tmp_path, index=False)
+        for name in parts:
+            os.remove(os.path.join(root, name))
+        os.replace(tmp_path, os.path.join(root, f'compacted-{datetime.datetime.now():%Y%m%d%H%M%S}.parquet'))
+
+
+def find_base(start_date, end_date, interval, net_value_column, warehouse_dir=None):
+    """
+    找到能覆盖请求的仓库：包含该区间和净值列，基准日不晚于 start_date
+    （BASE_DEPENDENT_COLUMNS 中的净值列要求基准日等于 start_date），有多个时取基准日最晚的一个。
+    返回 (仓库目录, manifest)，没有时返回 (None, None)。
+    """
+    warehouse_dir = warehouse_dir or WAREHOUSE_DIR
+    if not os.path.isdir(warehouse_dir):
+        return None, None
+
+    start_date = pd.Timestamp(start_date)
+    best = (None, None)
+    for name in sorted(os.listdir(warehouse_dir)):
+        if not name.startswith('base='):
+            continue
+        base_dir = os.path.join(warehouse_dir, name)
+        manifest = read_manifest(base_dir)
+        if manifest is None or interval not in manifest['intervals'] \
+                or net_value_column not in manifest['net_value_columns']:
+            continue
+        base_start = pd.Timestamp(manifest['base_start'])
+        if base_start > start_date or (net_value_column in BASE_DEPENDENT_COLUMNS and base_start != start_date):
+            continue
+        best = (base_dir, manifest)
+    return best
+
+
+def read_rolling_metric(secucodes, interval, net_value_column, start_date, end_date, metric,
+                        risk_free_rate=0.0, warehouse_dir=None):
+    """
+    从仓库读取滚动指标，筛选规则与实时计算相同：起始日不早于 start_date，窗口结束日期不晚于 end_date。
+
+    返回:
+    - (DataFrame, 仓库中没有覆盖到 end_date 的基金代码列表)；没有可用的仓库或所有基金都未覆盖时返回 None。
+      基金只有在仓库中已有 end_date 当天（或之后）的净值时才算覆盖，未覆盖的基金由调用方实时计算
+    """
+    base_dir, manifest = find_base(start_date, end_date, interval, net_value_column, warehouse_dir)
+    if base_dir is None:
+        return None
+
+    end_text = f'{pd.Timestamp(end_date):%Y-%m-%d}'
+    covered = [code for code in secucodes if manifest['funds'].get(code, '') >= end_text]
+    if not covered:
+        return None
+    missing = [code for code in secucodes if manifest['funds'].get(code, '') < end_text]
+
+    path = partition_path(base_dir, net_value_column, interval)
+    if not os.path.isdir(path) or not os.listdir(path):
+        return pd.DataFrame(columns=['SecuCode', 'start_date', 'end_date', metric, 'interval']), missing
+
+    rolling = pd.read_parquet(path, filters=[('SecuCode', 'in', covered)])
+    rolling = rolling[(rolling['start_date'] >= pd.Timestamp(start_date))
+                      & (window_end_dates(rolling['start_date'], interval) <= pd.Timestamp(end_date))]
+    if metric == 'annualized_return_rate':
+        # 与 calculate_rolling_returns 的输出列保持一致
+        rolling = rolling[['SecuCode', 'start_date', 'end_date', 'annualized_return_rate']]
+    else:
+        volatility = rolling['annualized_volatility'].where(rolling['annualized_volatility'] > 0)
+        rolling = rolling.assign(sharpe_ratio=(rolling['annualized_return_rate'] - risk_free_rate) / volatility)
+
+    rolling = rolling.sort_values(['SecuCode', 'start_date'], kind='stable').reset_index(drop=True)
+    rolling['interval'] = interval
+    return rolling, missing
@@ -0,0 +1,123 @@
+import pandas as pd
+
+from pages.returns.db_telemetry import connect
+from pages.returns.nav_data import FUND_ROWS_CTE, codes_temp_table, read_query
+from pages.returns.perf import timed
+
+
+# 可以在数据库中计算滚动收益率的净值列
+SQL_NET_VALUE_COLUMNS = ['AdjustedUnitNV', 'UnitNVRestored']
+
+# 各数据库的函数写法：自然对数、日期加月数（月末对齐，与 relativedelta 一致）、两个日期相差的天数
+SQL_DIALECT_FUNCTIONS = {
+    'mssql': {
+        'ln': 'LOG({value})',
+        'add_months': 'DATEADD(month, {months}, {date})',
+        'days_between': 'DATEDIFF(day, {start}, {end})',
+    },
+    'sqlite': {
+        'ln': 'LN({value})',
+        # SQLite 的 '+N months' 在月末会溢出到下个月（1 月 31 日加一个月为 3 月 3 日），按目标月份的最后一天截断
+        'add_months': ("MIN(date({date}, 'start of month', '+{months} months', "
+                       "'+' || (CAST(strftime('%d', {date}) AS INTEGER) - 1) || ' days'), "
+                       "date({date}, 'start of month', '+{next_months} months', '-1 day'))"),
+        'days_between': '(julianday({end}) - julianday({start}))',
+    },
+}
+
+# 在数据库中计算调整后净值和滚动年化收益率，只返回每个窗口的年化收益率。
+# 调整系数 a 为拆分比例的累积乘积，用对数的累积和再取指数计算；b 为前一日的 a 乘以分红的累积和。
+# 窗口结束日为不晚于 起始日 + 区间月数 的最后一个日期：把窗口目标结束日与净值日期合并排序，
+# 目标结束日之前（含同一天）最后一个净值日期即为结束日，与 calculate_rolling_returns 的规则一致。
+# 调整系数用全部行计算（分红、拆分日可能没有净值），窗口只使用净值不为空的行，与 Python 计算的缺失值规则相同
+ROLLING_RETURNS_SQL = '''
+WITH{fund_rows},
+Factors AS (
+    SELECT SecuCode, TradingDay, UnitNV, UnitNVRestored, ActualRatioAfterTax,
+        SUM({ln_split}) OVER (PARTITION BY SecuCode ORDER BY TradingDay ROWS UNBOUNDED PRECEDING) AS log_a,
+        COALESCE(SUM({ln_split}) OVER (PARTITION BY SecuCode ORDER BY TradingDay
+                                       ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING), 0) AS log_a_previous
+    FROM FundRows
+),
+Nav AS (
+    SELECT SecuCode, TradingDay, UnitNVRestored,
+        UnitNV * EXP(log_a) + SUM(EXP(log_a_previous) * COALESCE(ActualRatioAfterTax, 0))
+            OVER (PARTITION BY SecuCode ORDER BY TradingDay ROWS UNBOUNDED PRECEDING) AS AdjustedUnitNV
+    FROM Factors
+),
+NavRows AS (
+    SELECT SecuCode, TradingDay, {column}
+    FROM Nav
+    WHERE {column} IS NOT NULL
+),
+Windows AS (
+    SELECT SecuCode, start_date, start_nv, window_end
+    FROM (
+        SELECT SecuCode, TradingDay AS start_date, {column} AS start_nv, {window_end} AS window_end
+        FROM NavRows
+        WHERE TradingDay >= :start_date
+    ) w
+    WHERE window_end <= :end_date
+),
+Points AS (
+    SELECT SecuCode, TradingDay AS point_date, 0 AS is_window, TradingDay AS start_date FROM NavRows
+    UNION ALL
+    SELECT SecuCode, window_end, 1, start_date FROM Windows
+),
+WindowEnds AS (
+    SELECT SecuCode, start_date, is_window,
+        MAX(CASE WHEN is_window = 0 THEN point_date END)
+            OVER (PARTITION BY SecuCode ORDER BY point_date, is_window ROWS UNBOUNDED PRECEDING) AS end_date
+    FROM Points
+)
+SELECT w.SecuCode, w.start_date, e.end_date,
+    (POWER(CAST(n.{column} AS FLOAT) / w.start_nv, 365.0 / {days}) - 1) * 100 AS annualized_return_rate
+FROM WindowEnds e
+JOIN Windows w ON w.SecuCode = e.SecuCode AND w.start_date = e.start_date
+JOIN NavRows n ON n.SecuCode = e.SecuCode AND n.TradingDay = e.end_date
+WHERE e.is_window = 1 AND e.end_date > w.start_date
+ORDER BY w.SecuCode, w.start_date;
+'''
+
+
+def build_rolling_returns_sql(dialect, codes_table, interval_years, net_value_column):
+    functions = SQL_DIALECT_FUNCTIONS[dialect]
+    months = int(interval_years * 12)
+    return ROLLING_RETURNS_SQL.format(
+        fund_rows=FUND_ROWS_CTE.format(codes_table=codes_table),
+        ln_split=functions['ln'].format(value='COALESCE(SplitRatio, 1.0)'),
+        column=net_value_column,
+        window_end=functions['add_months'].format(date='TradingDay', months=months, next_months=months + 1),
+        days=functions['days_between'].format(start='w.start_date', end='e.end_date'),
+    )
+
+
+def supports_sql_rolling(engine, net_value_column):
+    """
+    数据库和净值列是否支持在数据库中计算滚动收益率。
+    """
+    return engine.dialect.name in SQL_DIALECT_FUNCTIONS and net_value_column in SQL_NET_VALUE_COLUMNS
+
+
+@timed('数据库滚动收益率')
+def fetch_rolling_returns(engine, secucodes, interval_years, net_value_column, start_date, end_date):
+    """
+    在数据库中计算调整后净值和滚动年化收益率，只传回每个窗口一行的结果，不传回每日净值。
+    净值从 start_date 开始查询，调整系数与页面查询一致；结果与 calculate_rolling_returns 相同。
+
+    返回:
+    - DataFrame，包含 'SecuCode'、'start_date'、'end_date'、'annualized_return_rate'、'interval' 列
+    """
+    if net_value_column not in SQL_NET_VALUE_COLUMNS:
+        raise ValueError(f"不支持在数据库中计算的净值列: {net_value_column}")
+
+    params = {'start_date': pd.Timestamp(start_date).strftime('%Y-%m-%d'),
+              'end_date': pd.Timestamp(end_date).strftime('%Y-%m-%d')}
+    with connect(engine) as conn, codes_temp_table(conn, secucodes) as codes_table:
+        sql = build_rolling_returns_sql(engine.dialect.name, codes_table, interval_years, net_value_column)
+        rolling = read_query(conn, sql, params)
+
+    rolling['start_date'] = pd.to_datetime(rolling['start_date'])
+    rolling['end_date'] = pd.to_datetime(rolling['end_date'])
+    rolling['interval'] = interval_years
+    return rolling
@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+
+
+# 模拟净值的默认参数：年化收益率、年化波动率，以及每只基金每年发生分红、拆分的概率
+DEFAULT_ANNUAL_RETURN = 0.06
+DEFAULT_ANNUAL_VOLATILITY = 0.18
+DEFAULT_DIVIDENDS_PER_YEAR = 0.5
+DEFAULT_SPLITS_PER_YEAR = 0.05
+
+# 每次生成的基金数，控制中间矩阵（基金数 × 交易日）的内存占用
+GENERATE_CHUNK_FUNDS = 500
+
+TRADING_DAYS_PER_YEAR = 250
+
+
+def generate_fund_data(n_funds, years, end_date='2024-12-31', seed=0, annual_return=DEFAULT_ANNUAL_RETURN,
+                       annual_volatility=DEFAULT_ANNUAL_VOLATILITY, dividends_per_year=DEFAULT_DIVIDENDS_PER_YEAR,
+                       splits_per_year=DEFAULT_SPLITS_PER_YEAR, first_code=0):
+    """
+    生成与 fetch_fund_data 查询结果结构相同的模拟基金净值数据，用于基准测试，不需要连接数据库。
+
+    每只基金的复权净值按几何布朗运动生成；分红日单位净值减去分红金额，拆分日单位净值除以拆分比例，
+    复权单位净值不受分红、拆分影响。没有分红、拆分的交易日 ActualRatioAfterTax、SplitRatio 为空，与查询结果一致。
+
+    参数:
+    - n_funds: 基金数量
+    - years: 年数，交易日取 end_date 之前 years 年内的工作日
+    - seed: 随机数种子，相同参数生成相同的数据
+    - annual_return / annual_volatility: 年化收益率和年化波动率的均值，每只基金在此附近随机取值
+    - dividends_per_year / splits_per_year: 每只基金每年分红、拆分的期望次数
+    - first_code: 第一只基金的编号，基金代码为六位数字的编号，分批生成时用于避免代码重复
+
+    返回:
+    - DataFrame，包含 'InnerCode'、'SecuCode'、'ChiName'、'TradingDay'、'ActualRatioAfterTax'、
+      'SplitRatio'、'UnitNV'、'UnitNVRestored' 列，按 SecuCode、TradingDay 排序
+    """
+    end_date = pd.Timestamp(end_date)
+    trading_days = pd.bdate_range(end_date - pd.DateOffset(years=years) + pd.Timedelta(days=1), end_date)
+    rng = np.random.default_rng(seed)
+
+    frames = []
+    for first in range(0, n_funds, GENERATE_CHUNK_FUNDS):
+        count = min(GENERATE_CHUNK_FUNDS, n_funds - first)
+        frames.append(generate_chunk(rng, first_code + first, count, trading_days, annual_return, annual_volatility,
+                                     dividends_per_year, splits_per_year))
+    if not frames:
+        return pd.DataFrame(columns=['InnerCode', 'SecuCode', 'ChiName', 'TradingDay', 'ActualRatioAfterTax',
+                                     'SplitRatio', 'UnitNV', 'UnitNVRestored'])
+    return pd.concat(frames, ignore_index=True)
+
+
+def generate_chunk(rng, first, count, trading_days, annual_return, annual_volatility, dividends_per_year,
+                   splits_per_year):
+    n_days = len(trading_days)
+    mu = rng.normal(annual_return, 0.04, size=(count, 1))
+    sigma = np.abs(rng.normal(annual_volatility, 0.06, size=(count, 1))) + 0.01
+
+    # 复权净值（总收益指数），从 1 附近开始
+    log_returns = rng.normal((mu - sigma ** 2 / 2) / TRADING_DAYS_PER_YEAR, sigma / np.sqrt(TRADING_DAYS_PER_YEAR),
+                             size=(count, n_days))
+    log_returns[:, 0] = np.log(rng.uniform(0.9, 1.5, size=count))
+    restored = np.exp(np.cumsum(log_returns, axis=1))
+
+    # 第一天不发生事件，保证每只基金的期初净值有效
+    dividend = rng.random((count, n_days)) < dividends_per_year / TRADING_DAYS_PER_YEAR
+    split = rng.random((count, n_days)) < splits_per_year / TRADING_DAYS_PER_YEAR
+    dividend[:, 0] = False
+    split[:, 0] = False
+
+    # 分红比例（占除息前净值）和拆分比例（每份拆为几份）
+    dividend_fraction = np.where(dividend, rng.uniform(0.01, 0.08, size=(count, n_days)), 0.0)
+    split_ratio = np.where(split, rng.choice([1.5, 2.0, 3.0], size=(count, n_days)), 1.0)
+
+    # 单位净值 = 复权净值 × 事件累积的缩放因子；分红金额按除息前的单位净值计算
+    scale = np.cumprod((1 - dividend_fraction) / split_ratio, axis=1)
+    unit_nv = restored * scale
+    pre_event_nv = unit_nv / (1 - dividend_fraction)
+    dividend_amount = np.where(dividend, pre_event_nv * dividend_fraction, np.nan)
+
+    secucodes = np.array([f'{first + i:06d}' for i in range(count)])
+    return pd.DataFrame({
+        'InnerCode': np.repeat(np.arange(first, first + count) + 100000, n_days),
+        'SecuCode': np.repeat(secucodes, n_days),
+        'ChiName': np.repeat(np.char.add('模拟基金', secucodes), n_days),
+        'TradingDay': np.tile(trading_days.to_numpy(), count),
+        'ActualRatioAfterTax': dividend_amount.round(4).ravel(),
+        'SplitRatio': np.where(split, split_ratio, np.nan).ravel(),
+        'UnitNV': unit_nv.round(4).ravel(),
+        'UnitNVRestored': restored.round(4).ravel(),
+    })
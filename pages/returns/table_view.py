@@ -0,0 +1,101 @@
+import math
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from pages.returns.chart_rendering import cached_build, date_bounds
+
+
+# 每页行数的可选项
+PAGE_SIZES = [50, 100, 500, 1000]
+
+
+def filter_and_sort_positions(data, secucodes, date_column, date_range, sort_column, ascending):
+    """
+    在服务端按基金代码、日期筛选并排序，返回满足条件的行位置数组。
+
+    参数:
+    - data: 需要展示的 DataFrame
+    - secucodes: 需要保留的基金代码，空表示不过滤
+    - date_column: 日期列名，为 None 时不按日期过滤
+    - date_range: (开始日期, 结束日期)，为 None 时不按日期过滤
+    - sort_column: 排序列，为 None 时保持原顺序
+    - ascending: 是否升序
+    """
+    mask = np.ones(len(data), dtype=bool)
+    if secucodes:
+        mask &= data['SecuCode'].isin(secucodes).to_numpy()
+    if date_column is not None and date_range is not None:
+        dates = pd.to_datetime(data[date_column])
+        mask &= ((dates >= pd.Timestamp(date_range[0])) & (dates <= pd.Timestamp(date_range[1]))).to_numpy()
+    positions = np.flatnonzero(mask)
+
+    if sort_column is not None:
+        column = data[sort_column].iloc[positions].reset_index(drop=True)
+        order = column.sort_values(ascending=ascending, kind='stable', na_position='last').index.to_numpy()
+        positions = positions[order]
+
+    return positions
+
+
+def paginated_dataframe(data, key, data_id, date_column=None):
+    """
+    分页展示大表：数据保留在服务端，筛选、排序在服务端完成，浏览器每次只接收当前页的行，
+    渲染时间和传输量与结果总行数无关。
+
+    参数:
+    - data: 需要展示的 DataFrame
+    - key: 控件 key 的前缀，同一页面中需要唯一
+    - data_id: 数据的标识（例如数据指纹加上生成数据的参数），用于缓存筛选排序结果；
+      内容不同的数据必须使用不同的标识，不能用对象 id（对象释放后 id 会被复用）
+    - date_column: 用于按日期筛选的列，为 None 时不显示日期筛选
+    """
+    if data is None or data.empty:
+        st.dataframe(data)
+        return
+
+    col1, col2, col3, col4 = st.columns([3, 3, 2, 1])
+
+    secucodes = []
+    if 'SecuCode' in data.columns:
+        with col1:
+            code_input = st.text_input("筛选基金代码（多个用逗号分隔）", value="", key=f"{key}_codes")
+            secucodes = sorted({code.strip() for code in code_input.split(',') if code.strip()})
+
+    date_range = None
+    min_day = None
+    if date_column is not None:
+        min_day, max_day = cached_build(('table_view_dates', key, data_id), lambda: date_bounds(data[date_column]))
+    if min_day is not None:
+        with col2:
+            selected = st.date_input("筛选日期区间", value=(min_day, max_day), min_value=min_day, max_value=max_day,
+                                     key=f"{key}_dates")
+            if isinstance(selected, (list, tuple)) and len(selected) == 2:
+                date_range = tuple(selected)
+
+    with col3:
+        sort_column = st.selectbox("排序列", ['不排序'] + list(data.columns), key=f"{key}_sort")
+        sort_column = None if sort_column == '不排序' else sort_column
+    with col4:
+        ascending = st.checkbox("升序", value=True, key=f"{key}_ascending")
+
+    positions = cached_build(
+        ('table_view', key, data_id, tuple(secucodes), date_range, sort_column, ascending),
+        lambda: filter_and_sort_positions(data, secucodes, date_column, date_range, sort_column, ascending)
+    )
+
+    page_col, size_col = st.columns([3, 1])
+    with size_col:
+        page_size = st.selectbox("每页行数", PAGE_SIZES, index=1, key=f"{key}_page_size")
+    page_count = max(1, math.ceil(len(positions) / page_size))
+
+    # 筛选条件变化后页数可能变少，超出范围时回到第一页
+    if st.session_state.get(f"{key}_page", 1) > page_count:
+        st.session_state[f"{key}_page"] = 1
+    with page_col:
+        page = st.number_input("页码", min_value=1, max_value=page_count, step=1, key=f"{key}_page")
+
+    start = (page - 1) * page_size
+    st.dataframe(data.iloc[positions[start:start + page_size]], use_container_width=True)
+    st.caption(f"共 {len(positions)} 行，第 {page}/{page_count} 页")
@@ -0,0 +1,176 @@
+"""
+批量生成基金报告，不依赖 Streamlit。每只研究基金生成一个目录，包含报告工作簿（净值、滚动收益率统计、
+同类百分位、区间收益率及 Excel 原生图表）和图表文件。
+
+用法示例:
+    python report_pack.py --codes funds.txt --pool pool.xlsx --start 2020-01-01 --output reports --workers 8
+    python report_pack.py --codes funds.txt --pool 偏股混合 --start 2020-01-01
+
+--pool 可以是基金代码文件，也可以是在收益率分析页面保存的命名对比基金池。
+对比基金池只在主进程中计算一次并缓存到 输出目录/_pool/，各工作进程读取同一份结果，只计算各自的研究基金。
+数据库配置默认读取 .streamlit/secrets.toml 中的 [connections.my_database]。
+"""
+import argparse
+import datetime
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from batch import read_fund_codes
+from pages.returns.comparison_pools import load_pools
+from pages.returns.fund_reports import (REPORT_INTERVALS, REPORT_NET_VALUE_COLUMN, build_fund_report,
+                                        compute_pool_context, pool_cache_key, write_fund_report)
+from pages.returns.indicators import calculate_rolling_returns
+from pages.returns.nav_data import SECRETS_PATH, create_engine_from_config, load_db_config
+from pages.returns.period_returns import PERIOD_FREQUENCIES
+from pages.returns.pipeline import compute_fund_nav
+from pages.returns.sql_rolling import fetch_rolling_returns
+
+
+# 每个工作进程中的数据库引擎和对比基金池结果
+_engine = None
+_pool = None
+
+
+def read_pool_codes(pool):
+    """
+    --pool 为已存在的文件时读取其中的基金代码，否则按命名对比基金池查找。
+    """
+    if os.path.exists(pool):
+        return read_fund_codes(pool)
+    pools = load_pools()
+    if pool not in pools:
+        raise SystemExit(f"找不到基金代码文件或命名对比基金池: {pool}")
+    return pools[pool]['codes']
+
+
+def fetch_rolling(engine, data, secucodes, intervals, net_value_column, start_date, end_date, execution):
+    """
+    各区间的滚动收益率：local 基于已查询的净值在本地计算，database 在数据库中计算。
+    """
+    if execution == 'database':
+        return {interval: fetch_rolling_returns(engine, secucodes, interval, net_value_column, start_date, end_date)
+                for interval in intervals}
+    return {interval: calculate_rolling_returns(data, interval, net_value_column, start_date, end_date)
+            for interval in intervals}
+
+
+def prepare_pool(engine, pool_codes, start_date, end_date, intervals, net_value_column, frequency, execution,
+                 output_dir):
+    """
+    计算对比基金池的结果并缓存到 output_dir/_pool/，参数相同的再次运行直接读取缓存。
+
+    返回:
+    - 缓存文件路径
+    """
+    cache_dir = os.path.join(output_dir, '_pool')
+    os.makedirs(cache_dir, exist_ok=True)
+    key = pool_cache_key(pool_codes, start_date, end_date, intervals, net_value_column, frequency)
+    path = os.path.join(cache_dir, f'{key}.pkl')
+    if os.path.exists(path):
+        print(f"使用已缓存的对比基金池结果: {path}")
+        return path
+
+    pool_nav = compute_fund_nav(engine, pool_codes, start_date, end_date)
+    pool_rolling = fetch_rolling(engine, pool_nav, pool_codes, intervals, net_value_column, start_date, end_date,
+                                 execution)
+    pd.to_pickle(compute_pool_context(pool_nav, pool_rolling, net_value_column, frequency, start_date, end_date),
+                 path)
+    return path
+
+
+def init_worker(db_config, pool_path):
+    global _engine, _pool
+    _engine = create_engine_from_config(db_config)
+    _pool = pd.read_pickle(pool_path)
+
+
+def run_fund(secucode, start_date, end_date, execution, output_dir):
+    """
+    生成一只基金的报告，返回 (基金名称, 报告目录)。没有净值数据时抛出 ValueError。
+    """
+    fund_nav = compute_fund_nav(_engine, [secucode], start_date, end_date)
+    if fund_nav.empty:
+        raise ValueError("所选日期区间内没有净值数据")
+    fund_rolling = None
+    if execution == 'database':
+        fund_rolling = fetch_rolling(_engine, fund_nav, [secucode], _pool['rolling'], _pool['net_value_column'],
+                                     start_date, end_date, execution)
+    report = build_fund_report(fund_nav, _pool, start_date, end_date, fund_rolling)
+    return report['name'], write_fund_report(report, output_dir)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="批量生成基金报告")
+    parser.add_argument('--codes', required=True, help="研究基金代码文件（txt / csv / xlsx）")
+    parser.add_argument('--pool', required=True, help="对比基金池：基金代码文件或命名对比基金池的名称")
+    parser.add_argument('--start', required=True, type=datetime.date.fromisoformat, help="开始日期 YYYY-MM-DD")
+    parser.add_argument('--end', type=datetime.date.fromisoformat, default=datetime.date.today(),
+                        help="结束日期 YYYY-MM-DD，默认为今天")
+    parser.add_argument('--intervals', default=','.join(str(interval) for interval in REPORT_INTERVALS),
+                        help="滚动区间（年），逗号分隔")
+    parser.add_argument('--column', choices=['AdjustedUnitNV', 'UnitNVRestored'], default=REPORT_NET_VALUE_COLUMN,
+                        help="计算滚动收益率和区间收益率使用的净值列")
+    parser.add_argument('--period', choices=sorted(PERIOD_FREQUENCIES.values()), default='Y',
+                        help="区间收益率频率：Y 年度，Q 季度，M 月度")
+    parser.add_argument('--execution', choices=['local', 'database'], default='local',
+                        help="滚动收益率的计算位置：local 本地计算；database 在数据库中计算")
+    parser.add_argument('--output', default='reports', help="输出目录")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="并行进程数")
+    parser.add_argument('--secrets', default=SECRETS_PATH, help="数据库配置文件")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    secucodes = read_fund_codes(args.codes)
+    pool_codes = list(dict.fromkeys(read_pool_codes(args.pool)))
+    intervals = [float(interval) for interval in args.intervals.split(',') if interval.strip()]
+    os.makedirs(args.output, exist_ok=True)
+    db_config = dict(load_db_config(args.secrets))
+
+    start_time = time.perf_counter()
+    print(f"计算对比基金池（{len(pool_codes)} 只基金）")
+    pool_path = prepare_pool(create_engine_from_config(db_config), pool_codes, args.start, args.end, intervals,
+                             args.column, args.period, args.execution, args.output)
+    print(f"对比基金池完成，已用时 {time.perf_counter() - start_time:.1f} 秒；"
+          f"生成 {len(secucodes)} 份报告，{args.workers} 个进程")
+
+    task_args = (args.start, args.end, args.execution, args.output)
+    index = []
+
+    def collect(secucode, run):
+        try:
+            name, fund_dir = run()
+            index.append({'SecuCode': secucode, 'ChiName': name, 'status': 'ok', 'path': fund_dir, 'error': None})
+            print(f"[{len(index)}/{len(secucodes)}] {secucode} 完成")
+        except Exception as e:
+            index.append({'SecuCode': secucode, 'ChiName': None, 'status': 'error', 'path': None, 'error': str(e)})
+            print(f"[{len(index)}/{len(secucodes)}] {secucode} 出错: {e}")
+
+    if args.workers <= 1:
+        init_worker(db_config, pool_path)
+        for secucode in secucodes:
+            collect(secucode, lambda: run_fund(secucode, *task_args))
+    else:
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker,
+                                 initargs=(db_config, pool_path)) as pool:
+            futures = {pool.submit(run_fund, secucode, *task_args): secucode for secucode in secucodes}
+            for future in as_completed(futures):
+                collect(futures[future], future.result)
+
+    index_df = pd.DataFrame(index, columns=['SecuCode', 'ChiName', 'status', 'path', 'error'])
+    index_df.to_csv(os.path.join(args.output, 'index.csv'), index=False, encoding='utf-8-sig')
+
+    failed = index_df[index_df['status'] != 'ok']
+    print(f"全部完成，用时 {time.perf_counter() - start_time:.1f} 秒，报告保存在 {args.output}")
+    if not failed.empty:
+        print(f"{len(failed)} 只基金出错: {','.join(failed['SecuCode'])}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
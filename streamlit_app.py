@@ -94,11 +94,26 @@
 # else:
 #     st.write("请选择一个页面。")
 
+import datetime
+import time
+
+script_start = time.perf_counter()
+
 import streamlit as st
 import streamlit_antd_components as sac
-from menu import run_menu
+from menu import run_menu, show_startup_report
+from pages.returns.perf import collect_spans
+from pages.returns.perf_panel import record_spans, show_perf_panel
 
 
+# 每天第一次运行时在后台预热使用最多的命名对比基金池
+# 预热模块在这里才导入，应用脚本顶层只导入渲染菜单所需的模块
+try:
+    from pages.returns.pool_preload import start_daily_preload
+    start_daily_preload(datetime.date.today())
+except Exception as e:
+    print(f"启动对比基金池预热时出错: {e}")
+
 # 获取当前查询参数
 selected_page = st.query_params.get("page", "Home")
 
@@ -118,5 +133,11 @@ with st.sidebar:
 if selected_menu_item:
     st.session_state['selected_page'] = selected_menu_item
 
-# 根据选择的菜单项显示相应页面
-run_menu(st.session_state['selected_page'])
+# 根据选择的菜单项显示相应页面，记录本次运行中各阶段的耗时
+with collect_spans() as spans:
+    run_menu(st.session_state['selected_page'])
+record_spans(f"页面：{st.session_state['selected_page']}", spans)
+show_perf_panel()
+
+# 启动耗时报告
+show_startup_report(time.perf_counter() - script_start)
@@ -0,0 +1,76 @@
+import os
+import sqlite3
+import sys
+
+import pandas as pd
+import pytest
+
+# 测试直接导入仓库根目录下的模块（pages.returns.*）
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pages.returns.fixture_db import create_fixture_database  # noqa: E402
+from pages.returns.nav_data import (calculate_adjusted_unitnv, calculate_adjustment_coefficients,  # noqa: E402
+                                    create_engine_from_config, fetch_fund_data)
+from pages.returns.synthetic_data import generate_fund_data  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def fund_nav():
+    """
+    6 只模拟基金 3 年的调整后净值，包含分红、拆分日；另加几行净值缺失的记录，与查询结果中
+    只有分红、拆分记录的日期一致。
+    """
+    data = generate_fund_data(6, 3, seed=7, dividends_per_year=2, splits_per_year=0.5)
+    data = calculate_adjusted_unitnv(calculate_adjustment_coefficients(data))
+    rows = data.groupby('SecuCode').nth([30, 200]).index
+    data.loc[rows, ['UnitNV', 'AdjustedUnitNV', 'UnitNVRestored']] = float('nan')
+    return data.reset_index(drop=True)
+
+
+# SQLite 测试库的基金数、年数和查询区间
+FIXTURE_FUNDS = 8
+FIXTURE_YEARS = 4
+FIXTURE_START = pd.Timestamp('2021-06-01')
+FIXTURE_END = pd.Timestamp('2024-12-31')
+
+
+@pytest.fixture(scope='session')
+def fixture_db(tmp_path_factory):
+    """
+    fixture_db 生成的 SQLite 数据库文件路径。分红日的净值记录被删除，
+    查询结果中会出现只有分红记录、净值为空的行，与生产库中的情况一致。
+    """
+    path = str(tmp_path_factory.mktemp('fixture_db') / 'funds.db')
+    create_fixture_database(path, FIXTURE_FUNDS, FIXTURE_YEARS, end_date=FIXTURE_END, seed=3)
+    with sqlite3.connect(path) as conn:
+        for table in ['MF_NetValuePerformanceHis', 'MF_FundNetValueRe']:
+            conn.execute(f'DELETE FROM {table} WHERE (InnerCode, TradingDay) IN '
+                         f'(SELECT InnerCode, ExRightDate FROM MF_Dividend)')
+    return path
+
+
+@pytest.fixture(scope='session')
+def fixture_dates():
+    """
+    查询测试库使用的 (开始日期, 结束日期)。
+    """
+    return FIXTURE_START, FIXTURE_END
+
+
+@pytest.fixture(scope='session')
+def fixture_engine(fixture_db):
+    return create_engine_from_config({'dialect': 'sqlite', 'database': fixture_db})
+
+
+@pytest.fixture(scope='session')
+def fixture_codes(fixture_engine):
+    return pd.read_sql('SELECT SecuCode FROM SecuMain ORDER BY SecuCode', fixture_engine)['SecuCode'].tolist()
+
+
+@pytest.fixture(scope='session')
+def fixture_nav(fixture_engine, fixture_codes):
+    """
+    从 SQLite 测试库查询的调整后净值，与页面查询的结果相同。
+    """
+    data = fetch_fund_data(fixture_engine, fixture_codes, FIXTURE_START, FIXTURE_END)
+    return calculate_adjusted_unitnv(calculate_adjustment_coefficients(data))
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pages.returns.chart_rendering import downsample_series, lttb_indices
+
+
+def lttb_by_bucket(x, y, threshold):
+    """
+    按原始描述逐桶计算的 LTTB 对照实现。
+    """
+    n = len(y)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    buckets = list(zip(edges[:-1], edges[1:]))
+    selected = [0]
+    for i, (start, end) in enumerate(buckets):
+        if i + 1 < len(buckets):
+            next_start, next_end = buckets[i + 1]
+            next_x, next_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+        anchor = selected[-1]
+        areas = [abs((x[anchor] - next_x) * (y[j] - y[anchor]) - (x[anchor] - x[j]) * (next_y - y[anchor]))
+                 for j in range(start, end)]
+        selected.append(start + int(np.argmax(areas)))
+    selected.append(n - 1)
+    return np.array(selected)
+
+
+@pytest.mark.parametrize('n, threshold', [(1000, 100), (1001, 37), (5000, 1200), (50, 3)])
+def test_lttb_matches_bucket_by_bucket(n, threshold):
+    rng = np.random.default_rng(n)
+    x = np.sort(rng.uniform(0, 1000, n))
+    y = np.cumsum(rng.normal(0, 1, n))
+    result = lttb_indices(x, y, threshold)
+
+    assert len(result) == threshold
+    assert result[0] == 0 and result[-1] == n - 1
+    assert (np.diff(result) > 0).all()
+    np.testing.assert_array_equal(result, lttb_by_bucket(x, y, threshold))
+
+
+def test_lttb_keeps_short_series():
+    np.testing.assert_array_equal(lttb_indices(np.arange(10), np.arange(10), 20), np.arange(10))
+
+
+def test_downsample_series_drops_missing_and_keeps_ends():
+    dates = pd.bdate_range('2020-01-01', periods=3000)
+    values = pd.Series(np.sin(np.arange(3000) / 50.0))
+    values[[0, 1500, 2999]] = np.nan
+    values[777] = 5.0
+    x, y = downsample_series(dates, values, max_points=200)
+
+    assert len(x) == len(y) == 200
+    assert x[0] == dates[1] and x[-1] == dates[2998]
+    assert not np.isnan(y).any()
+    # 尖峰被保留
+    assert dates[777] in x and y.max() == 5.0
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pages.returns.indicators import (calculate_grouped_statistics, calculate_moments, calculate_peer_percentiles,
+                                      calculate_pool_statistics, calculate_rolling_returns, calculate_statistics)
+
+
+@pytest.fixture(scope='module')
+def rolling(fixture_nav, fixture_dates):
+    start_date, end_date = fixture_dates
+    return calculate_rolling_returns(fixture_nav, 0.5, 'AdjustedUnitNV', start_date, end_date)
+
+
+def test_grouped_statistics_match_scipy(rolling):
+    returns = rolling['annualized_return_rate']
+    result = calculate_grouped_statistics(returns, rolling['SecuCode'])
+
+    assert list(result.index) == list(rolling['SecuCode'].unique())
+    for secu_code, fund_returns in returns.groupby(rolling['SecuCode']):
+        expected = calculate_statistics(fund_returns)
+        np.testing.assert_allclose(result.loc[secu_code, list(expected)].to_numpy(dtype=float),
+                                   np.array(list(expected.values()), dtype=float), rtol=1e-9)
+
+
+def test_pool_statistics_match_scipy(rolling):
+    returns = rolling['annualized_return_rate']
+    moments = [calculate_moments(fund_returns) for _, fund_returns in returns.groupby(rolling['SecuCode'])]
+    result = calculate_pool_statistics(moments, returns)
+    expected = calculate_statistics(returns)
+
+    assert list(result) == list(expected)
+    np.testing.assert_allclose(list(result.values()), list(expected.values()), rtol=1e-9)
+
+
+def test_peer_percentiles_match_numpy(rolling):
+    codes = rolling['SecuCode'].unique()
+    research = rolling[rolling['SecuCode'].isin(codes[:2])]
+    pool = rolling[~rolling['SecuCode'].isin(codes[:2])]
+    bands = (5, 25, 50, 75, 95)
+    band_df, rank_df = calculate_peer_percentiles(research, pool, bands)
+
+    assert list(band_df.index) == sorted(pool['start_date'].unique())
+    for start_date, peers in pool.groupby('start_date'):
+        values = peers['annualized_return_rate'].to_numpy()
+        np.testing.assert_allclose(band_df.loc[start_date].to_numpy(), np.percentile(values, bands), rtol=1e-12)
+        for _, row in research[research['start_date'] == start_date].iterrows():
+            value = row['annualized_return_rate']
+            expected = ((values < value).sum() + 0.5 * (values == value).sum()) / len(values) * 100
+            assert rank_df.loc[start_date, row['SecuCode']] == pytest.approx(expected)
+
+    # 研究基金没有对应窗口的日期排名为 NaN
+    missing = pd.Index(band_df.index).difference(research.loc[research['SecuCode'] == codes[0], 'start_date'])
+    assert rank_df.loc[missing, codes[0]].isna().all()
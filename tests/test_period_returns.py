@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pages.returns.nav_matrix import NavMatrix, build_nav_matrix
+from pages.returns.period_returns import calculate_period_returns, calculate_ytd_returns
+
+
+@pytest.fixture(scope='module')
+def matrix(fixture_nav, tmp_path_factory):
+    """
+    测试库的净值矩阵；第一只基金前 300 个交易日的净值去掉，模拟查询期间内成立的基金。
+    """
+    built = build_nav_matrix(fixture_nav, 'AdjustedUnitNV', base_dir=str(tmp_path_factory.mktemp('nav_matrix')))
+    values = np.array(built.values)
+    values[0, :300] = np.nan
+    return NavMatrix(values, built.secucodes, built.trading_days, built.path)
+
+
+def fund_series(matrix, row):
+    return pd.Series(np.asarray(matrix.values[row], dtype=float), index=matrix.trading_days).dropna()
+
+
+@pytest.mark.parametrize('frequency', ['Y', 'Q', 'M'])
+def test_period_returns_match_per_fund(matrix, fixture_dates, frequency):
+    start_date, end_date = fixture_dates
+    result = calculate_period_returns(matrix, start_date, end_date, frequency)
+    periods = matrix.trading_days.to_period(frequency).unique()
+
+    assert result.shape == (len(matrix.secucodes), len(periods))
+    # 查询从 2021-06-01 开始，第一个年度、季度只覆盖了一部分；6 月是完整的月份
+    assert result.columns[0] == ('2021-06' if frequency == 'M' else f'{periods[0]}（部分：2021-06-01 起）')
+    for row, secu_code in enumerate(matrix.secucodes):
+        nav = fund_series(matrix, row)
+        for column, period in zip(result.columns, periods):
+            in_period = nav[nav.index.to_period(frequency) == period]
+            before = nav[nav.index < in_period.index[0]] if len(in_period) else nav.iloc[:0]
+            if in_period.empty:
+                expected = np.nan
+            else:
+                base = before.iloc[-1] if len(before) else in_period.iloc[0]
+                expected = (in_period.iloc[-1] / base - 1) * 100
+            np.testing.assert_allclose(result.loc[secu_code, column], expected, rtol=1e-12, equal_nan=True)
+
+    # 成立前的区间为 NaN
+    assert result.iloc[0].isna().any() and result.iloc[1:].notna().all().all()
+
+
+@pytest.mark.parametrize('end_date', ['2024-06-30', '2024-12-31', '2022-03-15'])
+def test_ytd_returns_match_per_fund(matrix, end_date):
+    end_date = pd.Timestamp(end_date)
+    result = calculate_ytd_returns(matrix, end_date)
+
+    for row, secu_code in enumerate(matrix.secucodes):
+        nav = fund_series(matrix, row)
+        this_year = nav[(nav.index.year == end_date.year) & (nav.index <= end_date)]
+        before = nav[nav.index.year < end_date.year]
+        if this_year.empty:
+            expected = np.nan
+        else:
+            base = before.iloc[-1] if len(before) else this_year.iloc[0]
+            expected = (this_year.iloc[-1] / base - 1) * 100
+        np.testing.assert_allclose(result[secu_code], expected, rtol=1e-12, equal_nan=True)
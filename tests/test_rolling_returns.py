@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import pytest
+from dateutil.relativedelta import relativedelta
+
+from pages.returns.indicators import calculate_rolling_returns
+from pages.returns.rolling_risk import calculate_rolling_risk_metrics
+
+
+def rolling_returns_by_window(data, interval_years, net_value_column, start_date, end_date):
+    """
+    逐窗口筛选的对照实现（O(n²)）：每个起始日重新筛选一次该基金不晚于目标结束日期的数据。
+    净值缺失的行不参与计算。
+    """
+    start_date = pd.to_datetime(start_date)
+    end_date = pd.to_datetime(end_date)
+    data = data.dropna(subset=[net_value_column])
+    results = []
+    for secu_code in data['SecuCode'].unique():
+        fund_data = data[data['SecuCode'] == secu_code].sort_values('TradingDay')
+        for start_window in fund_data['TradingDay']:
+            if start_window < start_date:
+                continue
+            end_window = start_window + relativedelta(months=int(interval_years * 12))
+            if end_window > end_date:
+                break
+            end_data = fund_data[fund_data['TradingDay'] <= end_window]
+            if len(end_data) <= 1:
+                continue
+            days_diff = (end_data['TradingDay'].values[-1] - start_window).days
+            if days_diff == 0:
+                continue
+            start_nv = fund_data.loc[fund_data['TradingDay'] == start_window, net_value_column].values[0]
+            end_nv = end_data[net_value_column].values[-1]
+            results.append({
+                'SecuCode': secu_code,
+                'start_date': start_window,
+                'end_date': end_data['TradingDay'].values[-1],
+                'annualized_return_rate': ((end_nv / start_nv) ** (365 / days_diff) - 1) * 100,
+                'interval': interval_years,
+            })
+    return pd.DataFrame(results)
+
+
+@pytest.mark.parametrize('interval', [0.5, 1, 2])
+@pytest.mark.parametrize('column', ['AdjustedUnitNV', 'UnitNVRestored'])
+def test_matches_window_by_window(fund_nav, interval, column):
+    start_date, end_date = fund_nav['TradingDay'].min() + pd.Timedelta(days=10), fund_nav['TradingDay'].max()
+    expected = rolling_returns_by_window(fund_nav, interval, column, start_date, end_date)
+    result = calculate_rolling_returns(fund_nav, interval, column, start_date, end_date)
+
+    assert len(result) == len(expected) > 0
+    for name in ['SecuCode', 'start_date', 'end_date']:
+        assert (result[name].to_numpy() == expected[name].to_numpy()).all()
+    np.testing.assert_allclose(result['annualized_return_rate'], expected['annualized_return_rate'],
+                               rtol=1e-10, atol=1e-9, equal_nan=True)
+    # 净值缺失的日期既不作为起始日也不作为结束日
+    assert result['annualized_return_rate'].notna().all()
+    missing = fund_nav.loc[fund_nav[column].isna(), ['SecuCode', 'TradingDay']]
+    for name in ['start_date', 'end_date']:
+        assert not result.merge(missing, left_on=['SecuCode', name], right_on=['SecuCode', 'TradingDay']).shape[0]
+
+
+@pytest.mark.parametrize('column', ['AdjustedUnitNV', 'UnitNVRestored'])
+def test_matches_rolling_risk_returns(fund_nav, column):
+    start_date, end_date = fund_nav['TradingDay'].min(), fund_nav['TradingDay'].max()
+    result = calculate_rolling_returns(fund_nav, 1, column, start_date, end_date)
+    risk = calculate_rolling_risk_metrics(fund_nav, 1, column, start_date, end_date)
+
+    result = result.sort_values(['SecuCode', 'start_date'], ignore_index=True)
+    assert len(result) == len(risk) > 0
+    for name in ['SecuCode', 'start_date', 'end_date']:
+        assert (result[name].to_numpy() == risk[name].to_numpy()).all()
+    np.testing.assert_allclose(result['annualized_return_rate'], risk['annualized_return_rate'], rtol=1e-12)
+
+
+def test_no_full_window_returns_empty(fund_nav):
+    first_day = fund_nav['TradingDay'].min()
+    assert calculate_rolling_returns(fund_nav, 5, 'AdjustedUnitNV', first_day, fund_nav['TradingDay'].max()).empty
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from pages.returns.rolling_risk import calculate_rolling_risk_metrics, rolling_max_drawdown, rolling_window_ends
+
+
+def max_drawdown_by_window(log_nav, ends):
+    """
+    逐窗口计算最大回撤的对照实现（O(n²)）。
+    """
+    result = np.empty(len(log_nav))
+    for start, end in enumerate(ends):
+        window = log_nav[start:end + 1]
+        result[start] = (np.maximum.accumulate(window) - window).max()
+    return result
+
+
+@pytest.mark.parametrize('interval', [0.5, 1, 2])
+def test_max_drawdown_matches_window_by_window(fixture_nav, interval):
+    for _, fund_data in fixture_nav.dropna(subset=['AdjustedUnitNV']).groupby('SecuCode'):
+        log_nav = np.log(fund_data['AdjustedUnitNV'].to_numpy())
+        ends, _ = rolling_window_ends(fund_data['TradingDay'].values, interval)
+        np.testing.assert_allclose(rolling_max_drawdown(log_nav, ends), max_drawdown_by_window(log_nav, ends),
+                                   rtol=1e-12, atol=1e-15)
+
+
+def test_max_drawdown_random_windows():
+    # 随机的单调不减结束位置，覆盖分段点落在各种位置的情况
+    rng = np.random.default_rng(0)
+    for _ in range(20):
+        n = int(rng.integers(1, 300))
+        log_nav = np.cumsum(rng.normal(0, 0.02, n))
+        ends = np.maximum.accumulate(np.minimum(np.arange(n) + rng.integers(0, 40, n), n - 1))
+        np.testing.assert_allclose(rolling_max_drawdown(log_nav, ends), max_drawdown_by_window(log_nav, ends),
+                                   rtol=1e-12, atol=1e-15)
+
+
+def test_risk_metrics_match_window_by_window(fixture_nav, fixture_dates):
+    start_date, end_date = fixture_dates
+    result = calculate_rolling_risk_metrics(fixture_nav, 1, 'UnitNVRestored', start_date, end_date, risk_free_rate=2)
+    data = fixture_nav.dropna(subset=['UnitNVRestored']).set_index(['SecuCode', 'TradingDay'])['UnitNVRestored']
+
+    assert len(result) > 0
+    for row in result.iloc[::97].itertuples():
+        nav = data.loc[row.SecuCode].loc[row.start_date:row.end_date].to_numpy()
+        days = (row.end_date - row.start_date).days
+        annualized_return = (nav[-1] / nav[0]) ** (365 / days) - 1
+        log_returns = np.diff(np.log(nav))
+        volatility = log_returns.std(ddof=1) * np.sqrt(len(log_returns) * 365 / days)
+        drawdown = (1 - nav / np.maximum.accumulate(nav)).max()
+
+        assert row.annualized_return_rate == pytest.approx(annualized_return * 100, rel=1e-10)
+        assert row.annualized_volatility == pytest.approx(volatility * 100, rel=1e-8)
+        assert row.max_drawdown == pytest.approx(drawdown * 100, rel=1e-10)
+        assert row.calmar_ratio == pytest.approx(annualized_return / drawdown, rel=1e-8)
+        assert row.sharpe_ratio == pytest.approx((annualized_return - 0.02) / volatility, rel=1e-8)
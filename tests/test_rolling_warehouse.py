@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import warehouse
+from pages.returns.indicators import calculate_rolling_metric
+from pages.returns.rolling_warehouse import read_rolling_metric
+
+INTERVALS = [0.5, 1]
+COLUMNS = ['AdjustedUnitNV', 'UnitNVRestored']
+
+
+def run_warehouse(secrets, warehouse_dir, base_start, end_date, *extra):
+    argv = ['--secrets', str(secrets), '--warehouse-dir', str(warehouse_dir), '--workers', '1',
+            '--base-start', f'{base_start:%Y-%m-%d}', '--end', f'{end_date:%Y-%m-%d}',
+            '--intervals', ','.join(str(interval) for interval in INTERVALS), '--columns', ','.join(COLUMNS)]
+    assert warehouse.main(argv + list(extra)) == 0
+
+
+@pytest.fixture(scope='module')
+def warehouses(fixture_db, fixture_dates, tmp_path_factory):
+    """
+    同一个测试库建两个仓库：一个先算到年中再增量更新到结束日期，一个直接全量计算。
+    """
+    start_date, end_date = fixture_dates
+    root = tmp_path_factory.mktemp('warehouse')
+    secrets = root / 'secrets.toml'
+    secrets.write_text(f'[connections.my_database]\ndialect = "sqlite"\ndatabase = "{fixture_db}"\n',
+                       encoding='utf-8')
+
+    incremental, full = root / 'incremental', root / 'full'
+    run_warehouse(secrets, incremental, start_date, end_date - pd.DateOffset(months=5))
+    run_warehouse(secrets, incremental, start_date, end_date)
+    run_warehouse(secrets, full, start_date, end_date, '--full')
+    return incremental, full
+
+
+@pytest.mark.parametrize('interval', INTERVALS)
+@pytest.mark.parametrize('column', COLUMNS)
+@pytest.mark.parametrize('metric', ['annualized_return_rate', 'max_drawdown', 'sharpe_ratio'])
+def test_matches_live(warehouses, fixture_codes, fixture_nav, fixture_dates, interval, column, metric):
+    start_date, end_date = fixture_dates
+    live = calculate_rolling_metric(fixture_nav, interval, column, start_date, end_date, metric, risk_free_rate=1.5)
+    live = live.sort_values(['SecuCode', 'start_date'], ignore_index=True)
+
+    for warehouse_dir in warehouses:
+        stored, missing = read_rolling_metric(fixture_codes, interval, column, start_date, end_date, metric,
+                                              risk_free_rate=1.5, warehouse_dir=str(warehouse_dir))
+        assert missing == []
+        assert len(stored) == len(live) > 0
+        for name in ['SecuCode', 'start_date', 'end_date']:
+            assert (stored[name].to_numpy() == live[name].to_numpy()).all()
+        np.testing.assert_allclose(stored[metric], live[metric], rtol=1e-10, atol=1e-9, equal_nan=True)
@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from pages.returns.indicators import calculate_rolling_returns
+from pages.returns.sql_rolling import build_rolling_returns_sql, fetch_rolling_returns, supports_sql_rolling
+
+
+@pytest.mark.parametrize('interval', [0.5, 1, 2])
+@pytest.mark.parametrize('column', ['AdjustedUnitNV', 'UnitNVRestored'])
+def test_matches_calculate_rolling_returns(fixture_engine, fixture_codes, fixture_nav, fixture_dates,
+                                          interval, column):
+    start_date, end_date = fixture_dates
+    assert supports_sql_rolling(fixture_engine, column)
+    # 测试库中有净值为空的分红日，两种计算都不使用这些行
+    assert fixture_nav[column].isna().any()
+    expected = calculate_rolling_returns(fixture_nav, interval, column, start_date, end_date)
+    result = fetch_rolling_returns(fixture_engine, fixture_codes, interval, column, start_date, end_date)
+
+    expected = expected.sort_values(['SecuCode', 'start_date'], ignore_index=True)
+    result = result.sort_values(['SecuCode', 'start_date'], ignore_index=True)
+    assert len(result) == len(expected) > 0
+    for name in ['SecuCode', 'start_date', 'end_date']:
+        assert (result[name].to_numpy() == expected[name].to_numpy()).all()
+    np.testing.assert_allclose(result['annualized_return_rate'], expected['annualized_return_rate'],
+                               rtol=1e-10, atol=1e-9)
+    assert (result['interval'] == interval).all()
+
+
+def test_mssql_uses_mssql_functions():
+    # 测试环境没有 SQL Server，只检查生成的语句使用了 SQL Server 的函数和临时表
+    sql = build_rolling_returns_sql('mssql', '#MainCodes', 1, 'AdjustedUnitNV')
+    for text in ['LOG(COALESCE(SplitRatio, 1.0))', 'DATEADD(month, 12, TradingDay)',
+                 'DATEDIFF(day, w.start_date, e.end_date)', 'JOIN #MainCodes mc']:
+        assert text in sql
+    for text in ['LN(', 'julianday', 'strftime', '{', '}']:
+        assert text not in sql
@@ -0,0 +1,162 @@
+"""
+滚动指标仓库的物化任务，不依赖 Streamlit，适合每晚由 cron 运行。
+
+为全部 SecuCategory = 8 的基金计算标准区间（0.5/1/2/3/5 年）、两种净值列的滚动指标，
+按 净值列 / 区间 分区保存为 Parquet。再次运行时只计算新交易日带来的新窗口和新增的基金。
+
+用法示例:
+    python warehouse.py --base-start 2023-01-01 --base-start 2020-01-01 --workers 8
+    python warehouse.py --base-start 2023-01-01 --full --compact
+"""
+import argparse
+import datetime
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from pages.returns.nav_data import SECRETS_PATH, create_engine_from_config, fetch_fund_universe, load_db_config
+from pages.returns.pipeline import DEFAULT_INTERVALS, DEFAULT_NET_VALUE_COLUMNS
+from pages.returns.rolling_warehouse import (WAREHOUSE_DIR, base_path, compact_partitions, materialize_funds,
+                                             publish_staging, read_manifest, stage_results, write_manifest)
+
+
+# 每个工作进程中的数据库引擎
+_engine = None
+
+
+def init_worker(db_config):
+    global _engine
+    _engine = create_engine_from_config(db_config)
+
+
+def run_chunk(secucodes, base_start, since, end_date, intervals, net_value_columns):
+    return materialize_funds(_engine, secucodes, base_start, since, end_date, intervals, net_value_columns)
+
+
+def plan_chunks(universe, manifest, end_date, chunk_size, full):
+    """
+    按上次计算到的交易日把基金分组：新基金（或 --full）从头计算，已有基金只计算 since 之后的新窗口，
+    已经有 end_date 当天净值的基金跳过。
+    """
+    groups = {}
+    end_text = f'{end_date:%Y-%m-%d}'
+    for code in universe:
+        since = None if full or manifest is None else manifest['funds'].get(code)
+        if since is not None and since >= end_text:
+            continue
+        groups.setdefault(since, []).append(code)
+
+    return [(codes[i:i + chunk_size], since)
+            for since, codes in groups.items() for i in range(0, len(codes), chunk_size)]
+
+
+def materialize_base(args, db_config, universe, base_start):
+    base_dir = base_path(base_start, args.warehouse_dir)
+    manifest = None if args.full else read_manifest(base_dir)
+    if manifest is not None and (manifest['intervals'] != args.intervals
+                                 or manifest['net_value_columns'] != args.columns):
+        print(f"{base_dir}: 区间或净值列与已有仓库不同，改为全量重建")
+        manifest = None
+    if manifest is None and os.path.isdir(base_dir):
+        # 全量重建前清空旧数据，先删除 manifest，重建期间页面会回退到实时计算
+        for name in os.listdir(base_dir):
+            if name == 'manifest.json':
+                os.remove(os.path.join(base_dir, name))
+            elif name.startswith('net_value_column='):
+                shutil.rmtree(os.path.join(base_dir, name))
+
+    chunks = plan_chunks(universe, manifest, args.end, args.chunk_size, manifest is None)
+    print(f"{base_dir}: {sum(len(codes) for codes, _ in chunks)} 只基金需要更新，共 {len(chunks)} 批")
+
+    # 分片文件名以运行标记开头，精确到微秒，同一秒内的两次运行不会覆盖彼此的分片
+    run_tag = datetime.datetime.now().strftime('%Y%m%d%H%M%S%f')
+    staging_dir = os.path.join(base_dir, f'.staging-{run_tag}')
+    funds = dict(manifest['funds']) if manifest is not None else {}
+    start_time = time.perf_counter()
+    failed = []
+
+    def collect(part, result):
+        results, last_days = result
+        stage_results(results, staging_dir, f'{part:05d}')
+        # 记录每只基金实际入库的最后一个交易日，净值尚未到齐的基金下次运行时继续增量更新
+        funds.update(last_days)
+        print(f"[{part + 1}/{len(chunks)}] 完成，已用时 {time.perf_counter() - start_time:.1f} 秒")
+
+    task_args = (args.end, args.intervals, args.columns)
+    if args.workers <= 1:
+        init_worker(db_config)
+        for part, (codes, since) in enumerate(chunks):
+            try:
+                collect(part, run_chunk(codes, base_start, since, *task_args))
+            except Exception as e:
+                failed.append(part)
+                print(f"[{part + 1}/{len(chunks)}] 出错: {e}")
+    else:
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker, initargs=(db_config,)) as pool:
+            futures = {pool.submit(run_chunk, codes, base_start, since, *task_args): part
+                       for part, (codes, since) in enumerate(chunks)}
+            for future in as_completed(futures):
+                part = futures[future]
+                try:
+                    collect(part, future.result())
+                except Exception as e:
+                    failed.append(part)
+                    print(f"[{part + 1}/{len(chunks)}] 出错: {e}")
+
+    # 成功的批次移入仓库后再更新 manifest；出错的基金保持原来的日期，下次运行时重新计算
+    os.makedirs(base_dir, exist_ok=True)
+    publish_staging(staging_dir, base_dir, run_tag)
+    write_manifest(base_dir, {
+        'base_start': f'{base_start:%Y-%m-%d}',
+        'intervals': args.intervals,
+        'net_value_columns': args.columns,
+        'funds': funds,
+        'updated_at': datetime.datetime.now().isoformat(timespec='seconds'),
+    })
+    if args.compact:
+        compact_partitions(base_dir)
+    return failed
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="滚动指标仓库物化任务")
+    parser.add_argument('--base-start', action='append', type=datetime.date.fromisoformat,
+                        help="仓库基准日（即分析开始日期），可指定多次，默认为 2023-01-01")
+    parser.add_argument('--end', type=datetime.date.fromisoformat, default=datetime.date.today(),
+                        help="计算到的日期 YYYY-MM-DD，默认为今天")
+    parser.add_argument('--intervals', default=','.join(str(interval) for interval in DEFAULT_INTERVALS),
+                        help="滚动区间（年），逗号分隔")
+    parser.add_argument('--columns', default=','.join(DEFAULT_NET_VALUE_COLUMNS), help="净值列，逗号分隔")
+    parser.add_argument('--warehouse-dir', default=WAREHOUSE_DIR, help="仓库目录")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="并行进程数")
+    parser.add_argument('--chunk-size', type=int, default=100, help="每个任务处理的基金数")
+    parser.add_argument('--full', action='store_true', help="忽略已有数据，全量重建")
+    parser.add_argument('--compact', action='store_true', help="完成后合并每个分区的增量分片")
+    parser.add_argument('--secrets', default=SECRETS_PATH, help="数据库配置文件")
+    args = parser.parse_args(argv)
+
+    args.base_start = args.base_start or [datetime.date(2023, 1, 1)]
+    args.intervals = [float(interval) for interval in args.intervals.split(',') if interval.strip()]
+    args.columns = [column.strip() for column in args.columns.split(',') if column.strip()]
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    db_config = dict(load_db_config(args.secrets))
+    universe = fetch_fund_universe(create_engine_from_config(db_config))['SecuCode'].tolist()
+    print(f"基金全集共 {len(universe)} 只")
+
+    failed = 0
+    for base_start in args.base_start:
+        failed += len(materialize_base(args, db_config, universe, base_start))
+
+    if failed:
+        print(f"{failed} 批出错，对应基金将在下次运行时重新计算")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())